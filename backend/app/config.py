@@ -11,11 +11,110 @@ class Settings(BaseSettings):
     # Vector Database
     qdrant_url: str = os.getenv("QDRANT_URL", "http://localhost:6333")
     qdrant_collection_name: str = "medical_knowledge"
+    qdrant_api_key: Optional[str] = os.getenv("QDRANT_API_KEY")
+    qdrant_prefer_grpc: bool = False  # gRPC transport on qdrant_grpc_port instead of REST
+    qdrant_grpc_port: int = 6334
+    qdrant_timeout_seconds: int = 10
+    qdrant_max_connections: int = 32  # Open connections per client, shared by all requests
+    qdrant_max_keepalive_connections: int = 16
+    qdrant_keepalive_expiry_seconds: float = 30.0
+    vector_store_backend: str = "qdrant"  # "qdrant" (server) or "faiss" (in-process index under faiss_index_path)
+    
+    # FAISS backend
+    faiss_index_type: str = "hnsw"  # "hnsw", "ivf" or "flat"
+    faiss_hnsw_m: int = 32
+    faiss_hnsw_ef_construction: int = 80
+    faiss_hnsw_ef_search: int = 64
+    faiss_ivf_nlist: int = 0  # 0 = about 4 * sqrt(points)
+    faiss_ivf_nprobe: int = 8
+    faiss_compact_ratio: float = 0.2  # Rebuild once this fraction of rows are deleted
     
     # Embeddings
     embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
     embedding_dimension: int = 384
     embedding_batch_size: int = 32
+    embedding_backend: str = "torch"  # "torch" (SentenceTransformer) or "onnx" (onnxruntime)
+    embedding_onnx_quantize: bool = True  # Dynamic int8 quantization of the exported ONNX model
+    embedding_num_workers: int = 0  # >1 shards large encodes across this many worker processes
+    embedding_pool_min_texts: int = 512  # Smaller encodes stay in-process
+    embedding_pool_shard_size: int = 256  # Texts per task handed to a worker
+    
+    # Embedding cache (memory-mapped, stored under cache_path)
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = 50000
+    embedding_cache_flush_seconds: float = 30.0
+    
+    # Retrieval caches (in-process, per worker; invalidated when the collection is re-ingested)
+    retrieval_cache_enabled: bool = True
+    query_embedding_cache_size: int = 2048
+    retrieval_results_cache_size: int = 1024
+    retrieval_cache_ttl_seconds: float = 600.0
+    
+    # Hybrid retrieval (BM25 index built at ingestion, fused with dense results by RRF)
+    hybrid_search_enabled: bool = True
+    hybrid_candidates: int = 20  # Results taken from each retriever before fusion
+    hybrid_rrf_k: int = 60
+    bm25_k1: float = 1.5
+    bm25_b: float = 0.75
+    
+    # Metadata filtering: restrict search to a condition the query names
+    condition_filter_enabled: bool = True
+    condition_filter_min_term_length: int = 4  # Shorter single-word condition names never filter
+    
+    # Cross-encoder reranking: rescore a larger candidate pool and keep the best k
+    rerank_enabled: bool = False
+    rerank_model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_candidates: int = 16
+    rerank_budget_ms: float = 300.0  # Per request; reranking is skipped when it would exceed this
+    rerank_batch_size: int = 32
+    
+    # Context selection: "similarity" keeps the top k, "mmr" trades relevance for diversity
+    retrieval_mode: str = "similarity"
+    mmr_fetch_k: int = 20  # Candidates MMR chooses from
+    mmr_lambda: float = 0.7  # 1.0 = pure relevance, 0.0 = pure diversity
+    merge_adjacent_chunks: bool = True  # Merge overlapping chunks of the same document
+    
+    # Batch queries (/api/rag/query/batch)
+    batch_query_max: int = 100
+    batch_query_concurrency: int = 4  # Concurrent LLM generations per batch
+    
+    # Semantic answer cache (sessionless queries only; emergencies always bypass it)
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.95  # Minimum cosine similarity to reuse an answer
+    semantic_cache_max_entries: int = 1000
+    semantic_cache_ttl_seconds: float = 3600.0
+    
+    # Single-flight: concurrent identical sessionless queries share one generation
+    single_flight_enabled: bool = True
+    
+    # LLM provider: "gemini", "groq" or "stub" (deterministic offline model for load tests and benchmarks)
+    llm_provider: str = "gemini"
+    llm_model_name: Optional[str] = None  # None = provider default (gemini-1.5-flash, Gemma2-9b-It)
+    llm_temperature: float = 0.1  # Low temperature for medical accuracy
+    llm_max_tokens: int = 1024
+    agent_llm_provider: str = "groq"  # Model behind /api/chat (medical_agent)
+    agent_llm_temperature: Optional[float] = None  # None = client default, as the agent has always used
+    agent_llm_max_tokens: Optional[int] = None
+    stub_llm_latency_ms: float = 200.0  # Delay before the first token
+    stub_llm_tokens_per_second: float = 50.0
+    stub_llm_response_tokens: int = 150
+    
+    # Outbound LLM scheduling (shared by all generators in a worker)
+    llm_max_concurrency: int = 8
+    llm_rate_limit_per_second: float = 5.0  # 0 = no rate limit; halves on each 429 and recovers gradually
+    llm_rate_limit_min_per_second: float = 0.5
+    llm_rate_burst: int = 10
+    llm_timeout_seconds: float = 30.0  # Per attempt (per chunk when streaming)
+    llm_deadline_seconds: float = 60.0  # Whole call, including queueing and retries
+    llm_max_retries: int = 2
+    llm_retry_base_seconds: float = 0.5
+    llm_retry_max_seconds: float = 8.0
+    llm_hedge_after_ms: float = 0.0  # >0 sends a duplicate request when a call is slower than this
+    
+    # Prompt budget (approximate tokens): history is capped first, retrieved chunks fill the rest
+    prompt_token_budget: int = 2500
+    history_token_budget: int = 300
+    prompt_min_chunk_tokens: int = 40  # Smallest sentence-trimmed chunk worth including
     
     # API Keys
     google_api_key: Optional[str] = None   # 👈 Added this for Google Generative AI
@@ -25,8 +124,16 @@ class Settings(BaseSettings):
     chunk_size: int = 500
     chunk_overlap: int = 50
     
+    # Streaming ingestion
+    ingestion_batch_size: int = 256   # chunks embedded/upserted per batch
+    ingestion_queue_size: int = 2     # embedded batches allowed to wait for upload
+    
     # File handling
     max_file_size_mb: int = 10
+    loader_parallel: bool = False     # Load multiple files in a process pool
+    loader_max_workers: int = 4
+    csv_chunk_rows: int = 50000
+    loader_process_threshold_mb: float = 2.0  # PDF/DOCX files at least this big are parsed in worker processes
     supported_file_types: List[str] = [".txt", ".json", ".csv", ".md", ".pdf", ".docx"]
     
     # Paths
@@ -34,6 +141,7 @@ class Settings(BaseSettings):
     medical_data_path: Path = base_path / "data" / "medical_knowledge"
     logs_path: Path = base_path.parent / "logs"
     cache_path: Path = base_path.parent / "cache"
+    faiss_index_path: Path = cache_path / "vector_index"
     
     # Medical sources for ingestion
     medical_sources: List[str] = [
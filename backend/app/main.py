@@ -5,6 +5,7 @@ from starlette.responses import JSONResponse
 
 from app.config import settings
 from app.routers import rag,chat
+from app.services.rag.utils.qdrant_clients import close_qdrant_clients
 
 app = FastAPI(
     title=settings.app_name,
@@ -26,6 +27,10 @@ app.include_router(rag.router)
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 # app.include_router(health.router, prefix="/api", tags=["health"])
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_qdrant_clients()
+
 @app.get("/")
 async def root():
     return {
@@ -6,6 +6,7 @@ class IngestionRequest(BaseModel):
     file_paths: List[str] = Field(..., description="List of file paths to ingest")
     chunking_strategy: str = Field("medical", description="Chunking strategy")
     recreate_collection: bool = Field(False, description="Recreate vector collection")
+    streaming: bool = Field(False, description="Stream documents through fixed-size batches with bounded memory")
 
 class IngestionResponse(BaseModel):
     success: bool
@@ -13,6 +14,23 @@ class IngestionResponse(BaseModel):
     files_processed: int
     chunks_created: int
     documents_stored: int
+    files_skipped: int = 0
+    chunks_deleted: int = 0
+    files_failed: Dict[str, str] = {}  # File -> reason; these keep their previously ingested documents and do not fail the run
+    error: Optional[str] = None
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed, cancelled
+    file_paths: List[str]
+    chunking_strategy: str
+    recreate_collection: bool
+    streaming: bool
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, Any] = {}
+    result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
 class SystemStatusResponse(BaseModel):
@@ -21,6 +39,9 @@ class SystemStatusResponse(BaseModel):
     embedding_model_loaded: bool
     documents_count: int
     system_ready: bool
+    cache_stats: Optional[Dict[str, Any]] = None
+    model_memory: Optional[Dict[str, Any]] = None
+    llm_stats: Optional[Dict[str, Any]] = None
 
 # UPDATED: Enhanced MedicalQueryRequest with session support
 class MedicalQueryRequest(BaseModel):
@@ -28,6 +49,10 @@ class MedicalQueryRequest(BaseModel):
     max_chunks: Optional[int] = Field(3, description="Max chunks to retrieve")
     session_id: Optional[str] = Field(None, description="Conversation session ID")
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., description="Medical queries, answered without session context", min_length=1)
+    max_chunks: Optional[int] = Field(3, description="Max chunks to retrieve per query")
+
 # UPDATED: Enhanced MedicalQueryResponse with session info
 class MedicalQueryResponse(BaseModel):
     success: bool
@@ -42,6 +67,8 @@ class MedicalQueryResponse(BaseModel):
     model_used: str = "gemini-1.5-flash"
     safety_validated: bool = True
     emergency_detected: bool = False
+    cache_hit: bool = Field(False, description="Whether the answer came from the semantic cache")
+    coalesced: bool = Field(False, description="Whether the answer was shared with an identical in-flight query")
     timestamp: str
     processing_time: float = 0.0  # For backward compatibility
     error: Optional[str] = None
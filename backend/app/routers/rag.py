@@ -1,23 +1,33 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any, AsyncIterator
+import asyncio
+import json
 
 from app.models.schemas import (
-    IngestionRequest, IngestionResponse,
-    MedicalQueryRequest, MedicalQueryResponse,
+    IngestionRequest, IngestionResponse, IngestionJobResponse,
+    MedicalQueryRequest, MedicalQueryResponse, BatchQueryRequest,
     SystemStatusResponse, ChatRequest, ChatResponse,
     SessionCreateResponse, SessionHistoryResponse, SessionStatusResponse
 )
 from app.services.rag.ingestion.ingestion_pipeline import IngestionPipeline
+from app.services.rag.ingestion.ingestion_jobs import IngestionJobManager
 from app.services.rag.generation.medical_generator import MedicalGenerator
 from app.services.rag.generation.gemini_generator import GeminiMedicalGenerator
 from app.services.rag.generation.contextual_gemini_generator import ContextualGeminiGenerator
+from app.services.rag.generation.llm_scheduler import get_llm_scheduler
 from app.services.session_manager import session_manager
+from app.services.rag.utils.embedding_cache import embedding_cache_stats
+from app.services.rag.utils.model_registry import model_registry
+from app.services.rag.retrieval.langchain_retriever import retrieval_cache_stats
 from app.services.rag.utils.logging_config import rag_logger
+from app.config import settings
 
 router = APIRouter(prefix="/api/rag", tags=["RAG System"])
 
 # Initialize components
 pipeline = IngestionPipeline()
+ingestion_jobs = IngestionJobManager(pipeline)  # Serializes ingestion off the event loop
 # generator = MedicalGenerator()  # Keep as backup
 generator = GeminiMedicalGenerator()  # Your current generator
 contextual_generator = ContextualGeminiGenerator()  # NEW: Context-aware generator
@@ -30,11 +40,14 @@ contextual_generator = ContextualGeminiGenerator()  # NEW: Context-aware generat
 async def ingest_documents(request: IngestionRequest):
     """Ingest medical documents into the knowledge base"""
     try:
-        result = await pipeline.ingest_documents(
+        # Runs as a background job so queries keep being served; this endpoint still waits for the result
+        job = ingestion_jobs.submit(
             file_paths=request.file_paths,
             chunking_strategy=request.chunking_strategy,
-            recreate_collection=request.recreate_collection
+            recreate_collection=request.recreate_collection,
+            streaming=request.streaming
         )
+        result = await asyncio.wrap_future(job.future)
         
         return IngestionResponse(
             success=result["success"],
@@ -42,6 +55,9 @@ async def ingest_documents(request: IngestionRequest):
             files_processed=result.get("files_processed", 0),
             chunks_created=result.get("chunks_created", 0),
             documents_stored=result.get("documents_stored", 0),
+            files_skipped=result.get("files_skipped", 0),
+            chunks_deleted=result.get("chunks_deleted", 0),
+            files_failed=result.get("files_failed", {}),
             error=result.get("error")
         )
         
@@ -54,7 +70,7 @@ async def collect_and_ingest():
     try:
         # Run data collection
         import subprocess
-        result = subprocess.run(["python", "collect_medical_data.py"], 
+        result = await asyncio.to_thread(subprocess.run, ["python", "collect_medical_data.py"], 
                               capture_output=True, text=True)
         
         if result.returncode != 0:
@@ -62,11 +78,12 @@ async def collect_and_ingest():
         
         # Ingest collected data
         from app.config import settings
-        ingestion_result = await pipeline.ingest_documents(
+        job = ingestion_jobs.submit(
             file_paths=settings.medical_sources,
             chunking_strategy="medical",
             recreate_collection=True
         )
+        ingestion_result = await asyncio.wrap_future(job.future)
         
         return {
             "success": True,
@@ -77,18 +94,50 @@ async def collect_and_ingest():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/ingest/jobs", response_model=IngestionJobResponse, status_code=202)
+async def start_ingestion_job(request: IngestionRequest):
+    """Start ingestion in the background and return a job to poll"""
+    job = ingestion_jobs.submit(
+        file_paths=request.file_paths,
+        chunking_strategy=request.chunking_strategy,
+        recreate_collection=request.recreate_collection,
+        streaming=request.streaming
+    )
+    return IngestionJobResponse(**job.to_dict())
+
+@router.get("/ingest/jobs", response_model=List[IngestionJobResponse])
+async def list_ingestion_jobs():
+    """List recent ingestion jobs, newest first"""
+    return [IngestionJobResponse(**job.to_dict()) for job in ingestion_jobs.list()]
+
+@router.get("/ingest/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: str):
+    """Get status, progress and ETA of an ingestion job"""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return IngestionJobResponse(**job.to_dict())
+
+@router.post("/ingest/jobs/{job_id}/cancel", response_model=IngestionJobResponse)
+async def cancel_ingestion_job(job_id: str):
+    """Cancel a queued or running ingestion job"""
+    job = ingestion_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return IngestionJobResponse(**job.to_dict())
+
 @router.get("/status", response_model=SystemStatusResponse)
 async def get_system_status():
     """Get RAG system status with session info"""
     try:
         # Check vector store connection
-        vector_connected = pipeline.vector_store.health_check()
+        vector_connected = await pipeline.vector_store.ahealth_check()
         
         # Check embedding model
         embedding_loaded = pipeline.embedding_manager.model is not None
         
         # Get document count
-        collection_info = pipeline.vector_store.get_collection_info()
+        collection_info = await pipeline.vector_store.aget_collection_info()
         doc_count = collection_info.get("points_count", 0)
         
         # Check session manager health
@@ -101,7 +150,15 @@ async def get_system_status():
             "vector_store_connected": vector_connected,
             "embedding_model_loaded": embedding_loaded,
             "documents_count": doc_count,
-            "system_ready": system_ready
+            "system_ready": system_ready,
+            "cache_stats": {
+                "embedding_cache": embedding_cache_stats(),
+                "retrieval": retrieval_cache_stats(),
+                "semantic_answers": generator.answer_cache.stats() if generator.answer_cache else None,
+                "single_flight": generator.single_flight.stats() if generator.single_flight else None
+            },
+            "model_memory": model_registry.memory_report(),
+            "llm_stats": get_llm_scheduler().stats()
         }
         
         # Add session info to response (but keep schema compatible)
@@ -145,31 +202,112 @@ async def query_medical_knowledge(request: MedicalQueryRequest):
             result["session_id"] = "no-session"
             result["conversation_context_used"] = False
         
-        # Ensure all required fields are present for MedicalQueryResponse
-        response_data = {
-            "success": result.get("success", True),
-            "query": result.get("query", request.query),
-            "response": result.get("response", ""),
-            "session_id": result.get("session_id", "no-session"),
-            "conversation_context_used": result.get("conversation_context_used", False),
-            "sources": result.get("sources", []),
-            "urgency_level": result.get("urgency_level", "routine"),
-            "chunks_used": result.get("chunks_used", 0),
-            "generation_time": result.get("generation_time", 0.0),
-            "model_used": result.get("model_used", "gemini-1.5-flash"),
-            "safety_validated": result.get("safety_validated", True),
-            "emergency_detected": result.get("emergency_detected", False),
-            "timestamp": result.get("timestamp", ""),
-            "processing_time": result.get("generation_time", 0.0),  # Backward compatibility
-            "error": result.get("error")
-        }
-        
-        return MedicalQueryResponse(**response_data)
+        return _to_query_response(result, request.query)
         
     except Exception as e:
         rag_logger.error(f"Query endpoint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _to_query_response(result: Dict[str, Any], query: str) -> MedicalQueryResponse:
+    """Ensure all required fields are present for MedicalQueryResponse"""
+    response_data = {
+        "success": result.get("success", True),
+        "query": result.get("query", query),
+        "response": result.get("response", ""),
+        "session_id": result.get("session_id", "no-session"),
+        "conversation_context_used": result.get("conversation_context_used", False),
+        "sources": result.get("sources", []),
+        "urgency_level": result.get("urgency_level", "routine"),
+        "chunks_used": result.get("chunks_used", 0),
+        "generation_time": result.get("generation_time", 0.0),
+        "model_used": result.get("model_used", "gemini-1.5-flash"),
+        "safety_validated": result.get("safety_validated", True),
+        "emergency_detected": result.get("emergency_detected", False),
+        "cache_hit": result.get("cache_hit", False),
+        "coalesced": result.get("coalesced", False),
+        "timestamp": result.get("timestamp", ""),
+        "processing_time": result.get("generation_time", 0.0),  # Backward compatibility
+        "error": result.get("error")
+    }
+    
+    return MedicalQueryResponse(**response_data)
+
+@router.post("/query/batch")
+async def query_medical_knowledge_batch(request: BatchQueryRequest):
+    """
+    Answer a list of queries without session context
+    
+    - All queries are embedded in one call and searched in one vector store round trip
+    - Generation runs with bounded concurrency (batch_query_concurrency)
+    - Results stream back as NDJSON, one line per query, in input order
+    """
+    if len(request.queries) > settings.batch_query_max:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_query_max} queries per batch")
+    if any(not query.strip() for query in request.queries):
+        raise HTTPException(status_code=400, detail="Queries must not be empty")
+    
+    rag_logger.info(f"📦 Batch query with {len(request.queries)} queries")
+    
+    async def stream_results():
+        index = 0
+        try:
+            async for result in generator.generate_medical_responses(request.queries, max_chunks=request.max_chunks):
+                response = _to_query_response(result, request.queries[index])
+                yield json.dumps({"index": index, **response.model_dump()}) + "\n"
+                index += 1
+        except Exception as e:
+            rag_logger.error(f"Batch query error: {e}")
+            yield json.dumps({"index": index, "success": False, "error": str(e)}) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_events(events: AsyncIterator[Dict[str, Any]], query: str) -> StreamingResponse:
+    """Relay generator events as server-sent events: token events, then one final event"""
+    
+    async def stream():
+        try:
+            async for item in events:
+                if item["event"] == "token":
+                    yield _sse("token", {"text": item["text"]})
+                else:
+                    result = item["result"]
+                    result.setdefault("session_id", "no-session")
+                    yield _sse("final", _to_query_response(result, query).model_dump())
+        except Exception as e:
+            rag_logger.error(f"Streaming query error: {e}")
+            yield _sse("error", {"success": False, "error": str(e)})
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Keep proxies from buffering tokens
+    )
+
+@router.post("/query/stream")
+async def query_medical_knowledge_stream(request: MedicalQueryRequest):
+    """
+    Streaming variant of /query (server-sent events)
+    
+    - "token" events carry response text as Gemini generates it
+    - One "final" event carries the formatted response, sources and safety metadata
+    - With a session_id, the exchange is saved to the session once the stream completes
+    """
+    if request.session_id:
+        events = contextual_generator.stream_response(
+            query=request.query,
+            session_id=request.session_id,
+            max_chunks=request.max_chunks
+        )
+    else:
+        events = generator.stream_medical_response(
+            query=request.query,
+            max_chunks=request.max_chunks
+        )
+    return _stream_events(events, request.query)
+
 # ============================================================================
 # NEW ENDPOINTS: Session Management
 # ============================================================================
@@ -379,3 +517,19 @@ async def chat_with_memory(request: ChatRequest):
             timestamp="",
             error=str(e)
         )
+
+@router.post("/chat/stream")
+async def chat_with_memory_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat (server-sent events)
+    
+    - Same session handling as /chat
+    - "token" events carry response text as it is generated, then one "final" event with metadata
+    - The exchange is saved to the session once the stream completes
+    """
+    events = contextual_generator.stream_response(
+        query=request.query,
+        session_id=request.session_id,
+        max_chunks=request.max_chunks or 3
+    )
+    return _stream_events(events, request.query)
@@ -1,24 +1,34 @@
+from functools import lru_cache
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
 from langchain_core.runnables import RunnableParallel, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from langchain import hub
 from app.config import settings
+from app.services.rag.generation.llm_providers import create_chat_model
+from app.services.rag.utils.model_registry import model_registry
 
 
 
-def chatbot(query: str) -> str:
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    knowledge_store = FAISS.load_local(
-        "app/Medical_DataBase",
-        embeddings,
-        allow_dangerous_deserialization=True
+@lru_cache(maxsize=1)
+def _get_chain():
+    """Build the RAG chain once; the embedding model is the process-wide shared instance"""
+    knowledge_store = model_registry.get(
+        "medical_agent:faiss_store",
+        lambda: FAISS.load_local(
+            "app/Medical_DataBase",
+            model_registry.get_langchain_embeddings(),
+            allow_dangerous_deserialization=True
+        )
     )
     retriever = knowledge_store.as_retriever()
 
-    # ✅ pass API key here
-    llm = ChatGroq(model="Gemma2-9b-It", api_key=settings.groq_api_key)
+    generation_params = {
+        key: value for key, value in (
+            ("temperature", settings.agent_llm_temperature),
+            ("max_tokens", settings.agent_llm_max_tokens)
+        ) if value is not None
+    }
+    llm = create_chat_model(settings.agent_llm_provider, generation_params=generation_params)
 
     prompt = hub.pull("rlm/rag-prompt")
 
@@ -26,6 +36,9 @@ def chatbot(query: str) -> str:
         "context": retriever,
         "question": RunnablePassthrough()
     })
-    chain = parallel_chain | prompt | llm | StrOutputParser()
-    response = chain.invoke(query)
+    return parallel_chain | prompt | llm | StrOutputParser()
+
+
+def chatbot(query: str) -> str:
+    response = _get_chain().invoke(query)
     return response
@@ -0,0 +1,148 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.config import settings
+
+# Words, numbers and single punctuation marks; long words count as several subword tokens
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate LLM token count without a model-specific tokenizer.
+
+    Subword vocabularies hold common words whole and split rarer, longer
+    ones, so each word counts one token per started 8 characters and each
+    punctuation mark one. On the medical corpus this lands slightly above a
+    WordPiece count, erring on the side of staying under budget.
+    """
+    return sum(1 + (len(token) - 1) // 8 for token in _TOKEN_PATTERN.findall(text))
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Leading whole sentences of text within max_tokens; "" if not even the first fits"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    
+    kept, used = [], 0
+    sentences = split_sentences(text)
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+def _leading_words(text: str, max_tokens: int) -> str:
+    """Prefix of text within max_tokens, cut after a word or punctuation mark"""
+    used, end = 0, 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += 1 + (len(match.group()) - 1) // 8
+        if used > max_tokens:
+            break
+        end = match.end()
+    return text[:end]
+
+def _relevance(doc: Document) -> Optional[float]:
+    # Best ranking signal available: cross-encoder, then hybrid fusion, then cosine similarity
+    for key in ("rerank_score", "rrf_score", "relevance_score"):
+        if doc.metadata.get(key) is not None:
+            return float(doc.metadata[key])
+    return None
+
+@dataclass
+class PackedContext:
+    """Prompt context that fits the budget, and what went into it"""
+    context: str
+    documents: List[Document]
+    tokens: Dict[str, int] = field(default_factory=dict)
+    trimmed: int = 0
+    dropped: int = 0
+
+class ContextPacker:
+    """
+    Fits retrieved chunks into a prompt token budget.
+
+    The fixed prompt text (instructions, question, conversation history) is
+    measured first; chunks get what is left. Chunks are taken greedily by
+    relevance (rerank score, else RRF score, else cosine similarity, else
+    their order). A chunk that does not fit whole is cut back to its leading
+    sentences when at least min_chunk_tokens of it fit, and skipped
+    otherwise, so smaller lower-ranked chunks can still use the remaining
+    budget. The top-ranked chunk is always kept, cut to at least
+    min_chunk_tokens even when the fixed text leaves less, so the model
+    never answers without medical context.
+    """
+    
+    def __init__(self, max_tokens: int = None, min_chunk_tokens: int = None):
+        self.max_tokens = max_tokens or settings.prompt_token_budget
+        self.min_chunk_tokens = min_chunk_tokens or settings.prompt_min_chunk_tokens
+    
+    def pack(self, documents: List[Document], fixed_text: str = "", separator: str = "\n\n") -> PackedContext:
+        fixed_tokens = count_tokens(fixed_text)
+        budget = max(self.max_tokens - fixed_tokens, 0)
+        separator_tokens = count_tokens(separator)
+        
+        ranked = list(documents)
+        if ranked and all(_relevance(doc) is not None for doc in ranked):
+            ranked.sort(key=lambda doc: -_relevance(doc))  # Stable, so ties keep retrieval order
+        
+        packed: List[Document] = []
+        used, trimmed, dropped = 0, 0, 0
+        for doc in ranked:
+            if packed:
+                available = budget - used - separator_tokens
+            else:
+                available = max(budget, self.min_chunk_tokens)
+            tokens = count_tokens(doc.page_content)
+            if tokens <= available:
+                packed.append(doc)
+            elif available >= self.min_chunk_tokens and (text := self._trim(doc.page_content, available, not packed)):
+                packed.append(Document(page_content=text, metadata={**doc.metadata, "trimmed": True}))
+                tokens = count_tokens(text)
+                trimmed += 1
+            else:
+                dropped += 1
+                continue
+            used += tokens + (separator_tokens if len(packed) > 1 else 0)
+        
+        return PackedContext(
+            context=separator.join(doc.page_content for doc in packed),
+            documents=packed,
+            tokens={"budget": self.max_tokens, "fixed": fixed_tokens, "context": used, "total": fixed_tokens + used},
+            trimmed=trimmed,
+            dropped=dropped
+        )
+    
+    @staticmethod
+    def _trim(text: str, max_tokens: int, top_ranked: bool) -> str:
+        # The top-ranked chunk falls back to a word cut when even its first sentence is too long
+        return trim_to_tokens(text, max_tokens) or (_leading_words(text, max_tokens) if top_ranked else "")
+
+def pack_history(messages: List[Tuple[str, str]], max_tokens: int) -> str:
+    """
+    Most recent (role, content) turns that fit max_tokens, oldest first.
+
+    Turns are added newest to oldest; the first one that does not fit whole
+    is cut to its leading sentences (an answer's opening usually carries its
+    gist) and older turns are dropped.
+    """
+    lines: List[str] = []
+    used = 0
+    for role, content in reversed(messages):
+        line = f"{'User' if role == 'user' else 'Assistant'}: {content}"
+        tokens = count_tokens(line)
+        if used + tokens > max_tokens:
+            line = trim_to_tokens(line, max_tokens - used)
+            if line:
+                lines.append(line)
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(reversed(lines))
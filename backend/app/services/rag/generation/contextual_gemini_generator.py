@@ -1,14 +1,17 @@
 import os
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from datetime import datetime
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage, SystemMessage
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage, SystemMessage
 
 from app.services.rag.retrieval.langchain_retriever import LangChainMedicalRetriever
 from app.services.rag.generation.prompt_templates import MedicalPromptTemplates
 from app.services.rag.generation.response_processor import MedicalResponseProcessor
+from app.services.rag.generation.llm_providers import create_chat_model, llm_model_name
+from app.services.rag.generation.llm_scheduler import get_llm_scheduler
+from app.services.rag.generation.context_packer import ContextPacker, PackedContext
 from app.services.rag.utils.logging_config import rag_logger
 from app.services.session_manager import session_manager
 from app.config import settings
@@ -18,31 +21,21 @@ class ContextualGeminiGenerator:
     
     def __init__(self):
         self.retriever = LangChainMedicalRetriever()
-        self.llm = self._initialize_gemini()
+        self.model_name = f"{llm_model_name()}-contextual"
+        self.llm = self._initialize_llm()
+        self.llm_scheduler = get_llm_scheduler()
         self.prompt_templates = MedicalPromptTemplates()
         self.response_processor = MedicalResponseProcessor()
+        self.context_packer = ContextPacker()
         rag_logger.info("🧠 ContextualGeminiGenerator initialized")
     
-    def _initialize_gemini(self):
-        """Initialize Gemini LLM with medical-optimized settings"""
+    def _initialize_llm(self):
+        """Initialize the configured LLM provider (Settings.llm_provider)"""
         try:
-            api_key = settings.google_api_key
-            if not api_key:
-                raise ValueError("GOOGLE_API_KEY not found in environment variables")
-            
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=api_key,
-                temperature=0.1,
-                max_tokens=1024,
-                convert_system_message_to_human=True
-            )
-            
-            rag_logger.info("✅ Contextual Gemini LLM initialized")
-            return llm
-            
+            return create_chat_model()
+        
         except Exception as e:
-            rag_logger.error(f"❌ Failed to initialize Contextual Gemini: {e}")
+            rag_logger.error(f"❌ Failed to initialize contextual LLM ({settings.llm_provider}): {e}")
             raise
     
     async def generate_response(self, 
@@ -58,13 +51,7 @@ class ContextualGeminiGenerator:
             rag_logger.info(f"🤖 Generating contextual response for: {query[:50]}...")
             
             # Get or create session
-            if session_id:
-                session = session_manager.get_session(session_id)
-                if not session:
-                    session_id = session_manager.create_session()
-                    rag_logger.info(f"🆕 Created new session: {session_id[:8]}...")
-            else:
-                session_id = session_manager.create_session()
+            session_id = self._resolve_session(session_id)
             
             # Get conversation history for context
             conversation_history = session_manager.get_conversation_context(session_id, max_messages=6)
@@ -85,14 +72,16 @@ class ContextualGeminiGenerator:
             if not documents:
                 return self._create_fallback_response(query, session_id, "No relevant medical information found")
             
-            # Build medical context
-            medical_context = "\n\n".join([doc.page_content for doc in documents])
-            sources = [doc.metadata.get("source", "Unknown") for doc in documents]
-            
             # Analyze for medical urgency
             emergency_analysis = self.response_processor.detect_emergency_keywords(query)
             urgency_level = emergency_analysis.get("urgency_level", "routine")
             
+            # Build medical context within the prompt token budget
+            packed = self._pack_context(query, conversation_history, documents, urgency_level)
+            medical_context, documents = packed.context, packed.documents
+            if not documents:
+                return self._create_fallback_response(query, session_id, "No medical context fits the prompt budget")
+            
             # Generate contextual response
             response_text = await self._generate_with_context(
                 current_query=query,
@@ -101,66 +90,181 @@ class ContextualGeminiGenerator:
                 urgency_level=urgency_level
             )
             
-            # Process response
-            cleaned_response = self.response_processor.clean_response_text(response_text)
-            final_response = cleaned_response  # ✅ Clean response without disclaimers
-            # final_response = self.response_processor.add_safety_disclaimers(
-            #     cleaned_response, urgency_level
-            # )
-            
-            # Format with metadata
-            generation_time = time.time() - start_time
-            metadata = {
-                "model_used": "gemini-1.5-flash-contextual",
-                "generation_time": generation_time,
-                "timestamp": datetime.now().isoformat(),
-                "session_id": session_id,
-                "conversation_context_used": conversation_context_used
-            }
-            
-            formatted_response = self.response_processor.format_medical_response(
-                final_response, sources, metadata
+            return self._finalize_response(
+                query, session_id, response_text, documents, urgency_level,
+                emergency_analysis, conversation_context_used, start_time
             )
+        
+        except Exception as e:
+            rag_logger.error(f"❌ Contextual generation failed: {e}")
+            return self._create_fallback_response(query, session_id or "unknown", str(e))
+    
+    async def stream_response(self,
+                              query: str,
+                              session_id: Optional[str] = None,
+                              max_chunks: int = 3) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of generate_response.
+        
+        Yields {"event": "token", "text": ...} as Gemini produces text, then one
+        {"event": "final", "result": ...} with the post-processed response and
+        metadata. The exchange is written to the session only once the stream
+        completes, and a new session is only created then, so an abandoned
+        stream neither changes an existing session nor leaves an empty one.
+        """
+        start_time = time.time()
+        if session_id and not session_manager.get_session(session_id):
+            session_id = None
+        user_saved = False
+        
+        try:
+            rag_logger.info(f"🌊 Streaming contextual response for: {query[:50]}...")
+            
+            conversation_history = session_manager.get_conversation_context(session_id, max_messages=6) if session_id else ""
+            conversation_context_used = bool(conversation_history.strip())
             
-            # Add assistant response to session
-            session_manager.add_message(
-                session_id, 
-                "assistant", 
-                formatted_response,
-                {"sources": sources, "generation_time": generation_time}
+            documents = await self.retriever.retrieve_documents(
+                query=self._enhance_query_with_context(query, conversation_history),
+                k=max_chunks
             )
             
-            # Validate safety
-            safety_validation = self.response_processor.validate_response_safety(formatted_response)
+            if not documents:
+                session_id = self._save_user_message(session_id, query)
+                yield {"event": "final", "result": self._create_fallback_response(query, session_id, "No relevant medical information found")}
+                return
             
-            result = {
-                "success": True,
-                "query": query,
-                "response": formatted_response,
-                "session_id": session_id,
-                "conversation_context_used": conversation_context_used,
-                "sources": list(set(sources)),
-                "urgency_level": urgency_level,
-                "chunks_used": len(documents),
-                "generation_time": generation_time,
-                "model_used": "gemini-1.5-flash-contextual",
-                "safety_validated": safety_validation["is_safe"],
-                "emergency_detected": emergency_analysis.get("is_emergency", False),
-                "timestamp": datetime.now().isoformat()
-            }
+            emergency_analysis = self.response_processor.detect_emergency_keywords(query)
+            urgency_level = emergency_analysis.get("urgency_level", "routine")
+            packed = self._pack_context(query, conversation_history, documents, urgency_level)
+            documents = packed.documents
+            if not documents:
+                session_id = self._save_user_message(session_id, query)
+                yield {"event": "final", "result": self._create_fallback_response(query, session_id, "No medical context fits the prompt budget")}
+                return
             
-            rag_logger.info(f"✅ Generated contextual response in {generation_time:.2f}s (Context: {conversation_context_used})")
-            return result
+            parts = []
+            async for text in self._stream_with_context(
+                current_query=query,
+                conversation_history=conversation_history,
+                medical_context=packed.context,
+                urgency_level=urgency_level
+            ):
+                parts.append(text)
+                yield {"event": "token", "text": text}
             
+            session_id = self._save_user_message(session_id, query)
+            user_saved = True
+            result = self._finalize_response(
+                query, session_id, "".join(parts), documents, urgency_level,
+                emergency_analysis, conversation_context_used, start_time
+            )
+        
         except Exception as e:
-            rag_logger.error(f"❌ Contextual generation failed: {e}")
-            return self._create_fallback_response(query, session_id or "unknown", str(e))
+            rag_logger.error(f"❌ Contextual streaming failed: {e}")
+            if not user_saved:
+                session_id = self._save_user_message(session_id, query)
+            result = self._create_fallback_response(query, session_id, str(e))
+        
+        yield {"event": "final", "result": result}
+    
+    def _pack_context(self,
+                      query: str,
+                      conversation_history: str,
+                      documents: List[Document],
+                      urgency_level: str) -> PackedContext:
+        """Fit the retrieved chunks into what the prompt budget leaves after instructions and history"""
+        fixed_text = self._build_contextual_prompt(query, conversation_history, "", urgency_level)
+        packed = self.context_packer.pack(documents, fixed_text)
+        rag_logger.debug(
+            f"📦 Packed {len(packed.documents)}/{len(documents)} chunks into {packed.tokens['total']} tokens "
+            f"({packed.trimmed} trimmed, {packed.dropped} dropped)"
+        )
+        return packed
+    
+    def _save_user_message(self, session_id: Optional[str], query: str) -> str:
+        """Add the user message, creating the session first if needed; returns the session ID"""
+        session_id = self._resolve_session(session_id)
+        session_manager.add_message(session_id, "user", query)
+        return session_id
+    
+    def _resolve_session(self, session_id: Optional[str]) -> str:
+        """Return session_id if it exists, otherwise a newly created session"""
+        if session_id:
+            session = session_manager.get_session(session_id)
+            if not session:
+                session_id = session_manager.create_session()
+                rag_logger.info(f"🆕 Created new session: {session_id[:8]}...")
+            return session_id
+        return session_manager.create_session()
+    
+    def _finalize_response(self,
+                           query: str,
+                           session_id: str,
+                           response_text: str,
+                           documents: List[Document],
+                           urgency_level: str,
+                           emergency_analysis: Dict[str, Any],
+                           conversation_context_used: bool,
+                           start_time: float) -> Dict[str, Any]:
+        """Post-process generated text, record it in the session and build the response payload"""
+        sources = [doc.metadata.get("source", "Unknown") for doc in documents]
+        
+        # Process response
+        cleaned_response = self.response_processor.clean_response_text(response_text)
+        final_response = cleaned_response  # ✅ Clean response without disclaimers
+        # final_response = self.response_processor.add_safety_disclaimers(
+        #     cleaned_response, urgency_level
+        # )
+        
+        # Format with metadata
+        generation_time = time.time() - start_time
+        metadata = {
+            "model_used": self.model_name,
+            "generation_time": generation_time,
+            "timestamp": datetime.now().isoformat(),
+            "session_id": session_id,
+            "conversation_context_used": conversation_context_used
+        }
+        
+        formatted_response = self.response_processor.format_medical_response(
+            final_response, sources, metadata
+        )
+        
+        # Add assistant response to session
+        session_manager.add_message(
+            session_id, 
+            "assistant", 
+            formatted_response,
+            {"sources": sources, "generation_time": generation_time}
+        )
+        
+        # Validate safety
+        safety_validation = self.response_processor.validate_response_safety(formatted_response)
+        
+        result = {
+            "success": True,
+            "query": query,
+            "response": formatted_response,
+            "session_id": session_id,
+            "conversation_context_used": conversation_context_used,
+            "sources": list(set(sources)),
+            "urgency_level": urgency_level,
+            "chunks_used": len(documents),
+            "generation_time": generation_time,
+            "model_used": self.model_name,
+            "safety_validated": safety_validation["is_safe"],
+            "emergency_detected": emergency_analysis.get("is_emergency", False),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        rag_logger.info(f"✅ Generated contextual response in {generation_time:.2f}s (Context: {conversation_context_used})")
+        return result
     
     def _enhance_query_with_context(self, query: str, conversation_history: str) -> str:
         """Enhance query with conversation context for better retrieval"""
         if not conversation_history.strip():
             return query
-            
+        
         # Extract medical keywords from conversation
         context_keywords = self._extract_medical_keywords(conversation_history)
         
@@ -201,9 +305,31 @@ class ContextualGeminiGenerator:
             )
             
             # Generate with Gemini
-            response = await self.llm.ainvoke([HumanMessage(content=context_prompt)])
+            response = await self.llm_scheduler.ainvoke(self.llm, [HumanMessage(content=context_prompt)])
             return response.content
+        
+        except Exception as e:
+            rag_logger.error(f"Contextual Gemini generation error: {e}")
+            raise
+    
+    async def _stream_with_context(self,
+                                   current_query: str,
+                                   conversation_history: str,
+                                   medical_context: str,
+                                   urgency_level: str) -> AsyncIterator[str]:
+        """Relay Gemini output for the contextual prompt as it is generated"""
+        try:
+            context_prompt = self._build_contextual_prompt(
+                current_query=current_query,
+                conversation_history=conversation_history,
+                medical_context=medical_context,
+                urgency_level=urgency_level
+            )
             
+            async for chunk in self.llm_scheduler.astream(self.llm, [HumanMessage(content=context_prompt)]):
+                if chunk.content:
+                    yield chunk.content
+        
         except Exception as e:
             rag_logger.error(f"Contextual Gemini generation error: {e}")
             raise
@@ -251,7 +377,7 @@ RESPONSE GUIDELINES:
 5. **Human-like**: Never mention "documents", "context", or internal processes
 
 Please provide a helpful, contextually aware response that feels like a natural continuation of our conversation."""
-
+        
         return prompt
     
     def _create_fallback_response(self, query: str, session_id: str, error_message: str) -> Dict[str, Any]:
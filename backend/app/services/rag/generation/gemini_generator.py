@@ -1,14 +1,21 @@
 import os
 import time
-from typing import Dict, Any, List
+import asyncio
+from typing import Dict, Any, List, Optional, AsyncIterator
 from datetime import datetime
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage, SystemMessage
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage, SystemMessage
 
 from app.services.rag.retrieval.langchain_retriever import LangChainMedicalRetriever
 from app.services.rag.generation.prompt_templates import MedicalPromptTemplates
 from app.services.rag.generation.response_processor import MedicalResponseProcessor
+from app.services.rag.generation.semantic_cache import SemanticAnswerCache
+from app.services.rag.generation.single_flight import SingleFlight
+from app.services.rag.generation.llm_providers import create_chat_model, llm_model_name
+from app.services.rag.generation.llm_scheduler import get_llm_scheduler
+from app.services.rag.generation.context_packer import ContextPacker, PackedContext
+from app.services.rag.utils.kb_version import get_kb_version
 from app.services.rag.utils.logging_config import rag_logger
 from app.config import settings
 
@@ -17,122 +24,285 @@ class GeminiMedicalGenerator:
     
     def __init__(self):
         self.retriever = LangChainMedicalRetriever()
-        self.llm = self._initialize_gemini()
+        self.model_name = llm_model_name()
+        self.llm = self._initialize_llm()
+        self.llm_scheduler = get_llm_scheduler()
         self.prompt_templates = MedicalPromptTemplates()
         self.response_processor = MedicalResponseProcessor()
+        self.context_packer = ContextPacker()
+        self.answer_cache = SemanticAnswerCache() if settings.semantic_cache_enabled else None
+        self.single_flight = SingleFlight() if settings.single_flight_enabled else None
     
-    def _initialize_gemini(self):
-        """Initialize Gemini LLM with medical-optimized settings"""
+    def _initialize_llm(self):
+        """Initialize the configured LLM provider (Settings.llm_provider)"""
         try:
-            # api_key = os.getenv("GOOGLE_API_KEY")
-            api_key = settings.google_api_key
-            if not api_key:
-                raise ValueError("GOOGLE_API_KEY not found in environment variables")
-            
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=api_key,
-                temperature=0.1,  # Low temperature for medical accuracy
-                max_tokens=1024,
-                convert_system_message_to_human=True  # Gemini compatibility
-            )
-            
-            rag_logger.info("✅ Gemini LLM initialized successfully")
-            return llm
-            
+            return create_chat_model()
+        
         except Exception as e:
-            rag_logger.error(f"❌ Failed to initialize Gemini: {e}")
+            rag_logger.error(f"❌ Failed to initialize LLM ({settings.llm_provider}): {e}")
             raise
     
+    async def generate_medical_responses(self,
+                                         queries: List[str],
+                                         max_chunks: int = 3,
+                                         concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Answer a batch of queries, yielding results in input order as they complete"""
+        start_time = time.time()
+        # One encode call for the whole batch; cache hits are answered without retrieval
+        embeddings = await self.retriever.embed_queries(queries)
+        lookups = [
+            await self._lookup_answer_cache(query, max_chunks, self._urgency_level(query), embedding)
+            for query, embedding in zip(queries, embeddings)
+        ]
+        
+        # One vector search round trip for the rest
+        misses = [index for index, (cached, _, _) in enumerate(lookups) if not cached]
+        documents = {}
+        if misses:
+            found = await self.retriever.retrieve_documents_batch(
+                [queries[index] for index in misses], k=max_chunks, embeddings=[embeddings[index] for index in misses]
+            )
+            documents = dict(zip(misses, found))
+        semaphore = asyncio.Semaphore(concurrency or settings.batch_query_concurrency)
+        
+        async def answer(index: int) -> Dict[str, Any]:
+            cached = lookups[index][0]
+            if cached:
+                return self._create_cached_response(cached[0], queries[index], cached[1], start_time)
+            async with semaphore:
+                return await self.generate_medical_response(
+                    queries[index], max_chunks, query_embedding=embeddings[index],
+                    documents=documents[index], cache_lookup=lookups[index]
+                )
+        
+        tasks = [asyncio.create_task(answer(index)) for index in range(len(queries))]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            # Client went away mid-stream: stop generating the rest
+            for task in tasks:
+                task.cancel()
+    
     async def generate_medical_response(self, 
                                       query: str,
-                                      max_chunks: int = 3) -> Dict[str, Any]:
-        """Generate comprehensive medical response using Gemini + RAG"""
+                                      max_chunks: int = 3,
+                                      query_embedding: Optional[List[float]] = None,
+                                      documents: Optional[List[Document]] = None,
+                                      cache_lookup: Optional[tuple] = None) -> Dict[str, Any]:
+        """Generate comprehensive medical response using Gemini + RAG (batch callers pass prefetched embedding, documents and cache lookup)"""
+        if self.single_flight is None:
+            return await self._generate_medical_response(query, max_chunks, query_embedding, documents, cache_lookup)
         
+        # Identical queries already in flight share one retrieval and one Gemini call
+        key = (self.single_flight.normalize(query), max_chunks)
+        result, shared = await self.single_flight.do(
+            key, lambda: self._generate_medical_response(query, max_chunks, query_embedding, documents, cache_lookup)
+        )
+        result = dict(result)  # Callers annotate their result
+        if shared:
+            result.update({"query": query, "coalesced": True})
+            rag_logger.info(f"🔗 Joined in-flight generation for: {query[:50]}...")
+        return result
+    
+    async def _generate_medical_response(self,
+                                         query: str,
+                                         max_chunks: int,
+                                         query_embedding: Optional[List[float]] = None,
+                                         documents: Optional[List[Document]] = None,
+                                         cache_lookup: Optional[tuple] = None) -> Dict[str, Any]:
         start_time = time.time()
         
         try:
             rag_logger.info(f"🤖 Generating Gemini response for: {query[:50]}...")
             
-            # Step 1: Analyze query for urgency and safety
+            # Step 1: Analyze query for urgency and safety, and select the prompt template
             emergency_analysis = self.response_processor.detect_emergency_keywords(query)
+            prompt_template, urgency_level = self._select_prompt(query, emergency_analysis)
+            
+            # Step 1b: Answer near-duplicate questions from the semantic cache (routine questions only)
+            if cache_lookup is None:
+                cache_lookup = await self._lookup_answer_cache(query, max_chunks, urgency_level, query_embedding)
+            cached, cache_embedding, kb_version = cache_lookup
+            if cached:
+                return self._create_cached_response(cached[0], query, cached[1], start_time)
             
             # Step 2: Retrieve relevant medical context
-            documents = await self.retriever.retrieve_documents(
-                query=query,
-                k=max_chunks
-            )
+            if documents is None:
+                documents = await self.retriever.retrieve_documents(
+                    query=query,
+                    k=max_chunks
+                )
             
             if not documents:
                 return self._create_fallback_response(query, "No relevant medical information found")
             
-            # Step 3: Build context from retrieved documents
-            context = "\n\n".join([doc.page_content for doc in documents])
-            sources = [doc.metadata.get("source", "Unknown") for doc in documents]
-            
-            # Step 4: Select appropriate prompt template
-            if emergency_analysis["is_emergency"]:
-                prompt_template = self.prompt_templates.get_emergency_prompt()
-                urgency_level = "emergency"
-            elif "symptom" in query.lower():
-                prompt_template = self.prompt_templates.get_symptom_analysis_prompt()
-                urgency_level = "high" if any(word in query.lower() for word in ["severe", "acute", "sudden"]) else "routine"
-            elif any(word in query.lower() for word in ["treatment", "medication", "therapy"]):
-                prompt_template = self.prompt_templates.get_treatment_info_prompt()
-                urgency_level = "routine"
-            else:
-                prompt_template = self.prompt_templates.get_medical_qa_prompt()
-                urgency_level = "routine"
+            # Step 3: Build context from retrieved documents within the prompt token budget
+            packed = self._pack_context(query, prompt_template, documents)
+            context, documents = packed.context, packed.documents
+            if not documents:
+                return self._create_fallback_response(query, "No medical context fits the prompt budget")
             
-            # Step 5: Generate response with Gemini
+            # Step 4: Generate response with Gemini
             response_text = await self._generate_with_gemini(
                 query, context, prompt_template
             )
             
-            # Step 6: Post-process response
-            cleaned_response = self.response_processor.clean_response_text(response_text)
-            
-            # Step 7: Add safety disclaimers
-            final_response = self.response_processor.add_safety_disclaimers(
-                cleaned_response, urgency_level
+            return self._finalize_response(
+                query, response_text, documents, urgency_level, emergency_analysis,
+                start_time, max_chunks, cache_embedding, kb_version
             )
-            
-            # Step 8: Format with sources and metadata
-            generation_time = time.time() - start_time
-            metadata = {
-                "model_used": "gemini-1.5-flash",
-                "generation_time": generation_time,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            formatted_response = self.response_processor.format_medical_response(
-                final_response, sources, metadata
-            )
-            
-            # Step 9: Validate safety
-            safety_validation = self.response_processor.validate_response_safety(formatted_response)
-            
-            result = {
-                "success": True,
-                "query": query,
-                "response": formatted_response,
-                "sources": list(set(sources)),
-                "urgency_level": urgency_level,
-                "chunks_used": len(documents),
-                "generation_time": generation_time,
-                "model_used": "gemini-1.5-flash",
-                "safety_validated": safety_validation["is_safe"],
-                "emergency_detected": emergency_analysis["is_emergency"],
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            rag_logger.info(f"✅ Generated safe medical response in {generation_time:.2f}s")
-            return result
-            
+        
         except Exception as e:
             rag_logger.error(f"❌ Gemini generation failed: {e}")
             return self._create_fallback_response(query, str(e))
     
+    async def stream_medical_response(self, query: str, max_chunks: int = 3) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of generate_medical_response.
+        
+        Yields {"event": "token", "text": ...} as Gemini produces text, then one
+        {"event": "final", "result": ...} with the post-processed response,
+        sources and safety metadata. Cache hits and fallbacks yield only the
+        final event.
+        """
+        start_time = time.time()
+        
+        try:
+            rag_logger.info(f"🌊 Streaming Gemini response for: {query[:50]}...")
+            
+            emergency_analysis = self.response_processor.detect_emergency_keywords(query)
+            prompt_template, urgency_level = self._select_prompt(query, emergency_analysis)
+            cached, cache_embedding, kb_version = await self._lookup_answer_cache(query, max_chunks, urgency_level)
+            if cached:
+                result = self._create_cached_response(cached[0], query, cached[1], start_time)
+            else:
+                documents = await self.retriever.retrieve_documents(query=query, k=max_chunks)
+                if documents:
+                    packed = self._pack_context(query, prompt_template, documents)
+                    documents = packed.documents
+                
+                if not documents:
+                    result = self._create_fallback_response(query, "No relevant medical information found")
+                else:
+                    parts = []
+                    async for text in self._stream_with_gemini(query, packed.context, prompt_template):
+                        parts.append(text)
+                        yield {"event": "token", "text": text}
+                    
+                    result = self._finalize_response(
+                        query, "".join(parts), documents, urgency_level, emergency_analysis,
+                        start_time, max_chunks, cache_embedding, kb_version
+                    )
+        
+        except Exception as e:
+            rag_logger.error(f"❌ Gemini streaming failed: {e}")
+            result = self._create_fallback_response(query, str(e))
+        
+        yield {"event": "final", "result": result}
+    
+    async def _lookup_answer_cache(self,
+                                   query: str,
+                                   max_chunks: int,
+                                   urgency_level: str,
+                                   query_embedding: Optional[List[float]] = None):
+        """
+        Semantic cache lookup; returns (hit or None, embedding to store under, kb_version).
+
+        Anything above routine urgency bypasses the cache: a near-duplicate
+        routine answer would lack the urgent guidance, and urgent answers are
+        not stored for routine questions to reuse.
+        """
+        if self.answer_cache is None:
+            return None, None, None
+        if urgency_level != "routine":
+            self.answer_cache.record_bypass()
+            return None, None, None
+        
+        cache_embedding = query_embedding if query_embedding is not None else await self.retriever.embed_query(query)
+        kb_version = get_kb_version(settings.qdrant_collection_name)
+        return self.answer_cache.lookup(cache_embedding, max_chunks, kb_version), cache_embedding, kb_version
+    
+    def _urgency_level(self, query: str) -> str:
+        return self._select_prompt(query, self.response_processor.detect_emergency_keywords(query))[1]
+    
+    def _select_prompt(self, query: str, emergency_analysis: Dict[str, Any]):
+        """Pick the prompt template and urgency level for a query"""
+        if emergency_analysis["is_emergency"]:
+            return self.prompt_templates.get_emergency_prompt(), "emergency"
+        if "symptom" in query.lower():
+            urgency_level = "high" if any(word in query.lower() for word in ["severe", "acute", "sudden"]) else "routine"
+            return self.prompt_templates.get_symptom_analysis_prompt(), urgency_level
+        if any(word in query.lower() for word in ["treatment", "medication", "therapy"]):
+            return self.prompt_templates.get_treatment_info_prompt(), "routine"
+        return self.prompt_templates.get_medical_qa_prompt(), "routine"
+    
+    def _pack_context(self, query: str, prompt_template, documents: List[Document]) -> PackedContext:
+        """Fit the retrieved chunks into what the prompt budget leaves after the template and question"""
+        fixed_text = "\n".join(str(message.content) for message in prompt_template.format_messages(context="", question=query))
+        packed = self.context_packer.pack(documents, fixed_text)
+        rag_logger.debug(
+            f"📦 Packed {len(packed.documents)}/{len(documents)} chunks into {packed.tokens['total']} tokens "
+            f"({packed.trimmed} trimmed, {packed.dropped} dropped)"
+        )
+        return packed
+    
+    def _finalize_response(self,
+                           query: str,
+                           response_text: str,
+                           documents: List[Document],
+                           urgency_level: str,
+                           emergency_analysis: Dict[str, Any],
+                           start_time: float,
+                           max_chunks: int,
+                           cache_embedding: Optional[List[float]] = None,
+                           kb_version: Optional[str] = None) -> Dict[str, Any]:
+        """Post-process generated text into the response payload (shared by the blocking and streaming paths)"""
+        sources = [doc.metadata.get("source", "Unknown") for doc in documents]
+        
+        # Step 5: Post-process response
+        cleaned_response = self.response_processor.clean_response_text(response_text)
+        
+        # Step 6: Add safety disclaimers
+        final_response = self.response_processor.add_safety_disclaimers(
+            cleaned_response, urgency_level
+        )
+        
+        # Step 7: Format with sources and metadata
+        generation_time = time.time() - start_time
+        metadata = {
+            "model_used": self.model_name,
+            "generation_time": generation_time,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        formatted_response = self.response_processor.format_medical_response(
+            final_response, sources, metadata
+        )
+        
+        # Step 8: Validate safety
+        safety_validation = self.response_processor.validate_response_safety(formatted_response)
+        
+        result = {
+            "success": True,
+            "query": query,
+            "response": formatted_response,
+            "sources": list(set(sources)),
+            "urgency_level": urgency_level,
+            "chunks_used": len(documents),
+            "generation_time": generation_time,
+            "model_used": self.model_name,
+            "safety_validated": safety_validation["is_safe"],
+            "emergency_detected": emergency_analysis["is_emergency"],
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        if cache_embedding is not None and safety_validation["is_safe"]:
+            self.answer_cache.store(query, cache_embedding, max_chunks, dict(result), kb_version)
+        
+        rag_logger.info(f"✅ Generated safe medical response in {generation_time:.2f}s")
+        return result
+    
     async def _generate_with_gemini(self, query: str, context: str, prompt_template) -> str:
         """Generate response using Gemini LLM"""
         try:
@@ -143,14 +313,49 @@ class GeminiMedicalGenerator:
             )
             
             # Generate response with Gemini
-            response = await self.llm.ainvoke(messages)
+            response = await self.llm_scheduler.ainvoke(self.llm, messages)
             
             return response.content
+        
+        except Exception as e:
+            rag_logger.error(f"Gemini API error: {e}")
+            raise
+    
+    async def _stream_with_gemini(self, query: str, context: str, prompt_template) -> AsyncIterator[str]:
+        """Relay Gemini output as it is generated"""
+        try:
+            messages = prompt_template.format_messages(
+                context=context,
+                question=query
+            )
             
+            async for chunk in self.llm_scheduler.astream(self.llm, messages):
+                if chunk.content:
+                    yield chunk.content
+        
         except Exception as e:
             rag_logger.error(f"Gemini API error: {e}")
             raise
     
+    def _create_cached_response(self,
+                                entry: Dict[str, Any],
+                                query: str,
+                                similarity: float,
+                                start_time: float) -> Dict[str, Any]:
+        """Re-stamp a cached answer for the current query"""
+        result = dict(entry["result"])
+        result.update({
+            "query": query,
+            "generation_time": time.time() - start_time,
+            "timestamp": datetime.now().isoformat(),
+            "cache_hit": True,
+            "cached_query": entry["query"],
+            "cache_similarity": round(similarity, 4)
+        })
+        
+        rag_logger.info(f"⚡ Semantic cache hit ({similarity:.3f}) for: {query[:50]}...")
+        return result
+    
     def _create_fallback_response(self, query: str, error_message: str) -> Dict[str, Any]:
         """Create safe fallback response when generation fails"""
         
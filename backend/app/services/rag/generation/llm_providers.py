@@ -0,0 +1,164 @@
+import re
+import time
+import random
+import asyncio
+import hashlib
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+try:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+except ImportError:
+    ChatGoogleGenerativeAI = None
+
+try:
+    from langchain_groq import ChatGroq
+except ImportError:
+    ChatGroq = None
+
+DEFAULT_MODELS = {
+    "gemini": "gemini-1.5-flash",
+    "groq": "Gemma2-9b-It",
+    "stub": "stub"
+}
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline stand-in for a hosted chat model, for load tests and benchmarks.
+
+    The reply is pseudo-random words drawn from the prompt, seeded by the
+    prompt itself, so the same prompt always gets the same text. Timing
+    mimics a hosted model: latency_ms before the first token, then
+    tokens_per_second while streaming (one word counts as one token).
+    """
+    
+    latency_ms: float = 200.0
+    tokens_per_second: float = 50.0
+    response_tokens: int = 150
+    
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+    
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "tokens_per_second": self.tokens_per_second,
+            "response_tokens": self.response_tokens
+        }
+    
+    def _reply_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        words = re.findall(r"[A-Za-z]{3,}", prompt)[-200:] or ["stub"]
+        seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest(), "little")
+        rng = random.Random(seed)
+        
+        tokens = []
+        for index in range(self.response_tokens):
+            word = rng.choice(words).lower()
+            if index % 12 == 0:
+                word = word.capitalize()
+            end = "." if index % 12 == 11 or index == self.response_tokens - 1 else ""
+            tokens.append(f"{word}{end} ")
+        return tokens
+    
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+    
+    def _result(self, messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        input_tokens = sum(len(str(message.content).split()) for message in messages)
+        message = AIMessage(
+            content="".join(tokens).strip(),
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": len(tokens),
+                "total_tokens": input_tokens + len(tokens)
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._reply_tokens(messages)
+        time.sleep(self.latency_ms / 1000 + len(tokens) * self._token_delay())
+        return self._result(messages, tokens)
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._reply_tokens(messages)
+        await asyncio.sleep(self.latency_ms / 1000 + len(tokens) * self._token_delay())
+        return self._result(messages, tokens)
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_ms / 1000)
+        for token in self._reply_tokens(messages):
+            time.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        for token in self._reply_tokens(messages):
+            await asyncio.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+def llm_model_name(provider: str = None) -> str:
+    """Model the configured provider uses (llm_model_name, or the provider's default)"""
+    provider = provider or settings.llm_provider
+    if provider == settings.llm_provider and settings.llm_model_name:
+        return settings.llm_model_name
+    return DEFAULT_MODELS[provider]
+
+def create_chat_model(provider: str = None,
+                      model_name: str = None,
+                      generation_params: Optional[Dict[str, Any]] = None) -> BaseChatModel:
+    """
+    Build the chat model for a provider ("gemini", "groq" or "stub"), defaulting to Settings.llm_provider.
+
+    generation_params (temperature, max_tokens) are passed to the client;
+    None uses llm_temperature/llm_max_tokens, and a key left out keeps the
+    client's own default.
+    """
+    provider = provider or settings.llm_provider
+    if provider not in DEFAULT_MODELS:
+        raise ValueError(f"Unknown LLM provider: {provider} (expected one of {', '.join(DEFAULT_MODELS)})")
+    model_name = model_name or llm_model_name(provider)
+    if generation_params is None:
+        generation_params = {"temperature": settings.llm_temperature, "max_tokens": settings.llm_max_tokens}
+    
+    if provider == "gemini":
+        if ChatGoogleGenerativeAI is None:
+            raise ImportError("langchain-google-genai is required for llm_provider='gemini'")
+        if not settings.google_api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables")
+        llm = ChatGoogleGenerativeAI(
+            model=model_name,
+            google_api_key=settings.google_api_key,
+            convert_system_message_to_human=True,  # Gemini compatibility
+            **generation_params
+        )
+    elif provider == "groq":
+        if ChatGroq is None:
+            raise ImportError("langchain-groq is required for llm_provider='groq'")
+        llm = ChatGroq(
+            model=model_name,
+            api_key=settings.groq_api_key,
+            **generation_params
+        )
+    else:
+        llm = StubChatModel(
+            latency_ms=settings.stub_llm_latency_ms,
+            tokens_per_second=settings.stub_llm_tokens_per_second,
+            response_tokens=settings.stub_llm_response_tokens
+        )
+    
+    rag_logger.info(f"✅ LLM ready: {provider}/{model_name}")
+    return llm
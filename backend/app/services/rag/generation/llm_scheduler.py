@@ -0,0 +1,307 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional, AsyncIterator
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+class LLMDeadlineExceeded(Exception):
+    """Raised when an LLM call cannot finish (including queueing and retries) before its deadline"""
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """429 / quota errors, whichever client raised them"""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "resource exhausted" in message or "rate limit" in message or "quota" in message
+
+def is_retryable_error(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)) or is_rate_limit_error(error):
+        return True
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ("503", "unavailable", "timed out", "deadline exceeded", "connection"))
+
+class AdaptiveTokenBucket:
+    """
+    Token-bucket rate limit whose rate adapts to the provider (AIMD).
+
+    A 429 halves the rate and empties the bucket; each success adds back 5%
+    of the configured rate, so throughput recovers gradually instead of
+    immediately bursting into the limit again. Waiters are served in order.
+    """
+    
+    def __init__(self, rate: float, burst: int, min_rate: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def available(self) -> bool:
+        self._refill()
+        return self._tokens >= 1
+    
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def on_rate_limited(self):
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * 0.5)
+        self._tokens = min(self._tokens, 0.0)
+    
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+class LLMScheduler:
+    """
+    Shared gate for outbound LLM calls.
+
+    Every call takes a concurrency slot and a rate token, runs under a
+    per-attempt timeout and an overall deadline, and is retried with full
+    jitter backoff on 429s, timeouts and transient server errors. A
+    non-streaming call still running after hedge_after_ms gets one duplicate
+    request if a slot and a token are free; the first to succeed wins and the
+    other is cancelled. Streams are retried only before their first chunk and
+    are never hedged.
+    """
+    
+    def __init__(self,
+                 max_concurrency: int = None,
+                 rate_per_second: float = None,
+                 burst: int = None,
+                 timeout_seconds: float = None,
+                 deadline_seconds: float = None,
+                 max_retries: int = None,
+                 hedge_after_ms: float = None):
+        self.max_concurrency = max_concurrency or settings.llm_max_concurrency
+        rate = settings.llm_rate_limit_per_second if rate_per_second is None else rate_per_second
+        self.timeout_seconds = timeout_seconds or settings.llm_timeout_seconds
+        self.deadline_seconds = deadline_seconds or settings.llm_deadline_seconds
+        self.max_retries = settings.llm_max_retries if max_retries is None else max_retries
+        self.hedge_after_ms = settings.llm_hedge_after_ms if hedge_after_ms is None else hedge_after_ms
+        
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = AdaptiveTokenBucket(
+            rate, burst or settings.llm_rate_burst, settings.llm_rate_limit_min_per_second
+        ) if rate > 0 else None
+        self._latencies = deque(maxlen=1000)
+        
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.deadline_exceeded = 0
+        self.hedged = 0
+        self.hedges_won = 0
+        self.in_flight = 0
+        self.waiting = 0
+    
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.deadline_exceeded += 1
+            raise LLMDeadlineExceeded(f"LLM call exceeded its {self.deadline_seconds:.0f}s deadline")
+        return remaining
+    
+    async def _acquire(self, deadline: float):
+        """Take a concurrency slot and then a rate token, both before the deadline"""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self._remaining(deadline))
+            try:
+                if self._bucket is not None:
+                    await asyncio.wait_for(self._bucket.acquire(), self._remaining(deadline))
+            except BaseException:
+                self._semaphore.release()
+                raise
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            raise LLMDeadlineExceeded(f"No LLM capacity within the {self.deadline_seconds:.0f}s deadline")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+    
+    def _release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+    
+    def _record_failure(self, error: Exception):
+        if is_rate_limit_error(error):
+            self.rate_limited += 1
+            if self._bucket is not None:
+                self._bucket.on_rate_limited()
+        elif isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+    
+    async def _backoff(self, error: Exception, attempt: int, deadline: float) -> bool:
+        """Sleep before the next attempt; False when the error is final"""
+        if isinstance(error, LLMDeadlineExceeded) or attempt >= self.max_retries or not is_retryable_error(error):
+            return False
+        delay = random.uniform(0, min(settings.llm_retry_max_seconds, settings.llm_retry_base_seconds * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        
+        self.retries += 1
+        rag_logger.warning(f"⚠️ LLM call failed ({type(error).__name__}), retry {attempt + 1} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        return True
+    
+    async def _invoke_once(self, llm: BaseChatModel, messages: List[BaseMessage], deadline: float):
+        await self._acquire(deadline)
+        try:
+            return await asyncio.wait_for(llm.ainvoke(messages), min(self.timeout_seconds, self._remaining(deadline)))
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        finally:
+            self._release()
+    
+    def _can_hedge(self) -> bool:
+        # Only hedge into spare capacity, never queue behind other requests
+        return not self._semaphore.locked() and (self._bucket is None or self._bucket.available())
+    
+    async def _invoke_hedged(self, llm: BaseChatModel, messages: List[BaseMessage], deadline: float):
+        if self.hedge_after_ms <= 0:
+            return await self._invoke_once(llm, messages, deadline)
+        
+        primary = asyncio.ensure_future(self._invoke_once(llm, messages, deadline))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after_ms / 1000)
+            if done or not self._can_hedge():
+                return await primary
+            
+            self.hedged += 1
+            hedge = asyncio.ensure_future(self._invoke_once(llm, messages, deadline))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def ainvoke(self, llm: BaseChatModel, messages: List[BaseMessage]):
+        """llm.ainvoke(messages) under the concurrency cap, rate limit, deadline and retry policy"""
+        self.calls += 1
+        start = time.monotonic()
+        deadline = start + self.deadline_seconds
+        attempt = 0
+        while True:
+            try:
+                response = await self._invoke_hedged(llm, messages, deadline)
+            except Exception as e:
+                if await self._backoff(e, attempt, deadline):
+                    attempt += 1
+                    continue
+                self.failed += 1
+                raise
+            
+            self._on_success(start)
+            return response
+    
+    async def astream(self, llm: BaseChatModel, messages: List[BaseMessage]) -> AsyncIterator[Any]:
+        """llm.astream(messages) with the same limits; the slot is held until the stream ends"""
+        self.calls += 1
+        start = time.monotonic()
+        deadline = start + self.deadline_seconds
+        attempt = 0
+        while True:
+            await self._acquire(deadline)
+            started = False
+            stream = llm.astream(messages).__aiter__()
+            try:
+                while True:
+                    # The timeout applies to each wait for the next chunk, so long answers are not cut off
+                    try:
+                        chunk = await asyncio.wait_for(
+                            stream.__anext__(), min(self.timeout_seconds, self._remaining(deadline))
+                        )
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._record_failure(e)
+                if not started and await self._backoff(e, attempt, deadline):
+                    attempt += 1
+                    continue
+                self.failed += 1
+                raise
+            finally:
+                self._release()
+                if hasattr(stream, "aclose"):
+                    await stream.aclose()
+            
+            self._on_success(start)
+            return
+    
+    def _on_success(self, start: float):
+        self.succeeded += 1
+        self._latencies.append(time.monotonic() - start)
+        if self._bucket is not None:
+            self._bucket.on_success()
+    
+    def stats(self) -> Dict[str, Any]:
+        latencies = np.array(self._latencies) * 1000 if self._latencies else None
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rate_per_second": round(self._bucket.rate, 3) if self._bucket else None,
+            "calls": self.calls,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "timeouts": self.timeouts,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedged": self.hedged,
+            "hedges_won": self.hedges_won,
+            "latency_p50_ms": round(float(np.percentile(latencies, 50)), 1) if latencies is not None else None,
+            "latency_p95_ms": round(float(np.percentile(latencies, 95)), 1) if latencies is not None else None
+        }
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_llm_scheduler() -> LLMScheduler:
+    """One scheduler per worker process, shared by all generators"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
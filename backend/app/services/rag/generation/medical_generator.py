@@ -1,4 +1,5 @@
 import time
+import asyncio
 from typing import Dict, Any
 
 from app.services.rag.ingestion.ingestion_pipeline import IngestionPipeline
@@ -13,10 +14,10 @@ class MedicalGenerator:
         
         try:
             # Generate query embedding
-            query_embedding = self.pipeline.embedding_manager.embed_single_text(query)
+            query_embedding = await asyncio.to_thread(self.pipeline.embedding_manager.embed_single_text, query)
             
             # Search for relevant documents
-            search_results = self.pipeline.vector_store.search_similar(
+            search_results = await self.pipeline.vector_store.asearch_similar(
                 query_embedding.tolist(),
                 limit=max_chunks
             )
@@ -0,0 +1,129 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed on query meaning rather than exact text.
+
+    Query embeddings of answered questions sit in a preallocated matrix; a
+    lookup is one matrix-vector product against it, and the best match is
+    returned when its cosine similarity clears the threshold and it was
+    answered with the same max_chunks. Entries expire after ttl_seconds, the
+    least recently used entry is evicted when full, and everything is dropped
+    when the knowledge-base version changes.
+    """
+    
+    def __init__(self,
+                 max_entries: int = None,
+                 threshold: float = None,
+                 ttl_seconds: float = None,
+                 dimension: int = None):
+        self.max_entries = max_entries or settings.semantic_cache_max_entries
+        self.threshold = settings.semantic_cache_threshold if threshold is None else threshold
+        self.ttl_seconds = settings.semantic_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.dimension = dimension or settings.embedding_dimension
+        
+        self._vectors = np.zeros((self.max_entries, self.dimension), dtype=np.float32)
+        self._max_chunks = np.full(self.max_entries, -1, dtype=np.int32)  # -1 marks a free slot
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._kb_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+    
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _check_version(self, kb_version: str):
+        if kb_version != self._kb_version:
+            if self._entries:
+                rag_logger.info("Knowledge base changed, clearing semantic answer cache")
+            self._clear()
+            self._kb_version = kb_version
+    
+    def _clear(self):
+        self._entries.clear()
+        self._max_chunks[:] = -1
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+    
+    def _release(self, slot: int):
+        del self._entries[slot]
+        self._max_chunks[slot] = -1
+        self._free_slots.append(slot)
+    
+    def lookup(self, embedding: List[float], max_chunks: int, kb_version: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return (cached result, similarity) for the closest answered query, or None"""
+        vector = self._normalize(embedding)
+        
+        with self._lock:
+            self._check_version(kb_version)
+            if not self._entries:
+                self.misses += 1
+                return None
+            
+            similarities = self._vectors @ vector
+            similarities[self._max_chunks != max_chunks] = -np.inf
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            
+            entry = self._entries[slot]
+            if self.ttl_seconds and time.monotonic() - entry["created_at"] > self.ttl_seconds:
+                self._release(slot)
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return entry, similarity
+    
+    def store(self, query: str, embedding: List[float], max_chunks: int, result: Dict[str, Any], kb_version: str):
+        vector = self._normalize(embedding)
+        
+        with self._lock:
+            self._check_version(kb_version)
+            if not self._free_slots:
+                oldest_slot = next(iter(self._entries))
+                self._release(oldest_slot)
+                self.evictions += 1
+            
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._max_chunks[slot] = max_chunks
+            self._entries[slot] = {
+                "query": query,
+                "result": result,
+                "created_at": time.monotonic()
+            }
+    
+    def record_bypass(self):
+        self.bypassed += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Dict, Any, Hashable, Callable, Awaitable, Tuple
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one execution.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is in flight await the same task instead of repeating it. Each
+    caller awaits through asyncio.shield, so a disconnecting client cancels
+    only its own wait, not the work the others are sharing. The key is
+    released as soon as the task finishes: results are not cached.
+    """
+    
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run fn() once per in-flight key; returns (result, whether it was shared)"""
+        self.calls += 1
+        task = self._in_flight.get(key)
+        shared = task is not None
+        
+        if shared:
+            self.collapsed += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        
+        return await asyncio.shield(task), shared
+    
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved when every caller has gone away
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._in_flight),
+            "collapse_rate": round(self.collapsed / self.calls, 4) if self.calls else 0.0
+        }
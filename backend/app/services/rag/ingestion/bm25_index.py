@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import math
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Iterable
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+INDEX_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its me my of on or
+should so than that the their them then there these they this to was what when where which who why
+will with you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms without stopwords; a trailing plural 's' is dropped"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+class BM25Index:
+    """
+    Persistent BM25 inverted index over ingested chunks.
+
+    Postings map each term to (document number, term frequency) pairs and are
+    stored with the chunk text and metadata, so lexical hits can be returned
+    as Documents without a vector store round trip. Removed chunks become
+    tombstones that are compacted away when the index is saved. Scoring is
+    vectorized per query term with numpy.
+    """
+    
+    def __init__(self, collection_name: str = None, index_dir: Path = None):
+        self.collection_name = collection_name or settings.qdrant_collection_name
+        index_dir = Path(index_dir or settings.cache_path)
+        self.path = index_dir / f"bm25_{self.collection_name}.json"
+        self.k1 = settings.bm25_k1
+        self.b = settings.bm25_b
+        
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._loaded_mtime_ns: Optional[int] = None
+        self._reset_state()
+        self.load()
+    
+    def _reset_state(self):
+        self._point_ids: List[Optional[str]] = []  # Document number -> point ID (None once removed)
+        self._documents: List[Optional[Dict[str, Any]]] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[List[int]]] = {}
+        self._numbers: Dict[str, int] = {}  # Live point ID -> document number
+        self._arrays = None  # Lazily built numpy view of the postings
+    
+    def __len__(self) -> int:
+        return len(self._numbers)
+    
+    def load(self):
+        if not self.path.exists():
+            return
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                rag_logger.info("BM25 index is from another version, ignoring it")
+                return
+            
+            with self._lock:
+                self._reset_state()
+                self._point_ids = data["point_ids"]
+                self._documents = data["documents"]
+                self._lengths = data["lengths"]
+                self._postings = data["postings"]
+                self._numbers = {point_id: number for number, point_id in enumerate(self._point_ids)}
+                self._loaded_mtime_ns = self.path.stat().st_mtime_ns
+            rag_logger.info(f"✅ Loaded BM25 index {self.collection_name} ({len(self)} chunks, {len(self._postings)} terms)")
+        except Exception as e:
+            rag_logger.error(f"❌ Failed to load BM25 index: {e}")
+            self._reset_state()
+    
+    def _maybe_reload(self):
+        """Pick up an index another process saved since we loaded it"""
+        if self._dirty or not self.path.exists():
+            return
+        if self.path.stat().st_mtime_ns != self._loaded_mtime_ns:
+            self.load()
+    
+    def reset(self):
+        with self._lock:
+            self._reset_state()
+            self._dirty = True
+    
+    def add_documents(self, point_ids: List[str], documents: List[Document]):
+        with self._lock:
+            for point_id, document in zip(point_ids, documents):
+                if point_id in self._numbers:
+                    continue  # Same ID means same source and content
+                
+                terms: Dict[str, int] = {}
+                for term in tokenize(document.page_content):
+                    terms[term] = terms.get(term, 0) + 1
+                
+                number = len(self._point_ids)
+                self._numbers[point_id] = number
+                self._point_ids.append(point_id)
+                self._documents.append({"text": document.page_content, "metadata": document.metadata})
+                self._lengths.append(sum(terms.values()))
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, []).append([number, frequency])
+            
+            self._arrays = None
+            self._dirty = True
+    
+    def remove(self, point_ids: Iterable[str]):
+        with self._lock:
+            for point_id in point_ids:
+                number = self._numbers.pop(str(point_id), None)
+                if number is not None:
+                    self._point_ids[number] = None
+                    self._documents[number] = None
+                    self._dirty = True
+            self._arrays = None
+    
+    def _compact(self):
+        """Drop tombstones and renumber documents"""
+        renumber = {}
+        for number, point_id in enumerate(self._point_ids):
+            if point_id is not None:
+                renumber[number] = len(renumber)
+        if len(renumber) == len(self._point_ids):
+            return
+        
+        self._point_ids = [self._point_ids[number] for number in renumber]
+        self._documents = [self._documents[number] for number in renumber]
+        self._lengths = [self._lengths[number] for number in renumber]
+        postings = {}
+        for term, entries in self._postings.items():
+            kept = [[renumber[number], frequency] for number, frequency in entries if number in renumber]
+            if kept:
+                postings[term] = kept
+        self._postings = postings
+        self._numbers = {point_id: number for number, point_id in enumerate(self._point_ids)}
+        self._arrays = None
+    
+    def save(self):
+        """Compact and write atomically"""
+        with self._lock:
+            if not self._dirty:
+                return
+            
+            self._compact()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".json.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": INDEX_VERSION,
+                    "point_ids": self._point_ids,
+                    "documents": self._documents,
+                    "lengths": self._lengths,
+                    "postings": self._postings
+                }, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            self._loaded_mtime_ns = self.path.stat().st_mtime_ns
+            self._dirty = False
+            rag_logger.info(f"💾 Saved BM25 index {self.collection_name} ({len(self)} chunks)")
+    
+    def _build_arrays(self):
+        live = np.array([point_id is not None for point_id in self._point_ids], dtype=bool)
+        lengths = np.asarray(self._lengths, dtype=np.float32)
+        average_length = float(lengths[live].mean()) if live.any() else 1.0
+        # Per-document length normalization of the BM25 denominator
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / max(average_length, 1e-9))
+        postings = {
+            term: (np.array([entry[0] for entry in entries], dtype=np.int64),
+                   np.array([entry[1] for entry in entries], dtype=np.float32))
+            for term, entries in self._postings.items()
+        }
+        self._arrays = (live, length_norm, postings)
+    
+    def search(self,
+               query: str,
+               k: int = 10,
+               filter_fn: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Dict[str, Any]]:
+        """Top-k chunks by BM25 score as dicts with id, score and payload"""
+        terms = set(tokenize(query))
+        
+        with self._lock:
+            self._maybe_reload()
+            if not terms or not self._numbers:
+                return []
+            if self._arrays is None:
+                self._build_arrays()
+            live, length_norm, postings = self._arrays
+            
+            total = len(self._numbers)
+            scores = np.zeros(len(self._point_ids), dtype=np.float32)
+            for term in terms:
+                if term not in postings:
+                    continue
+                numbers, frequencies = postings[term]
+                document_frequency = int(live[numbers].sum())
+                if not document_frequency:
+                    continue
+                idf = math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+                scores[numbers] += idf * frequencies * (self.k1 + 1) / (frequencies + length_norm[numbers])
+            
+            scores[~live] = 0.0
+            candidates = np.flatnonzero(scores > 0)
+            if filter_fn is not None:
+                candidates = np.array([number for number in candidates if filter_fn(self._documents[number])], dtype=np.int64)
+            if not len(candidates):
+                return []
+            
+            best = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+            return [
+                {"id": self._point_ids[number], "score": float(scores[number]), "payload": self._documents[number]}
+                for number in best
+            ]
+
+_indexes: Dict[str, BM25Index] = {}
+_indexes_lock = threading.Lock()
+
+def get_bm25_index(collection_name: str = None) -> BM25Index:
+    """One BM25 index per collection, shared by ingestion and retrieval in this process"""
+    collection_name = collection_name or settings.qdrant_collection_name
+    with _indexes_lock:
+        index = _indexes.get(collection_name)
+        if index is None:
+            index = BM25Index(collection_name)
+            _indexes[collection_name] = index
+        return index
@@ -1,22 +1,51 @@
-from typing import List
+from typing import List, Iterable, Iterator
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
 from app.config import settings
+from app.services.rag.ingestion.medical_chunker import MedicalSectionChunker
 from app.services.rag.utils.logging_config import rag_logger
 
+# Bump when chunk boundaries or chunk metadata change so unchanged files are re-chunked on re-ingestion
+CHUNKING_VERSION = 4
+
 class ChunkingStrategy:
     def __init__(self):
         self.chunk_size = settings.chunk_size
         self.chunk_overlap = settings.chunk_overlap
+        self.medical_chunker = MedicalSectionChunker(self.chunk_size, self.chunk_overlap)
     
     def chunk_documents(self, documents: List[Document], strategy: str = "medical") -> List[Document]:
         if strategy == "medical":
             return self._medical_chunking(documents)
+        elif strategy == "medical_langchain":
+            return self._langchain_medical_chunking(documents)
         else:
             return self._default_chunking(documents)
     
-    def _medical_chunking(self, documents: List[Document]) -> List[Document]:
+    def iter_chunks(self, documents: Iterable[Document], strategy: str = "medical") -> Iterator[Document]:
+        """Chunk documents one at a time, keeping chunk ids consistent with chunk_documents"""
+        if strategy == "medical":
+            text_splitter = self.medical_chunker
+        elif strategy == "medical_langchain":
+            text_splitter = self._build_medical_splitter()
+        else:
+            text_splitter = self._build_default_splitter()
+        
+        chunk_id = 0
+        for document in documents:
+            chunks = text_splitter.split_documents([document])
+            if strategy in ("medical", "medical_langchain"):
+                for chunk in chunks:
+                    chunk.metadata.update({
+                        'chunk_id': chunk_id,
+                        'chunking_strategy': strategy
+                    })
+                    chunk_id += 1
+            
+            yield from chunks
+    
+    def _build_medical_splitter(self) -> RecursiveCharacterTextSplitter:
         medical_separators = [
             "\n\nSYMPTOMS:",
             "\n\nTREATMENT:",
@@ -29,13 +58,21 @@ class ChunkingStrategy:
             " "
         ]
         
-        text_splitter = RecursiveCharacterTextSplitter(
+        return RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             separators=medical_separators
         )
-        
-        chunks = text_splitter.split_documents(documents)
+    
+    def _build_default_splitter(self) -> RecursiveCharacterTextSplitter:
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap
+        )
+    
+    def _medical_chunking(self, documents: List[Document]) -> List[Document]:
+        """Single-pass, section-aware chunking with section names and offsets in metadata"""
+        chunks = self.medical_chunker.split_documents(documents)
         
         for i, chunk in enumerate(chunks):
             chunk.metadata.update({
@@ -46,12 +83,22 @@ class ChunkingStrategy:
         rag_logger.info(f"Created {len(chunks)} medical chunks")
         return chunks
     
-    def _default_chunking(self, documents: List[Document]) -> List[Document]:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap
-        )
+    def _langchain_medical_chunking(self, documents: List[Document]) -> List[Document]:
+        """Previous RecursiveCharacterTextSplitter-based medical chunking"""
+        text_splitter = self._build_medical_splitter()
+        chunks = text_splitter.split_documents(documents)
         
+        for i, chunk in enumerate(chunks):
+            chunk.metadata.update({
+                'chunk_id': i,
+                'chunking_strategy': 'medical_langchain'
+            })
+        
+        rag_logger.info(f"Created {len(chunks)} medical chunks (LangChain splitter)")
+        return chunks
+    
+    def _default_chunking(self, documents: List[Document]) -> List[Document]:
+        text_splitter = self._build_default_splitter()
         chunks = text_splitter.split_documents(documents)
         rag_logger.info(f"Created {len(chunks)} default chunks")
         return chunks
@@ -1,41 +1,153 @@
-from typing import List
+from typing import List, Dict, Any, Tuple, Iterator, Optional
+import re
 import json
+import multiprocessing
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from langchain_core.documents import Document
 
+from app.config import settings
 from app.services.rag.utils.logging_config import rag_logger
 
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    import docx
+except ImportError:
+    docx = None
+
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+def _load_file_in_worker(file_path: str) -> Tuple[List[Tuple[str, Dict[str, Any]]], Optional[str]]:
+    """Process pool entry point; returns (content, metadata) tuples, which pickle much faster than Documents, and any load error"""
+    loader = DocumentLoader(parallel=False)
+    documents = loader.load_file(file_path)
+    return [(doc.page_content, doc.metadata) for doc in documents], loader.failed_files.get(file_path)
+
 class DocumentLoader:
+    def __init__(self, parallel: Optional[bool] = None, max_workers: Optional[int] = None):
+        self.parallel = settings.loader_parallel if parallel is None else parallel
+        self.max_workers = max_workers or settings.loader_max_workers
+        # Files that could not be loaded in full, with the reason; their documents may be incomplete
+        self.failed_files: Dict[str, str] = {}
+    
     def load_documents(self, file_paths: List[str]) -> List[Document]:
-        documents = []
+        return list(self.iter_documents(file_paths))
+    
+    def iter_documents(self, file_paths: List[str]) -> Iterator[Document]:
+        """Yield documents file by file so only one file is held in memory; failures go to failed_files"""
+        self.failed_files = {}
+        if self.parallel and len(file_paths) > 1:
+            yield from self._iter_documents_parallel(file_paths)
+            return
         
-        for file_path in file_paths:
-            try:
-                path = Path(file_path)
-                
-                if not path.exists():
-                    rag_logger.warning(f"File not found: {file_path}")
-                    continue
-                
-                if path.suffix == '.json':
-                    docs = self._load_json(file_path)
-                elif path.suffix == '.csv':
-                    docs = self._load_csv(file_path)
-                elif path.suffix == '.txt':
-                    docs = self._load_text(file_path)
+        large_files = [file_path for file_path in file_paths if self._parse_in_worker(file_path)]
+        if not large_files:
+            for file_path in file_paths:
+                yield from self.iter_file(file_path)
+            return
+        
+        # Large PDF/DOCX files are parsed in worker processes while smaller
+        # files stream inline; results are still yielded in input order
+        max_workers = min(self.max_workers, len(large_files))
+        with self._process_pool(max_workers) as executor:
+            futures = {file_path: executor.submit(_load_file_in_worker, file_path) for file_path in large_files}
+            for file_path in file_paths:
+                if file_path in futures:
+                    yield from self._to_documents(file_path, futures[file_path].result())
                 else:
-                    rag_logger.warning(f"Unsupported file type: {path.suffix}")
-                    continue
-                
-                documents.extend(docs)
-                rag_logger.info(f"✅ Loaded {len(docs)} documents from {path.name}")
-                
-            except Exception as e:
-                rag_logger.error(f"❌ Failed to load {file_path}: {e}")
-                continue
+                    yield from self.iter_file(file_path)
+    
+    def _iter_documents_parallel(self, file_paths: List[str]) -> Iterator[Document]:
+        """Fan files out over a process pool; map() keeps output in input order"""
+        max_workers = min(self.max_workers, len(file_paths))
+        rag_logger.info(f"Loading {len(file_paths)} files with {max_workers} worker processes")
         
-        return documents
+        with self._process_pool(max_workers) as executor:
+            for file_path, result in zip(file_paths, executor.map(_load_file_in_worker, file_paths)):
+                yield from self._to_documents(file_path, result)
+    
+    @staticmethod
+    def _process_pool(max_workers: int) -> ProcessPoolExecutor:
+        # spawn: the API process already holds torch/tokenizer threads, which a fork would copy in an unsafe state
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    
+    def _to_documents(self,
+                      file_path: str,
+                      result: Tuple[List[Tuple[str, Dict[str, Any]]], Optional[str]]) -> Iterator[Document]:
+        records, error = result
+        if error is not None:
+            self.failed_files[file_path] = error
+        for page_content, metadata in records:
+            yield Document(page_content=page_content, metadata=metadata)
+    
+    def _parse_in_worker(self, file_path: str) -> bool:
+        path = Path(file_path)
+        if path.suffix not in ('.pdf', '.docx') or not path.exists():
+            return False
+        
+        size_mb = path.stat().st_size / (1024 * 1024)
+        return settings.loader_process_threshold_mb <= size_mb <= settings.max_file_size_mb
+    
+    def load_file(self, file_path: str) -> List[Document]:
+        return list(self.iter_file(file_path))
+    
+    def iter_file(self, file_path: str) -> Iterator[Document]:
+        """
+        Lazily yield the documents of a single file (pages/sections for PDF, DOCX and Markdown).
+
+        Missing, oversized and unsupported files yield nothing and a parse
+        error ends the file early; either way the file is recorded in
+        failed_files, since the documents yielded so far (if any) are not
+        its full content.
+        """
+        path = Path(file_path)
+        count = 0
+        
+        try:
+            if not path.exists():
+                rag_logger.warning(f"File not found: {file_path}")
+                self.failed_files[file_path] = "File not found"
+                return
+            
+            size_mb = path.stat().st_size / (1024 * 1024)
+            if size_mb > settings.max_file_size_mb:
+                message = f"{size_mb:.1f} MB exceeds max_file_size_mb ({settings.max_file_size_mb} MB)"
+                rag_logger.warning(f"Skipping {path.name}: {message}")
+                self.failed_files[file_path] = message
+                return
+            
+            if path.suffix == '.json':
+                docs = self._load_json(file_path)
+            elif path.suffix == '.csv':
+                docs = self._load_csv(file_path)
+            elif path.suffix == '.txt':
+                docs = self._load_text(file_path)
+            elif path.suffix == '.md':
+                docs = self._iter_markdown(file_path)
+            elif path.suffix == '.pdf':
+                docs = self._iter_pdf(file_path)
+            elif path.suffix == '.docx':
+                docs = self._iter_docx(file_path)
+            else:
+                rag_logger.warning(f"Unsupported file type: {path.suffix}")
+                self.failed_files[file_path] = f"Unsupported file type: {path.suffix}"
+                return
+            
+            for doc in docs:
+                count += 1
+                yield doc
+            
+            rag_logger.info(f"✅ Loaded {count} documents from {path.name}")
+        
+        except Exception as e:
+            rag_logger.error(f"❌ Failed to load {file_path} after {count} documents: {e}")
+            self.failed_files[file_path] = str(e)
     
     def _load_json(self, file_path: str) -> List[Document]:
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -58,19 +170,36 @@ class DocumentLoader:
         return documents
     
     def _load_csv(self, file_path: str) -> List[Document]:
-        df = pd.read_csv(file_path)
         documents = []
         
-        for _, row in df.iterrows():
-            content = ' '.join([str(val) for val in row.values if pd.notna(val)])
-            doc = Document(
-                page_content=content,
-                metadata={'source': file_path, 'row_index': row.name}
+        # Read in row chunks so very large CSVs never need a full DataFrame in memory
+        for frame in pd.read_csv(file_path, chunksize=settings.csv_chunk_rows):
+            contents = self._join_row_values(frame)
+            documents.extend(
+                Document(
+                    page_content=content,
+                    metadata={'source': file_path, 'row_index': row_index}
+                )
+                for row_index, content in zip(frame.index.tolist(), contents.tolist())
             )
-            documents.append(doc)
         
         return documents
     
+    @staticmethod
+    def _join_row_values(frame: pd.DataFrame) -> pd.Series:
+        """Space-join each row's non-null values column by column instead of row by row"""
+        joined = pd.Series("", index=frame.index, dtype=object)
+        has_value = np.zeros(len(frame), dtype=bool)
+        
+        for column in frame.columns:
+            values = frame[column]
+            present = values.notna().to_numpy()
+            separator = np.where(has_value & present, " ", "")
+            joined = joined + separator + values.astype(str).where(present, "")
+            has_value |= present
+        
+        return joined
+    
     def _load_text(self, file_path: str) -> List[Document]:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
@@ -81,3 +210,104 @@ class DocumentLoader:
         )
         
         return [doc]
+    
+    def _iter_markdown(self, file_path: str) -> Iterator[Document]:
+        """One document per heading section, reading the file line by line"""
+        section_title = None
+        section_index = 0
+        in_code_block = False
+        lines: List[str] = []
+        
+        def make_document() -> Optional[Document]:
+            content = "".join(lines).strip()
+            if not content:
+                return None
+            return Document(
+                page_content=content,
+                metadata={
+                    'source': file_path,
+                    'section': section_title or 'introduction',
+                    'section_index': section_index
+                }
+            )
+        
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.lstrip().startswith("```"):
+                    in_code_block = not in_code_block
+                
+                heading = None if in_code_block else MARKDOWN_HEADING.match(line)
+                if heading:
+                    doc = make_document()
+                    if doc:
+                        yield doc
+                        section_index += 1
+                    section_title = heading.group(2)
+                    lines = [line]
+                else:
+                    lines.append(line)
+        
+        doc = make_document()
+        if doc:
+            yield doc
+    
+    def _iter_pdf(self, file_path: str) -> Iterator[Document]:
+        """One document per page; pypdf only parses a page when it is accessed"""
+        if PdfReader is None:
+            raise RuntimeError("pypdf is not installed")
+        
+        reader = PdfReader(file_path)
+        total_pages = len(reader.pages)
+        
+        for page_number, page in enumerate(reader.pages, 1):
+            content = (page.extract_text() or "").strip()
+            if not content:
+                continue
+            
+            yield Document(
+                page_content=content,
+                metadata={'source': file_path, 'page': page_number, 'total_pages': total_pages}
+            )
+    
+    def _iter_docx(self, file_path: str) -> Iterator[Document]:
+        """One document per heading-delimited section"""
+        if docx is None:
+            raise RuntimeError("python-docx is not installed")
+        
+        word_document = docx.Document(file_path)
+        section_title = None
+        section_index = 0
+        paragraphs: List[str] = []
+        
+        def make_document() -> Optional[Document]:
+            content = "\n".join(paragraphs).strip()
+            if not content:
+                return None
+            return Document(
+                page_content=content,
+                metadata={
+                    'source': file_path,
+                    'section': section_title or 'introduction',
+                    'section_index': section_index
+                }
+            )
+        
+        for paragraph in word_document.paragraphs:
+            text = paragraph.text.strip()
+            if not text:
+                continue
+            
+            style_name = paragraph.style.name if paragraph.style is not None else ""
+            if style_name.startswith("Heading") or style_name == "Title":
+                doc = make_document()
+                if doc:
+                    yield doc
+                    section_index += 1
+                section_title = text
+                paragraphs = [text]
+            else:
+                paragraphs.append(text)
+        
+        doc = make_document()
+        if doc:
+            yield doc
@@ -1,25 +1,33 @@
 from typing import List
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from langchain_core.embeddings import Embeddings
 from app.config import settings
+from app.services.rag.ingestion.embedding_pool import EmbeddingPool
+from app.services.rag.utils.embedding_cache import get_embedding_cache
+from app.services.rag.utils.model_registry import model_registry
 from app.services.rag.utils.logging_config import rag_logger
 
 class EmbeddingManager:
     def __init__(self):
         self.model_name = settings.embedding_model_name
+        self.backend = settings.embedding_backend
         self.model = None
+        self.pool = None
         self._initialize_model()
+        
+        if settings.embedding_num_workers > 1:
+            self.pool = EmbeddingPool(self.model_name, settings.embedding_num_workers, self.backend)
     
     def _initialize_model(self):
         try:
-            rag_logger.info(f"Loading embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
+            rag_logger.info(f"Loading embedding model: {self.model_name} ({self.backend} backend)")
+            self.model = model_registry.get_embedding_model(self.model_name, self.backend)
             rag_logger.info("✅ Embedding model loaded successfully")
         except Exception as e:
             rag_logger.error(f"❌ Failed to load embedding model: {e}")
             raise
     
-    def embed_texts(self, texts: List[str]) -> np.ndarray:
+    def embed_texts(self, texts: List[str], show_progress_bar: bool = True) -> np.ndarray:
         if not self.model:
             raise ValueError("Embedding model not initialized")
         
@@ -27,17 +35,49 @@ class EmbeddingManager:
             return np.array([])
         
         try:
-            embeddings = self.model.encode(
-                texts,
-                batch_size=settings.embedding_batch_size,
-                show_progress_bar=True,
-                convert_to_numpy=True
-            )
+            cache = get_embedding_cache(self.cache_key, settings.embedding_dimension)
+            if cache:
+                embeddings = cache.encode(
+                    texts,
+                    lambda missing: self._encode(missing, show_progress_bar)
+                )
+            else:
+                embeddings = self._encode(texts, show_progress_bar)
+            
             rag_logger.info(f"Generated embeddings for {len(texts)} texts")
             return embeddings
         except Exception as e:
             rag_logger.error(f"Embedding generation failed: {e}")
             raise
     
+    @property
+    def cache_key(self) -> str:
+        """Quantized vectors differ slightly from torch ones, so they get their own cache"""
+        if self.backend == "onnx" and settings.embedding_onnx_quantize:
+            return f"{self.model_name}@onnx-int8"
+        return self.model_name
+    
+    def _encode(self, texts: List[str], show_progress_bar: bool) -> np.ndarray:
+        if self.pool and len(texts) >= settings.embedding_pool_min_texts:
+            return self.pool.encode(texts)
+        return self.model.encode(
+            texts,
+            batch_size=settings.embedding_batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True
+        )
+    
     def embed_single_text(self, text: str) -> np.ndarray:
         return self.embed_texts([text])[0]
+
+class ManagerEmbeddings(Embeddings):
+    """LangChain Embeddings adapter so vector stores reuse the shared EmbeddingManager"""
+    
+    def __init__(self, embedding_manager: EmbeddingManager):
+        self.embedding_manager = embedding_manager
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding_manager.embed_texts(texts, show_progress_bar=False).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedding_manager.embed_texts([text], show_progress_bar=False)[0].tolist()
@@ -0,0 +1,85 @@
+import os
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+def _init_worker(model_name: str, backend: str, quantize: bool, torch_threads: int):
+    global _worker_model
+    
+    import torch
+    torch.set_num_threads(torch_threads)  # Keep workers from oversubscribing the cores
+    
+    if backend == "onnx":
+        from app.services.rag.ingestion.onnx_embedder import OnnxEmbedder
+        _worker_model = OnnxEmbedder(model_name, quantize=quantize)
+    else:
+        from sentence_transformers import SentenceTransformer
+        _worker_model = SentenceTransformer(model_name, device="cpu")
+
+def _encode_shard(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(
+        _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True),
+        dtype=np.float32
+    )
+
+class EmbeddingPool:
+    """
+    Encodes large text batches across worker processes, each holding its own model copy.
+
+    Texts are cut into contiguous shards that are handed out to the workers;
+    executor.map returns shard results in submission order, so stacking them
+    restores the input order. The pool starts lazily and is reused across calls.
+    """
+    
+    def __init__(self,
+                 model_name: str,
+                 num_workers: int,
+                 backend: str = None,
+                 shard_size: int = None,
+                 batch_size: int = None):
+        self.model_name = model_name
+        self.num_workers = num_workers
+        self.backend = backend or settings.embedding_backend
+        self.shard_size = shard_size or settings.embedding_pool_shard_size
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        atexit.register(self.shutdown)
+    
+    def start(self):
+        if self._executor is not None:
+            return
+        
+        torch_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        rag_logger.info(
+            f"Starting embedding pool: {self.num_workers} workers x {torch_threads} threads ({self.model_name})"
+        )
+        # spawn: forking a process that already holds torch/tokenizer threads is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name, self.backend, settings.embedding_onnx_quantize, torch_threads)
+        )
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, settings.embedding_dimension), dtype=np.float32)
+        
+        self.start()
+        shards = [texts[start:start + self.shard_size] for start in range(0, len(texts), self.shard_size)]
+        results = self._executor.map(_encode_shard, shards, [self.batch_size] * len(shards))
+        return np.vstack(list(results))
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,456 @@
+import os
+import json
+import atexit
+import asyncio
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.rag.ingestion.vectorstore_manager import VectorStoreManager
+from app.services.rag.utils.logging_config import rag_logger
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+INDEX_VERSION = 1
+
+class FaissVectorStoreManager:
+    """
+    In-process FAISS index with the same API as VectorStoreManager.
+
+    Each collection lives in its own directory: the FAISS index (HNSW, IVF
+    or flat, inner product over normalized vectors), the raw vectors as
+    .npy, and a JSON file with the point ID and payload of every row. Both
+    binary files are memory-mapped on load; mapped IVF lists are copied into
+    memory on the first write. FAISS row numbers are the
+    internal IDs; deleted or replaced rows become tombstones that searches
+    skip, and the index is rebuilt from the live rows once tombstones pass
+    faiss_compact_ratio. Changes are written to disk by flush().
+    """
+    
+    content_hash = staticmethod(VectorStoreManager.content_hash)
+    compute_point_id = staticmethod(VectorStoreManager.compute_point_id)
+    
+    def __init__(self, collection_name: str = None, index_dir: Path = None):
+        if faiss is None:
+            raise RuntimeError("faiss is not installed")
+        
+        self.collection_name = collection_name or settings.qdrant_collection_name
+        self.dimension = settings.embedding_dimension
+        self.index_type = settings.faiss_index_type
+        self.directory = Path(index_dir or settings.faiss_index_path) / self.collection_name
+        self.index_path = self.directory / "index.faiss"
+        self.vectors_path = self.directory / "vectors.npy"
+        self.meta_path = self.directory / "meta.json"
+        
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._loaded_mtime_ns: Optional[int] = None
+        self._reset_state()
+        self._load()
+        atexit.register(self.flush)
+    
+    def _reset_state(self):
+        self.index = None
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._point_ids: List[Optional[str]] = []  # Row -> point ID (None once deleted)
+        self._payloads: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}  # Live point ID -> row
+        self._indexed_rows = 0  # Rows [0, _indexed_rows) are in self.index
+        self._index_mapped = False  # IVF lists still memory-mapped, hence read-only
+    
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    
+    def _load(self):
+        if not self.meta_path.exists():
+            return
+        
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION or meta.get("dimension") != self.dimension:
+                rag_logger.warning(f"⚠️ FAISS index for {self.collection_name} has another layout, ignoring it")
+                return
+            
+            self._point_ids = meta["point_ids"]
+            self._payloads = meta["payloads"]
+            self._rows = {point_id: row for row, point_id in enumerate(self._point_ids) if point_id is not None}
+            self._vectors = np.load(self.vectors_path, mmap_mode="r")
+            
+            if meta.get("index_type") == self.index_type and self.index_path.exists():
+                self.index = faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP)
+                self._indexed_rows = self.index.ntotal
+                self._index_mapped = hasattr(self.index, "nprobe")
+                self._configure_search(self.index)
+            else:
+                self._rebuild_index()
+            
+            self._loaded_mtime_ns = self.meta_path.stat().st_mtime_ns
+            rag_logger.info(f"✅ Loaded FAISS index {self.collection_name} ({len(self._rows)} points)")
+        except Exception as e:
+            rag_logger.error(f"❌ Failed to load FAISS index {self.collection_name}: {e}")
+            self._reset_state()
+    
+    def _maybe_reload(self):
+        """Pick up an index another process wrote since we loaded it"""
+        if self._dirty or not self.meta_path.exists():
+            return
+        if self.meta_path.stat().st_mtime_ns != self._loaded_mtime_ns:
+            self._reset_state()
+            self._load()
+    
+    def flush(self):
+        """Write index, vectors and metadata atomically (each via a temp file + rename)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._catch_up_index()
+                
+                tmp_index = self.index_path.with_suffix(".faiss.tmp")
+                faiss.write_index(self.index, str(tmp_index))
+                os.replace(tmp_index, self.index_path)
+                
+                tmp_vectors = self.directory / "vectors.tmp.npy"
+                np.save(tmp_vectors, np.ascontiguousarray(self._vectors))
+                os.replace(tmp_vectors, self.vectors_path)
+                
+                tmp_meta = self.meta_path.with_suffix(".json.tmp")
+                with open(tmp_meta, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        "version": INDEX_VERSION,
+                        "dimension": self.dimension,
+                        "index_type": self.index_type,
+                        "point_ids": self._point_ids,
+                        "payloads": self._payloads
+                    }, f, ensure_ascii=False)
+                os.replace(tmp_meta, self.meta_path)
+                
+                self._loaded_mtime_ns = self.meta_path.stat().st_mtime_ns
+                self._dirty = False
+                rag_logger.info(f"💾 Saved FAISS index {self.collection_name} ({len(self._rows)} points)")
+            except Exception as e:
+                rag_logger.error(f"❌ Failed to save FAISS index: {e}")
+                raise
+    
+    # ------------------------------------------------------------------
+    # Index construction
+    # ------------------------------------------------------------------
+    
+    def _new_index(self, training_vectors: np.ndarray):
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dimension, settings.faiss_hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = settings.faiss_hnsw_ef_construction
+        elif self.index_type == "ivf":
+            nlist = self._ivf_nlist(len(training_vectors))
+            if len(training_vectors) < self._ivf_min_points(nlist):
+                # IVF needs enough points per list to train; small corpora are searched exactly
+                return faiss.IndexFlatIP(self.dimension)
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(np.ascontiguousarray(training_vectors))
+        elif self.index_type == "flat":
+            index = faiss.IndexFlatIP(self.dimension)
+        else:
+            raise ValueError(f"Unknown FAISS index type: {self.index_type}")
+        
+        self._configure_search(index)
+        return index
+    
+    @staticmethod
+    def _ivf_nlist(num_vectors: int) -> int:
+        return settings.faiss_ivf_nlist or max(int(4 * np.sqrt(max(num_vectors, 1))), 1)
+    
+    @staticmethod
+    def _ivf_min_points(nlist: int) -> int:
+        return max(nlist * 39, 1000)
+    
+    @staticmethod
+    def _configure_search(index):
+        if hasattr(index, "hnsw"):
+            index.hnsw.efSearch = settings.faiss_hnsw_ef_search
+        if hasattr(index, "nprobe"):
+            index.nprobe = settings.faiss_ivf_nprobe
+    
+    def _rebuild_index(self):
+        """Rebuild from live rows only, dropping tombstones"""
+        live_rows = [row for row, point_id in enumerate(self._point_ids) if point_id is not None]
+        self._vectors = np.ascontiguousarray(self._vectors[live_rows], dtype=np.float32)
+        self._point_ids = [self._point_ids[row] for row in live_rows]
+        self._payloads = [self._payloads[row] for row in live_rows]
+        self._rows = {point_id: row for row, point_id in enumerate(self._point_ids)}
+        
+        self.index = self._new_index(self._vectors)
+        if len(self._vectors):
+            self.index.add(self._vectors)
+        self._indexed_rows = len(self._vectors)
+        self._index_mapped = False
+    
+    def _own_index(self):
+        """
+        Copy memory-mapped IVF lists into memory before the first write.
+
+        FAISS maps them read-only, so adding to them fails, and writing them
+        back out stores a reference to the mapped file rather than the lists.
+        """
+        if not self._index_mapped:
+            return
+        ivf = faiss.extract_index_ivf(self.index)
+        mapped = ivf.invlists
+        invlists = faiss.ArrayInvertedLists(ivf.nlist, ivf.code_size)
+        for list_no in range(ivf.nlist):
+            size = mapped.list_size(list_no)
+            if size:
+                invlists.add_entries(list_no, size, mapped.get_ids(list_no), mapped.get_codes(list_no))
+        ivf.replace_invlists(invlists, True)
+        invlists.this.disown()  # Now owned by the index
+        self._index_mapped = False
+    
+    def _catch_up_index(self):
+        """Add rows appended since the last index update"""
+        if self.index is None:
+            self._rebuild_index()
+            return
+        self._own_index()
+        if (self.index_type == "ivf" and not hasattr(self.index, "nprobe")
+                and len(self._rows) >= self._ivf_min_points(self._ivf_nlist(len(self._rows)))):
+            rag_logger.info(f"FAISS index {self.collection_name} is large enough for IVF, retraining")
+            self._rebuild_index()
+            return
+        if self._indexed_rows < len(self._vectors):
+            self.index.add(np.ascontiguousarray(self._vectors[self._indexed_rows:]))
+            self._indexed_rows = len(self._vectors)
+    
+    def _maybe_compact(self):
+        tombstones = len(self._point_ids) - len(self._rows)
+        if tombstones and tombstones >= settings.faiss_compact_ratio * len(self._point_ids):
+            rag_logger.info(f"Compacting FAISS index {self.collection_name} ({tombstones} deleted rows)")
+            self._rebuild_index()
+    
+    # ------------------------------------------------------------------
+    # VectorStoreManager API
+    # ------------------------------------------------------------------
+    
+    def health_check(self) -> bool:
+        return self.index is not None or not self.meta_path.exists()
+    
+    async def ahealth_check(self) -> bool:
+        return self.health_check()
+    
+    def create_collection(self, recreate: bool = False) -> bool:
+        with self._lock:
+            if recreate:
+                rag_logger.info(f"Recreating FAISS index: {self.collection_name}")
+                self._reset_state()
+                self._dirty = True
+            if self.index is None:
+                self.index = self._new_index(self._vectors)
+                self._dirty = True
+            return True
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+    
+    def add_documents(self, documents: List[Document], embeddings: List[List[float]]) -> List[str]:
+        if len(documents) != len(embeddings):
+            raise ValueError("Documents and embeddings count mismatch")
+        
+        try:
+            vectors = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(documents), self.dimension))
+            document_ids = []
+            new_rows = []
+            
+            with self._lock:
+                for doc, vector in zip(documents, vectors):
+                    point_id = self.compute_point_id(doc)
+                    document_ids.append(point_id)
+                    payload = {
+                        "text": doc.page_content,
+                        "metadata": doc.metadata,
+                        "source": doc.metadata.get("source", "unknown"),
+                        "content_hash": self.content_hash(doc.page_content)
+                    }
+                    
+                    # Upsert: an unchanged point only refreshes its payload
+                    row = self._rows.get(point_id)
+                    if row is not None:
+                        self._payloads[row] = payload
+                        continue
+                    
+                    self._rows[point_id] = len(self._point_ids)
+                    self._point_ids.append(point_id)
+                    self._payloads.append(payload)
+                    new_rows.append(vector)
+                
+                if new_rows:
+                    self._vectors = np.concatenate([self._vectors, np.asarray(new_rows, dtype=np.float32)])
+                    self._catch_up_index()
+                self._dirty = True
+            
+            rag_logger.info(f"✅ Added {len(documents)} documents to FAISS index")
+            return document_ids
+        except Exception as e:
+            rag_logger.error(f"❌ Failed to add documents: {e}")
+            raise
+    
+    def delete_documents(self, point_ids: List[str]) -> int:
+        if not point_ids:
+            return 0
+        
+        with self._lock:
+            deleted = 0
+            for point_id in point_ids:
+                row = self._rows.pop(str(point_id), None)
+                if row is not None:
+                    self._point_ids[row] = None
+                    self._payloads[row] = None
+                    deleted += 1
+            
+            if deleted:
+                self._dirty = True
+                self._maybe_compact()
+        
+        rag_logger.info(f"🗑️ Deleted {deleted} stale documents from FAISS index")
+        return deleted
+    
+    def search(self,
+               query_embedding: List[float],
+               k: int = 5,
+               filter_fn: Optional[Callable[[Dict[str, Any]], bool]] = None,
+               with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """k best live points as dicts with id, score, payload (and vector), optionally filtered by payload"""
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))
+        
+        with self._lock:
+            self._maybe_reload()
+            if not self._rows:
+                return []
+            
+            if filter_fn is not None:
+                # Exact scan over matching rows; filtered subsets are small
+                rows = np.array([row for row in self._rows.values() if filter_fn(self._payloads[row])], dtype=np.int64)
+                if not len(rows):
+                    return []
+                scores = np.asarray(self._vectors[rows]) @ query[0]
+                best = np.argsort(-scores)[:k]
+                hits = [(int(rows[i]), float(scores[i])) for i in best]
+            else:
+                self._catch_up_index()
+                tombstones = len(self._point_ids) - len(self._rows)
+                scores, rows = self.index.search(query, min(k + tombstones, self.index.ntotal))
+                hits = [
+                    (int(row), float(score))
+                    for row, score in zip(rows[0], scores[0])
+                    if row != -1 and self._point_ids[row] is not None
+                ][:k]
+            
+            results = []
+            for row, score in hits:
+                result = {"id": self._point_ids[row], "score": score, "payload": self._payloads[row]}
+                if with_vectors:
+                    result["vector"] = np.array(self._vectors[row], dtype=np.float32)
+                results.append(result)
+            return results
+    
+    def search_batch(self,
+                     query_embeddings: List[List[float]],
+                     k: int = 5,
+                     filter_fns: Optional[List[Optional[Callable[[Dict[str, Any]], bool]]]] = None) -> List[List[Dict[str, Any]]]:
+        """search() for many queries; the unfiltered ones share a single index.search call"""
+        filter_fns = filter_fns or [None] * len(query_embeddings)
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        unfiltered = [i for i, filter_fn in enumerate(filter_fns) if filter_fn is None]
+        
+        with self._lock:
+            self._maybe_reload()
+            if not self._rows:
+                return results
+            
+            if unfiltered:
+                self._catch_up_index()
+                queries = self._normalize(np.asarray([query_embeddings[i] for i in unfiltered], dtype=np.float32))
+                tombstones = len(self._point_ids) - len(self._rows)
+                scores, rows = self.index.search(queries, min(k + tombstones, self.index.ntotal))
+                for i, query_rows, query_scores in zip(unfiltered, rows, scores):
+                    hits = [
+                        (int(row), float(score))
+                        for row, score in zip(query_rows, query_scores)
+                        if row != -1 and self._point_ids[row] is not None
+                    ][:k]
+                    results[i] = [
+                        {"id": self._point_ids[row], "score": score, "payload": self._payloads[row]}
+                        for row, score in hits
+                    ]
+            
+            for i, filter_fn in enumerate(filter_fns):
+                if filter_fn is not None:
+                    results[i] = self.search(query_embeddings[i], k, filter_fn)
+        return results
+    
+    def get_vectors(self, point_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored (normalized) vectors of the given live points"""
+        with self._lock:
+            self._maybe_reload()
+            return {
+                point_id: np.array(self._vectors[self._rows[point_id]], dtype=np.float32)
+                for point_id in point_ids
+                if point_id in self._rows
+            }
+    
+    def search_similar(self, query_embedding: List[float], limit: int = 5) -> List[Dict[str, Any]]:
+        try:
+            return [
+                {
+                    "id": result["id"],
+                    "score": result["score"],
+                    "text": result["payload"].get("text", ""),
+                    "source": result["payload"].get("source", "")
+                }
+                for result in self.search(query_embedding, limit)
+            ]
+        except Exception as e:
+            rag_logger.error(f"❌ Search failed: {e}")
+            return []
+    
+    async def asearch_similar(self, query_embedding: List[float], limit: int = 5) -> List[Dict[str, Any]]:
+        """In-process search is CPU-bound, so it runs on a worker thread instead of the event loop"""
+        return await asyncio.to_thread(self.search_similar, query_embedding, limit)
+    
+    async def aget_collection_info(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.get_collection_info)
+    
+    def get_collection_info(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_reload()
+            return {
+                "name": self.collection_name,
+                "points_count": len(self._rows),
+                "vector_size": self.dimension,
+                "index_type": self.index_type,
+                "deleted_rows": len(self._point_ids) - len(self._rows)
+            }
+
+_stores: Dict[str, FaissVectorStoreManager] = {}
+_stores_lock = threading.Lock()
+
+def get_faiss_store(collection_name: str = None) -> FaissVectorStoreManager:
+    """One index instance per collection, shared by ingestion and retrieval in this process"""
+    collection_name = collection_name or settings.qdrant_collection_name
+    with _stores_lock:
+        store = _stores.get(collection_name)
+        if store is None:
+            store = FaissVectorStoreManager(collection_name)
+            _stores[collection_name] = store
+        return store
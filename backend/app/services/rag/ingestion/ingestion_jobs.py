@@ -0,0 +1,146 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+from app.services.rag.ingestion.ingestion_pipeline import IngestionPipeline
+from app.services.rag.ingestion.ingestion_progress import IngestionProgress
+from app.services.rag.utils.logging_config import rag_logger
+
+@dataclass
+class IngestionJob:
+    """One submitted ingestion request and its live state"""
+    job_id: str
+    file_paths: List[str]
+    chunking_strategy: str
+    recreate_collection: bool
+    streaming: bool
+    status: str = "queued"  # queued, running, completed, failed, cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: IngestionProgress = field(default_factory=IngestionProgress)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    future: Optional[Future] = field(default=None, repr=False)
+    
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "file_paths": self.file_paths,
+            "chunking_strategy": self.chunking_strategy,
+            "recreate_collection": self.recreate_collection,
+            "streaming": self.streaming,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress.to_dict(),
+            "result": self.result,
+            "error": self.error
+        }
+
+class IngestionJobManager:
+    """
+    Runs ingestion jobs in the background, one at a time.
+
+    A single worker thread serializes jobs so two ingestions never write the
+    same collection and manifest concurrently; queued jobs wait their turn.
+    Finished jobs are kept in a bounded history for status polling.
+    """
+    
+    def __init__(self, pipeline: IngestionPipeline, max_history: int = 50):
+        self.pipeline = pipeline
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingestion")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def submit(self,
+               file_paths: List[str],
+               chunking_strategy: str = "medical",
+               recreate_collection: bool = False,
+               streaming: bool = False) -> IngestionJob:
+        job = IngestionJob(
+            job_id=str(uuid.uuid4()),
+            file_paths=list(file_paths),
+            chunking_strategy=chunking_strategy,
+            recreate_collection=recreate_collection,
+            streaming=streaming
+        )
+        
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        
+        job.future = self._executor.submit(self._run, job)
+        rag_logger.info(f"📥 Queued ingestion job {job.job_id[:8]} ({len(job.file_paths)} files)")
+        return job
+    
+    def _run(self, job: IngestionJob) -> Dict[str, Any]:
+        if job.progress.cancelled:
+            job.status = "cancelled"
+            job.progress.stage = "cancelled"
+            job.finished_at = time.time()
+            job.result = {"success": False, "cancelled": True, "error": "Ingestion cancelled", "processing_time": 0.0}
+            return job.result
+        
+        job.status = "running"
+        job.started_at = time.time()
+        
+        try:
+            result = self.pipeline.run_ingestion(
+                job.file_paths,
+                job.chunking_strategy,
+                job.recreate_collection,
+                job.streaming,
+                progress=job.progress
+            )
+        except Exception as e:
+            rag_logger.error(f"❌ Ingestion job {job.job_id[:8]} crashed: {e}")
+            result = {"success": False, "error": str(e), "processing_time": time.time() - job.started_at}
+        
+        job.result = result
+        job.error = result.get("error")
+        if result.get("cancelled"):
+            job.status = "cancelled"
+        else:
+            job.status = "completed" if result.get("success") else "failed"
+        job.finished_at = time.time()
+        
+        rag_logger.info(f"Ingestion job {job.job_id[:8]} {job.status}")
+        return result
+    
+    def _prune(self):
+        """Drop the oldest finished jobs once the history is full"""
+        if len(self._jobs) <= self.max_history:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done]:
+            if len(self._jobs) <= self.max_history:
+                break
+            del self._jobs[job_id]
+    
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def list(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+    
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """Request cancellation; a running job stops at its next batch boundary"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        
+        job.progress.cancel()
+        rag_logger.info(f"⏹️ Cancellation requested for ingestion job {job_id[:8]}")
+        return job
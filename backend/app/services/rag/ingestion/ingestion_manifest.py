@@ -0,0 +1,112 @@
+import json
+import os
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+MANIFEST_VERSION = 2  # v2 records each source's conditions
+
+class IngestionManifest:
+    """Tracks which sources (and which chunk point IDs) are already in the vector store"""
+    
+    def __init__(self, collection_name: str = None, manifest_dir: Path = None):
+        self.collection_name = collection_name or settings.qdrant_collection_name
+        manifest_dir = Path(manifest_dir or settings.cache_path)
+        manifest_dir.mkdir(parents=True, exist_ok=True)
+        self.path = manifest_dir / f"ingestion_manifest_{self.collection_name}.json"
+        self.data = self._empty()
+        self.load()
+    
+    def _empty(self) -> Dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "collection": self.collection_name,
+            "embedding_model": settings.embedding_model_name,
+            "sources": {}
+        }
+    
+    def load(self):
+        if not self.path.exists():
+            return
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            rag_logger.warning(f"⚠️ Ignoring unreadable ingestion manifest {self.path.name}: {e}")
+            return
+        
+        if data.get("version") != MANIFEST_VERSION or data.get("embedding_model") != settings.embedding_model_name:
+            rag_logger.info("Ingestion manifest is from another version/model, starting fresh")
+            return
+        
+        self.data = data
+    
+    def save(self):
+        """Write atomically so a crash mid-write never leaves a corrupt manifest"""
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+    
+    def reset(self):
+        self.data = self._empty()
+        self.save()
+    
+    @property
+    def sources(self) -> Dict[str, Dict[str, Any]]:
+        return self.data["sources"]
+    
+    def get_source(self, source: str) -> Optional[Dict[str, Any]]:
+        return self.sources.get(source)
+    
+    def get_point_ids(self, source: str) -> List[str]:
+        entry = self.get_source(source)
+        return entry["point_ids"] if entry else []
+    
+    def file_fingerprint(self, file_path: str) -> str:
+        """SHA-256 of the file, reusing the stored hash when size and mtime are unchanged"""
+        stat = Path(file_path).stat()
+        entry = self.get_source(file_path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry["fingerprint"]
+        
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def is_unchanged(self, file_path: str, fingerprint: str, chunking_signature: str) -> bool:
+        entry = self.get_source(file_path)
+        return bool(
+            entry
+            and entry.get("fingerprint") == fingerprint
+            and entry.get("chunking") == chunking_signature
+        )
+    
+    def known_conditions(self) -> List[str]:
+        """Every condition name recorded for the stored sources"""
+        conditions = set()
+        for entry in self.sources.values():
+            conditions.update(entry.get("conditions", []))
+        return sorted(conditions)
+    
+    def update_source(self,
+                      file_path: str,
+                      fingerprint: str,
+                      chunking_signature: str,
+                      point_ids: List[str],
+                      conditions: Optional[List[str]] = None):
+        stat = Path(file_path).stat()
+        self.sources[file_path] = {
+            "fingerprint": fingerprint,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "chunking": chunking_signature,
+            "point_ids": point_ids,
+            "conditions": conditions or []
+        }
@@ -1,68 +1,375 @@
 import time
-from typing import List, Dict, Any
+import queue
+import asyncio
+import threading
+from pathlib import Path
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
 from app.services.rag.ingestion.document_loader import DocumentLoader
-from app.services.rag.ingestion.chunking_strategies import ChunkingStrategy
-from app.services.rag.ingestion.embedding_manager import EmbeddingManager
-from app.services.rag.ingestion.vectorstore_manager import VectorStoreManager
+from app.services.rag.ingestion.chunking_strategies import ChunkingStrategy, CHUNKING_VERSION
+from app.services.rag.utils.model_registry import model_registry
+from app.services.rag.utils.kb_version import bump_kb_version
+from app.services.rag.ingestion.vectorstore_manager import create_vector_store_manager
+from app.services.rag.ingestion.bm25_index import get_bm25_index
+from app.services.rag.ingestion.ingestion_manifest import IngestionManifest
+from app.services.rag.ingestion.ingestion_progress import IngestionProgress, IngestionCancelled
 from app.services.rag.utils.logging_config import rag_logger
 
+_END_OF_STREAM = object()
+
+def _batched(items: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
 class IngestionPipeline:
     def __init__(self):
         self.document_loader = DocumentLoader()
         self.chunking_strategy = ChunkingStrategy()
-        self.embedding_manager = EmbeddingManager()
-        self.vector_store = VectorStoreManager()
+        self.embedding_manager = model_registry.get_embedding_manager()
+        self.vector_store = create_vector_store_manager()
+        self.manifest = IngestionManifest(self.vector_store.collection_name)
+        self.lexical_index = get_bm25_index(self.vector_store.collection_name) if settings.hybrid_search_enabled else None
     
     async def ingest_documents(self, 
                              file_paths: List[str],
                              chunking_strategy: str = "medical",
-                             recreate_collection: bool = False) -> Dict[str, Any]:
+                             recreate_collection: bool = False,
+                             streaming: bool = False) -> Dict[str, Any]:
+        """Run an ingestion on a worker thread so the event loop keeps serving requests"""
+        return await asyncio.to_thread(
+            self.run_ingestion,
+            file_paths,
+            chunking_strategy,
+            recreate_collection,
+            streaming
+        )
+    
+    def run_ingestion(self,
+                      file_paths: List[str],
+                      chunking_strategy: str = "medical",
+                      recreate_collection: bool = False,
+                      streaming: bool = False,
+                      progress: Optional[IngestionProgress] = None) -> Dict[str, Any]:
         
         start_time = time.time()
+        progress = progress or IngestionProgress()
+        progress.start(len(file_paths))
+        counts = self._new_counts()
+        files_skipped, chunks_deleted = 0, 0
+        failed_files: Dict[str, str] = {}
         rag_logger.info("🚀 Starting document ingestion pipeline")
         
+        def result(success: bool, **extra) -> Dict[str, Any]:
+            # Every outcome reports the same counts, so callers never have to guess which are present
+            return {
+                "success": success,
+                "processing_time": time.time() - start_time,
+                "files_processed": len(file_paths),
+                "files_skipped": files_skipped,
+                "files_failed": failed_files,
+                **counts,
+                "chunks_deleted": chunks_deleted,
+                **extra
+            }
+        
         try:
             # Step 1: Create collection
             self.vector_store.create_collection(recreate=recreate_collection)
+            if recreate_collection or not self.vector_store.get_collection_info().get("points_count"):
+                self.manifest.reset()
+            if self.lexical_index is not None:
+                if recreate_collection:
+                    self.lexical_index.reset()
+                elif not len(self.lexical_index) and self.manifest.sources:
+                    # Collection predates the BM25 index: re-ingest everything once to build it
+                    rag_logger.info("BM25 index missing, re-ingesting all sources to build it")
+                    self.manifest.reset()
             
-            # Step 2: Load documents
-            documents = self.document_loader.load_documents(file_paths)
-            if not documents:
-                return {
-                    "success": False,
-                    "error": "No documents loaded",
-                    "processing_time": time.time() - start_time
-                }
-            
-            # Step 3: Chunk documents
-            chunks = self.chunking_strategy.chunk_documents(documents, chunking_strategy)
-            
-            # Step 4: Generate embeddings
-            chunk_texts = [chunk.page_content for chunk in chunks]
-            embeddings = self.embedding_manager.embed_texts(chunk_texts)
+            # Step 2: Skip files that are unchanged since the last ingestion
+            chunking_signature = self._chunking_signature(chunking_strategy)
+            changed_files, fingerprints = self._find_changed_files(file_paths, chunking_signature)
+            files_skipped = len(file_paths) - len(changed_files)
+            progress.files_done = files_skipped
+            progress.check_cancelled()
             
-            # Step 5: Store in vector database
-            document_ids = self.vector_store.add_documents(chunks, embeddings.tolist())
+            if not changed_files:
+                progress.stage = "completed"
+                rag_logger.info(f"✅ All {files_skipped} files unchanged, nothing to ingest")
+                return result(True)
             
-            processing_time = time.time() - start_time
+            # Steps 3-6: Load, chunk, embed and store only new or changed chunks
+            seen_ids: Dict[str, Dict[str, Optional[str]]] = {}
+            try:
+                if streaming:
+                    self._ingest_streaming(changed_files, chunking_strategy, seen_ids, counts, progress)
+                else:
+                    self._ingest_batch(changed_files, chunking_strategy, seen_ids, counts, progress)
+            finally:
+                failed_files.update(self.document_loader.failed_files)
             
-            result = {
-                "success": True,
-                "processing_time": processing_time,
-                "files_processed": len(file_paths),
-                "documents_loaded": len(documents),
-                "chunks_created": len(chunks),
-                "documents_stored": len(document_ids)
-            }
+            # Step 7: Remove stale chunks and record what is now stored; files that
+            # failed to load are reported per file and keep their previous documents
+            progress.check_cancelled()
+            progress.stage = "finalizing"
+            progress.files_done = progress.files_total
+            chunks_deleted = self._finalize_sources(
+                changed_files, fingerprints, chunking_signature, seen_ids, failed_files
+            )
+            progress.stage = "completed"
             
-            rag_logger.info(f"✅ Ingestion completed in {processing_time:.2f} seconds")
-            return result
+            if failed_files:
+                rag_logger.warning(f"⚠️ {len(failed_files)} of {len(changed_files)} changed files failed to load")
+            rag_logger.info(f"✅ Ingestion completed in {time.time() - start_time:.2f} seconds")
+            return result(True)
             
+        except IngestionCancelled:
+            progress.stage = "cancelled"
+            rag_logger.warning("⏹️ Ingestion cancelled")
+            return result(False, cancelled=True, error="Ingestion cancelled")
         except Exception as e:
+            progress.stage = "failed"
             rag_logger.error(f"❌ Ingestion failed: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "processing_time": time.time() - start_time
-            }
+            return result(False, error=str(e))
+        finally:
+            # Partial runs may also have written points, so any change invalidates query caches
+            if recreate_collection or progress.documents_stored or chunks_deleted:
+                self.vector_store.flush()
+                if self.lexical_index is not None:
+                    self.lexical_index.save()
+                bump_kb_version(self.vector_store.collection_name)
+    
+    def _chunking_signature(self, chunking_strategy: str) -> str:
+        return (f"{chunking_strategy}:{self.chunking_strategy.chunk_size}:"
+                f"{self.chunking_strategy.chunk_overlap}:v{CHUNKING_VERSION}")
+    
+    def _find_changed_files(self, file_paths: List[str], chunking_signature: str):
+        changed_files = []
+        fingerprints = {}
+        
+        for file_path in file_paths:
+            if not Path(file_path).exists():
+                changed_files.append(file_path)  # Let the loader report it
+                continue
+            
+            fingerprint = self.manifest.file_fingerprint(file_path)
+            if self.manifest.is_unchanged(file_path, fingerprint, chunking_signature):
+                rag_logger.info(f"⏭️ Skipping unchanged file: {Path(file_path).name}")
+                continue
+            
+            fingerprints[file_path] = fingerprint
+            changed_files.append(file_path)
+        
+        return changed_files, fingerprints
+    
+    def _track_documents(self,
+                         documents: Iterable[Document],
+                         counts: Dict[str, int],
+                         progress: IngestionProgress) -> Iterator[Document]:
+        """Count loaded documents and finished files as documents stream past"""
+        current_source = None
+        
+        for document in documents:
+            progress.check_cancelled()
+            source = document.metadata.get("source")
+            if source != current_source:
+                if current_source is not None:
+                    progress.files_done += 1
+                current_source = source
+            
+            counts["documents_loaded"] += 1
+            progress.documents_loaded = counts["documents_loaded"]
+            yield document
+    
+    def _select_new_chunks(self,
+                           chunks: Iterable[Document],
+                           seen_ids: Dict[str, Dict[str, Optional[str]]],
+                           counts: Dict[str, int],
+                           progress: IngestionProgress) -> Iterator[Document]:
+        """Yield only chunks whose point ID is not already stored for their source"""
+        stored_ids: Dict[str, set] = {}
+        
+        for chunk in chunks:
+            counts["chunks_created"] += 1
+            progress.chunks_created = counts["chunks_created"]
+            source = chunk.metadata.get("source", "unknown")
+            point_id = self.vector_store.compute_point_id(chunk)
+            
+            source_ids = seen_ids.setdefault(source, {})
+            if point_id in source_ids:
+                continue  # Duplicate content within the same source
+            source_ids[point_id] = chunk.metadata.get("condition")
+            
+            if source not in stored_ids:
+                stored_ids[source] = set(self.manifest.get_point_ids(source))
+            if point_id in stored_ids[source]:
+                counts["chunks_unchanged"] += 1
+                continue
+            
+            yield chunk
+    
+    def _finalize_sources(self,
+                          changed_files: List[str],
+                          fingerprints: Dict[str, str],
+                          chunking_signature: str,
+                          seen_ids: Dict[str, Dict[str, Optional[str]]],
+                          failed_files: Dict[str, str]) -> int:
+        """Delete stale chunks and record each loaded file; failed or empty files are left as they were"""
+        chunks_deleted = 0
+        
+        for file_path in changed_files:
+            if file_path not in fingerprints:
+                continue
+            
+            if file_path in failed_files:
+                # Only part of the file was read: keep its previous points and manifest
+                # entry so it is retried, and drop the partial chunks stored this run
+                previous_ids = set(self.manifest.get_point_ids(file_path))
+                partial_ids = [point_id for point_id in seen_ids.get(file_path, {}) if point_id not in previous_ids]
+                self.vector_store.delete_documents(partial_ids)
+                if self.lexical_index is not None:
+                    self.lexical_index.remove(partial_ids)
+                rag_logger.warning(f"⚠️ {Path(file_path).name} failed to load, keeping its previous documents")
+                continue
+            
+            point_ids = list(seen_ids.get(file_path, {}))
+            if not point_ids:
+                rag_logger.warning(f"⚠️ {Path(file_path).name} produced no chunks, keeping its previous documents")
+                failed_files[file_path] = "No documents loaded"
+                continue
+            
+            stale_ids = set(self.manifest.get_point_ids(file_path)) - set(point_ids)
+            chunks_deleted += self.vector_store.delete_documents(list(stale_ids))
+            if self.lexical_index is not None:
+                self.lexical_index.remove(stale_ids)
+            conditions = sorted({
+                condition for condition in seen_ids[file_path].values()
+                if condition and condition != "unknown"
+            })
+            self.manifest.update_source(file_path, fingerprints[file_path], chunking_signature, point_ids, conditions)
+        
+        self.manifest.save()
+        return chunks_deleted
+    
+    def _store_chunks(self, chunks: List[Document], embeddings: np.ndarray) -> List[str]:
+        """Upsert chunks into the vector store and the BM25 index"""
+        document_ids = self.vector_store.add_documents(chunks, embeddings.tolist())
+        if self.lexical_index is not None:
+            self.lexical_index.add_documents(document_ids, chunks)
+        return document_ids
+    
+    def _new_counts(self) -> Dict[str, int]:
+        return {"documents_loaded": 0, "chunks_created": 0, "chunks_unchanged": 0, "documents_stored": 0}
+    
+    def _ingest_batch(self,
+                      file_paths: List[str],
+                      chunking_strategy: str,
+                      seen_ids: Dict[str, Dict[str, Optional[str]]],
+                      counts: Dict[str, int],
+                      progress: IngestionProgress):
+        # Load documents
+        documents = list(self._track_documents(
+            self.document_loader.iter_documents(file_paths), counts, progress
+        ))
+        if not documents:
+            return
+        
+        # Chunk documents and keep only new or changed chunks
+        progress.stage = "chunking"
+        chunks = self.chunking_strategy.chunk_documents(documents, chunking_strategy)
+        new_chunks = list(self._select_new_chunks(chunks, seen_ids, counts, progress))
+        if not new_chunks:
+            return
+        
+        # Generate embeddings in slices so progress and cancellation stay responsive
+        progress.stage = "embedding"
+        progress.chunks_to_embed = len(new_chunks)
+        embedded = []
+        for batch in _batched(new_chunks, settings.ingestion_batch_size):
+            progress.check_cancelled()
+            embedded.append(self.embedding_manager.embed_texts(
+                [chunk.page_content for chunk in batch],
+                show_progress_bar=False
+            ))
+            progress.embeddings_done += len(batch)
+        embeddings = np.vstack(embedded)
+        
+        # Store in vector database
+        progress.check_cancelled()
+        progress.stage = "storing"
+        document_ids = self._store_chunks(new_chunks, embeddings)
+        counts["documents_stored"] = len(document_ids)
+        progress.documents_stored = counts["documents_stored"]
+    
+    def _ingest_streaming(self,
+                          file_paths: List[str],
+                          chunking_strategy: str,
+                          seen_ids: Dict[str, Dict[str, Optional[str]]],
+                          counts: Dict[str, int],
+                          progress: IngestionProgress):
+        """
+        Run loader -> chunker -> embedder -> upserter over fixed-size batches.
+
+        Embedding happens on the calling thread while a single uploader thread
+        drains a bounded queue, so batch N is upserted while batch N+1 is being
+        embedded and at most `ingestion_queue_size` embedded batches are held
+        in memory at any time. Counts are updated in place as batches finish.
+        """
+        upload_queue: "queue.Queue" = queue.Queue(maxsize=max(1, settings.ingestion_queue_size))
+        upload_errors: List[Exception] = []
+        
+        def upload_worker():
+            while True:
+                item = upload_queue.get()
+                if item is _END_OF_STREAM:
+                    return
+                if upload_errors:
+                    continue  # Keep draining so the producer never blocks on a dead consumer
+                
+                batch, embeddings = item
+                try:
+                    document_ids = self._store_chunks(batch, embeddings)
+                    counts["documents_stored"] += len(document_ids)
+                    progress.documents_stored = counts["documents_stored"]
+                except Exception as e:
+                    upload_errors.append(e)
+        
+        uploader = threading.Thread(target=upload_worker, name="ingestion-upserter", daemon=True)
+        uploader.start()
+        
+        try:
+            progress.stage = "embedding"
+            documents = self._track_documents(self.document_loader.iter_documents(file_paths), counts, progress)
+            chunks = self.chunking_strategy.iter_chunks(documents, chunking_strategy)
+            new_chunks = self._select_new_chunks(chunks, seen_ids, counts, progress)
+            
+            for batch_number, batch in enumerate(_batched(new_chunks, settings.ingestion_batch_size), 1):
+                if upload_errors:
+                    break
+                
+                progress.check_cancelled()
+                embeddings = self.embedding_manager.embed_texts(
+                    [chunk.page_content for chunk in batch],
+                    show_progress_bar=False
+                )
+                progress.embeddings_done += len(batch)
+                upload_queue.put((batch, embeddings))
+                rag_logger.debug(f"Embedded batch {batch_number} ({len(batch)} chunks)")
+        finally:
+            upload_queue.put(_END_OF_STREAM)
+            uploader.join()
+        
+        if upload_errors:
+            raise upload_errors[0]
+        
+        rag_logger.info(
+            f"Streamed {counts['chunks_created']} chunks from {counts['documents_loaded']} documents"
+        )
@@ -0,0 +1,70 @@
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+
+class IngestionCancelled(Exception):
+    """Raised inside the pipeline when a running ingestion is cancelled"""
+
+@dataclass
+class IngestionProgress:
+    """Live counters for a running ingestion, updated by IngestionPipeline"""
+    files_total: int = 0
+    files_done: int = 0
+    documents_loaded: int = 0
+    chunks_created: int = 0
+    chunks_to_embed: Optional[int] = None  # Known up front in batch mode only
+    embeddings_done: int = 0
+    documents_stored: int = 0
+    stage: str = "queued"
+    started_at: Optional[float] = None
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    
+    def start(self, files_total: int):
+        self.files_total = files_total
+        self.started_at = time.time()
+        self.stage = "loading"
+    
+    def cancel(self):
+        self._cancel_event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+    
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise IngestionCancelled("Ingestion cancelled")
+    
+    def fraction_done(self) -> float:
+        if self.stage in ("completed", "finalizing"):
+            return 1.0
+        if self.chunks_to_embed:
+            return min(self.embeddings_done / self.chunks_to_embed, 1.0)
+        if self.files_total:
+            return min(self.files_done / self.files_total, 1.0)
+        return 0.0
+    
+    def elapsed_seconds(self) -> float:
+        return time.time() - self.started_at if self.started_at else 0.0
+    
+    def eta_seconds(self) -> Optional[float]:
+        fraction = self.fraction_done()
+        if not self.started_at or fraction <= 0.0 or fraction >= 1.0:
+            return None
+        return self.elapsed_seconds() * (1.0 - fraction) / fraction
+    
+    def to_dict(self) -> Dict[str, Any]:
+        eta = self.eta_seconds()
+        return {
+            "stage": self.stage,
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "documents_loaded": self.documents_loaded,
+            "chunks_created": self.chunks_created,
+            "embeddings_done": self.embeddings_done,
+            "documents_stored": self.documents_stored,
+            "progress": round(self.fraction_done(), 4),
+            "elapsed_seconds": round(self.elapsed_seconds(), 2),
+            "eta_seconds": round(eta, 2) if eta is not None else None
+        }
@@ -0,0 +1,167 @@
+import re
+import hashlib
+from typing import List, Tuple, Iterator
+
+from langchain_core.documents import Document
+
+from app.config import settings
+
+# Uppercase header lines ("SYMPTOMS:", "CAUSES AND RISK FACTORS:") and the
+# question-style headings MedlinePlus runs into the text ("...blood.What are
+# the symptoms of diabetes?Most people...") are matched in a single scan.
+# Every match starts with the newline/punctuation preceding the header so the
+# regex engine can skip ahead on its first-character set.
+_HEADER_BODY = (
+    r"(?:(?P<upper>[A-Z][A-Z0-9 &/,()'-]{2,60}):[ \t]*(?=\n|$)"
+    r"|(?P<question>(?:What|How|Who|Why|When|Can|Is|Are|Where|Which|Do|Does)\b[^.!?\n]{3,120}\?))"
+)
+SECTION_HEADER = re.compile(r"[\n.!?:]" + _HEADER_BODY)
+LEADING_HEADER = re.compile(_HEADER_BODY)
+
+SECTION_KEYWORDS = [
+    ("symptom", "symptoms"),
+    ("signs", "symptoms"),
+    ("treat", "treatment"),
+    ("medication", "treatment"),
+    ("therap", "treatment"),
+    ("manag", "treatment"),
+    ("cause", "causes"),
+    ("risk", "causes"),
+    ("trigger", "causes"),
+    ("more likely", "causes"),
+    ("prevent", "prevention"),
+    ("see a doctor", "when_to_see_doctor"),
+    ("see doctor", "when_to_see_doctor"),
+    ("emergency", "when_to_see_doctor"),
+    ("diagnos", "diagnosis"),
+    ("tests", "diagnosis"),
+    ("complication", "complications"),
+    ("types", "types"),
+]
+
+# Break points tried from the end of the window backwards, best first
+BREAK_SEPARATORS = ["\n\n", "\n", ". ", "? ", "! ", " "]
+
+def section_name(header: str, is_question: bool = False) -> str:
+    header_lower = header.lower()
+    for keyword, name in SECTION_KEYWORDS:
+        if keyword in header_lower:
+            return name
+    if header_lower.startswith(("what is", "what are")):
+        return "overview"
+    if is_question:
+        return "general"
+    return re.sub(r"[^a-z0-9]+", "_", header_lower).strip("_")[:40] or "general"
+
+class MedicalSectionChunker:
+    """
+    Section-aware chunker that scans each document once.
+
+    Section headers are located with one regex pass and kept as (start, end)
+    offsets into the original string; each section is then cut into windows
+    of at most chunk_size characters, breaking at the best separator found by
+    searching backwards inside the window. Chunks carry the detected section
+    name (medical_section), character offsets and the id of the document
+    those offsets refer to. 'section' keeps a heading the loader already set
+    (Markdown, DOCX) and is the detected name otherwise.
+    """
+    
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None):
+        self.chunk_size = chunk_size or settings.chunk_size
+        self.chunk_overlap = settings.chunk_overlap if chunk_overlap is None else chunk_overlap
+    
+    def find_sections(self, text: str) -> List[Tuple[str, int, int]]:
+        """Return (section_name, start, end) spans covering the whole text"""
+        sections = []
+        current_name, current_start = "overview", 0
+        
+        leading = LEADING_HEADER.match(text)
+        if leading:
+            current_name = self._header_name(leading)
+        
+        for match in SECTION_HEADER.finditer(text):
+            header_start = match.start() + 1  # Skip the preceding newline/punctuation
+            if header_start > current_start:
+                sections.append((current_name, current_start, header_start))
+            current_name = self._header_name(match)
+            current_start = header_start
+        
+        if current_start < len(text):
+            sections.append((current_name, current_start, len(text)))
+        return sections
+    
+    @staticmethod
+    def _header_name(match: "re.Match") -> str:
+        if match.group("upper"):
+            return section_name(match.group("upper"))
+        return section_name(match.group("question"), is_question=True)
+    
+    def split_spans(self, text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Yield (start, end) chunk spans inside text[start:end] without copying it"""
+        position = start
+        min_break = self.chunk_size // 4
+        
+        while position < end:
+            window_end = min(position + self.chunk_size, end)
+            chunk_end = window_end
+            
+            if window_end < end:
+                for separator in BREAK_SEPARATORS:
+                    index = text.rfind(separator, position + min_break, window_end)
+                    if index != -1:
+                        chunk_end = index + len(separator)
+                        break
+            
+            span_start, span_end = position, chunk_end
+            while span_start < span_end and text[span_start].isspace():
+                span_start += 1
+            while span_end > span_start and text[span_end - 1].isspace():
+                span_end -= 1
+            if span_end > span_start:
+                yield span_start, span_end
+            
+            if chunk_end >= end:
+                break
+            
+            # Step back by the overlap, then forward to a word boundary
+            next_position = max(chunk_end - self.chunk_overlap, position + 1)
+            if next_position < chunk_end:
+                space = text.find(" ", next_position, chunk_end)
+                if space != -1:
+                    next_position = space + 1
+            position = next_position
+    
+    @staticmethod
+    def parent_id(text: str) -> str:
+        """Content hash of the document chunk offsets point into"""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+    
+    def split_document(self, document: Document) -> List[Document]:
+        text = document.page_content
+        parent_id = self.parent_id(text)
+        chunks = []
+        
+        for name, section_start, section_end in self.find_sections(text):
+            for start, end in self.split_spans(text, section_start, section_end):
+                # Fields are already a str slice and a plain dict, so skip pydantic validation
+                chunks.append(Document.model_construct(
+                    page_content=text[start:end],
+                    metadata={
+                        **document.metadata,
+                        'section': document.metadata.get('section') or name,
+                        'medical_section': name,
+                        'section_start': section_start,
+                        'section_end': section_end,
+                        'parent_id': parent_id,
+                        'start_index': start,
+                        'end_index': end
+                    }
+                ))
+        
+        return chunks
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunks = []
+        for document in documents:
+            chunks.extend(self.split_document(document))
+        return chunks
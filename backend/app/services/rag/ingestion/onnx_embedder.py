@@ -0,0 +1,174 @@
+import re
+import json
+import inspect
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+EXPORT_VERSION = 1
+
+class OnnxEmbedder:
+    """
+    Sentence-transformers model served through onnxruntime.
+
+    On first use the transformer is exported to ONNX (and optionally
+    dynamically quantized to int8) under cache_path/onnx; later runs only
+    load the tokenizer and the exported graph. Pooling and normalization are
+    done in numpy to match the SentenceTransformer pipeline. encode() mirrors
+    SentenceTransformer.encode so EmbeddingManager can use either.
+    """
+    
+    def __init__(self, model_name: str, quantize: bool = True, export_dir: Path = None):
+        if ort is None:
+            raise RuntimeError("onnxruntime is not installed")
+        
+        self.model_name = model_name
+        self.quantize = quantize
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.export_dir = Path(export_dir or settings.cache_path) / "onnx" / slug
+        self.model_path = self.export_dir / ("model.int8.onnx" if quantize else "model.onnx")
+        self.config_path = self.export_dir / "export_config.json"
+        
+        if not self._is_exported():
+            self._export()
+        self._load()
+    
+    def _is_exported(self) -> bool:
+        if not self.model_path.exists() or not self.config_path.exists():
+            return False
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return config.get("version") == EXPORT_VERSION and config.get("model_name") == self.model_name
+    
+    def _export(self):
+        """Export the transformer from the sentence-transformers checkpoint, then quantize it"""
+        import torch
+        from sentence_transformers import SentenceTransformer
+        
+        rag_logger.info(f"Exporting {self.model_name} to ONNX (first run only)")
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        
+        st_model = SentenceTransformer(self.model_name, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        tokenizer = st_model.tokenizer
+        config = {
+            "version": EXPORT_VERSION,
+            "model_name": self.model_name,
+            "max_seq_length": st_model.max_seq_length,
+            "pooling": self._pooling_mode(st_model),
+            "normalize": any(type(module).__name__ == "Normalize" for module in st_model)
+        }
+        
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        
+        fp32_path = self.export_dir / "model.onnx"
+        export_kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False  # The TorchScript exporter handles dynamic_axes directly
+        
+        class _TransformerWrapper(torch.nn.Module):
+            """Call the model with keyword inputs; positional order differs across transformers versions"""
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+            
+            def forward(self, *inputs):
+                return self.model(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+        
+        with torch.no_grad():
+            torch.onnx.export(
+                _TransformerWrapper(transformer),
+                tuple(sample[name] for name in input_names),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                **export_kwargs
+            )
+        
+        if self.quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(str(fp32_path), str(self.model_path), weight_type=QuantType.QInt8)
+        
+        tokenizer.save_pretrained(str(self.export_dir))
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        rag_logger.info(f"✅ Exported {self.model_name} to {self.model_path.name}")
+    
+    @staticmethod
+    def _pooling_mode(st_model) -> str:
+        pooling = st_model[1]
+        mode = getattr(pooling, "pooling_mode", None)
+        if mode is None and hasattr(pooling, "get_pooling_mode_str"):
+            mode = pooling.get_pooling_mode_str()
+        if mode not in ("mean", "cls"):
+            raise ValueError(f"Unsupported pooling mode for ONNX export: {mode}")
+        return mode
+    
+    def _load(self):
+        from transformers import AutoTokenizer
+        
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            self.config: Dict[str, Any] = json.load(f)
+        self.max_seq_length = self.config["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.export_dir))
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(self.model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+    
+    def encode(self,
+               sentences: List[str],
+               batch_size: int = 32,
+               show_progress_bar: bool = False,
+               convert_to_numpy: bool = True) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size)[0]
+        
+        # Sort by length so each batch pads to a similar size, then restore order
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        embeddings: Optional[np.ndarray] = None
+        
+        for start in range(0, len(sentences), batch_size):
+            batch_positions = order[start:start + batch_size]
+            vectors = self._encode_batch([sentences[position] for position in batch_positions])
+            if embeddings is None:
+                embeddings = np.empty((len(sentences), vectors.shape[1]), dtype=np.float32)
+            embeddings[batch_positions] = vectors
+        
+        return embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32)
+    
+    def _encode_batch(self, sentences: List[str]) -> np.ndarray:
+        features = self.tokenizer(
+            sentences,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        inputs = {name: features[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+        
+        if self.config["pooling"] == "cls":
+            pooled = token_embeddings[:, 0]
+        else:
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        
+        if self.config["normalize"]:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
@@ -1,12 +1,19 @@
 from typing import List, Dict, Any
 import uuid
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+import hashlib
+from qdrant_client.models import Distance, VectorParams, PointStruct, PointIdsList, PayloadSchemaType
 from langchain_core.documents import Document
 
 from app.config import settings
+from app.services.rag.utils.qdrant_clients import get_qdrant_client, get_async_qdrant_client
 from app.services.rag.utils.logging_config import rag_logger
 
+# Fixed namespace so the same chunk always maps to the same point ID
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3b9e-2a4d-5e8f-9b7a-0c1d2e3f4a5b")
+
+# Payload fields retrieval filters on; keyword indexes let Qdrant resolve them without a full scan
+PAYLOAD_INDEX_FIELDS = ["metadata.condition", "metadata.category", "source"]
+
 class VectorStoreManager:
     def __init__(self):
         self.client = None
@@ -16,12 +23,17 @@ class VectorStoreManager:
     
     def _initialize_client(self):
         try:
-            self.client = QdrantClient(url=settings.qdrant_url)
+            self.client = get_qdrant_client()
             rag_logger.info("✅ Connected to Qdrant")
         except Exception as e:
             rag_logger.error(f"❌ Failed to connect to Qdrant: {e}")
             raise
     
+    @property
+    def async_client(self):
+        """Shared pooled client for request handlers, so searches never block the event loop"""
+        return get_async_qdrant_client()
+    
     def health_check(self) -> bool:
         try:
             self.client.get_collections()
@@ -29,6 +41,13 @@ class VectorStoreManager:
         except:
             return False
     
+    async def ahealth_check(self) -> bool:
+        try:
+            await self.async_client.get_collections()
+            return True
+        except:
+            return False
+    
     def create_collection(self, recreate: bool = False) -> bool:
         try:
             collections = self.client.get_collections()
@@ -47,11 +66,38 @@ class VectorStoreManager:
                 )
                 rag_logger.info("✅ Collection created successfully")
             
+            self._ensure_payload_indexes()
             return True
         except Exception as e:
             rag_logger.error(f"❌ Collection creation failed: {e}")
             raise
     
+    def _ensure_payload_indexes(self):
+        """Create keyword indexes for the filterable payload fields (existing collections included)"""
+        info = self.client.get_collection(self.collection_name)
+        existing = set(info.payload_schema or {})
+        
+        for field_name in PAYLOAD_INDEX_FIELDS:
+            if field_name in existing:
+                continue
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+            rag_logger.info(f"✅ Created payload index on {field_name}")
+    
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def compute_point_id(document: Document) -> str:
+        """Deterministic point ID derived from the chunk's source and content hash"""
+        source = document.metadata.get("source", "unknown")
+        content_hash = VectorStoreManager.content_hash(document.page_content)
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{source}:{content_hash}"))
+    
     def add_documents(self, documents: List[Document], embeddings: List[List[float]]) -> List[str]:
         if len(documents) != len(embeddings):
             raise ValueError("Documents and embeddings count mismatch")
@@ -61,7 +107,7 @@ class VectorStoreManager:
             document_ids = []
             
             for i, (doc, embedding) in enumerate(zip(documents, embeddings)):
-                point_id = str(uuid.uuid4())
+                point_id = self.compute_point_id(doc)
                 document_ids.append(point_id)
                 
                 point = PointStruct(
@@ -70,7 +116,8 @@ class VectorStoreManager:
                     payload={
                         "text": doc.page_content,
                         "metadata": doc.metadata,
-                        "source": doc.metadata.get("source", "unknown")
+                        "source": doc.metadata.get("source", "unknown"),
+                        "content_hash": self.content_hash(doc.page_content)
                     }
                 )
                 points.append(point)
@@ -83,35 +130,90 @@ class VectorStoreManager:
             rag_logger.error(f"❌ Failed to add documents: {e}")
             raise
     
+    def delete_documents(self, point_ids: List[str]) -> int:
+        if not point_ids:
+            return 0
+        
+        try:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=point_ids)
+            )
+            rag_logger.info(f"🗑️ Deleted {len(point_ids)} stale documents from vector store")
+            return len(point_ids)
+        except Exception as e:
+            rag_logger.error(f"❌ Failed to delete documents: {e}")
+            raise
+    
     def search_similar(self, query_embedding: List[float], limit: int = 5) -> List[Dict[str, Any]]:
         try:
-            results = self.client.search(
+            results = self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_embedding,
+                limit=limit,
+                with_payload=True
+            ).points
+            return self._format_results(results)
+        except Exception as e:
+            rag_logger.error(f"❌ Search failed: {e}")
+            return []
+    
+    async def asearch_similar(self, query_embedding: List[float], limit: int = 5) -> List[Dict[str, Any]]:
+        try:
+            response = await self.async_client.query_points(
                 collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=limit
+                query=query_embedding,
+                limit=limit,
+                with_payload=True
             )
-            
-            formatted_results = []
-            for result in results:
-                formatted_results.append({
-                    "id": result.id,
-                    "score": result.score,
-                    "text": result.payload.get("text", ""),
-                    "source": result.payload.get("source", "")
-                })
-            
-            return formatted_results
+            return self._format_results(response.points)
         except Exception as e:
             rag_logger.error(f"❌ Search failed: {e}")
             return []
     
+    @staticmethod
+    def _format_results(results) -> List[Dict[str, Any]]:
+        formatted_results = []
+        for result in results:
+            formatted_results.append({
+                "id": result.id,
+                "score": result.score,
+                "text": result.payload.get("text", ""),
+                "source": result.payload.get("source", "")
+            })
+        
+        return formatted_results
+    
+    def flush(self):
+        """Qdrant persists on write; kept for parity with FaissVectorStoreManager"""
+        pass
+    
     def get_collection_info(self) -> Dict[str, Any]:
         try:
             info = self.client.get_collection(self.collection_name)
-            return {
-                "name": info.config.name,
-                "points_count": info.points_count,
-                "vector_size": info.config.params.vectors.size
-            }
+            return self._format_collection_info(info)
         except:
             return {"points_count": 0}
+    
+    async def aget_collection_info(self) -> Dict[str, Any]:
+        try:
+            info = await self.async_client.get_collection(self.collection_name)
+            return self._format_collection_info(info)
+        except:
+            return {"points_count": 0}
+    
+    def _format_collection_info(self, info) -> Dict[str, Any]:
+        return {
+            "name": self.collection_name,
+            "points_count": info.points_count,
+            "vector_size": info.config.params.vectors.size
+        }
+
+def create_vector_store_manager():
+    """Vector store manager for the configured backend"""
+    if settings.vector_store_backend == "faiss":
+        from app.services.rag.ingestion.faiss_vectorstore_manager import get_faiss_store
+        return get_faiss_store()
+    if settings.vector_store_backend != "qdrant":
+        raise ValueError(f"Unknown vector store backend: {settings.vector_store_backend}")
+    return VectorStoreManager()
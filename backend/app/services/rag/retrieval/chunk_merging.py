@@ -0,0 +1,64 @@
+from typing import List, Tuple, Optional
+
+from langchain_core.documents import Document
+
+def _document_key(doc: Document) -> Optional[Tuple]:
+    """(source, parent_id) of the document the chunk's offsets refer to; None when merging is unsafe"""
+    metadata = doc.metadata
+    if any(metadata.get(key) is None for key in ("parent_id", "start_index", "end_index")):
+        return None
+    return metadata.get("source"), metadata["parent_id"]
+
+def _merge_pair(first: Document, second: Document) -> Document:
+    """Stitch two overlapping or touching spans of one document; first keeps its rank and metadata"""
+    left, right = sorted((first, second), key=lambda doc: doc.metadata["start_index"])
+    left_end, right_start = left.metadata["end_index"], right.metadata["start_index"]
+    
+    if right.metadata["end_index"] <= left_end:
+        text = left.page_content
+    elif right_start <= left_end:
+        text = left.page_content + right.page_content[left_end - right_start:]
+    else:
+        text = left.page_content + " " + right.page_content
+    
+    metadata = dict(first.metadata)
+    metadata.update({
+        "start_index": left.metadata["start_index"],
+        "end_index": max(left_end, right.metadata["end_index"]),
+        "merged_chunks": first.metadata.get("merged_chunks", 1) + second.metadata.get("merged_chunks", 1)
+    })
+    return Document(page_content=text, metadata=metadata)
+
+def _touches(first: Document, second: Document, max_gap: int) -> bool:
+    return (second.metadata["start_index"] <= first.metadata["end_index"] + max_gap
+            and first.metadata["start_index"] <= second.metadata["end_index"] + max_gap)
+
+def merge_adjacent_chunks(documents: List[Document], max_gap: int = 1) -> List[Document]:
+    """
+    Merge chunks that overlap or touch in the same source document.
+
+    Neighbouring chunks share chunk_overlap characters, so sending both
+    repeats that text; a merged chunk takes the position and metadata of its
+    highest-ranked part. Offsets are only comparable within one loaded
+    document (one JSON entry, page or section), so chunks are matched on the
+    chunker's parent_id; chunks without it or without start_index/end_index
+    (indexed before parent_id existed) are kept as is.
+    """
+    merged: List[Document] = []
+    for doc in documents:
+        key = _document_key(doc)
+        position = len(merged)
+        index = 0
+        while key is not None and index < len(merged):
+            kept = merged[index]
+            if _document_key(kept) != key or not _touches(kept, doc, max_gap):
+                index += 1
+                continue
+            
+            # The merged span can reach other kept chunks, so scan again from the start
+            doc = _merge_pair(kept, doc) if index < position else _merge_pair(doc, kept)
+            del merged[index]
+            position = min(position, index)
+            index = 0
+        merged.insert(position, doc)
+    return merged
@@ -0,0 +1,105 @@
+import re
+import threading
+from typing import List, Dict, Tuple, Optional, Set
+
+from qdrant_client.models import Filter, FieldCondition, MatchAny
+
+from app.config import settings
+from app.services.rag.ingestion.bm25_index import tokenize
+from app.services.rag.ingestion.ingestion_manifest import IngestionManifest
+from app.services.rag.utils.kb_version import get_kb_version
+from app.services.rag.utils.logging_config import rag_logger
+
+PARENTHETICAL = re.compile(r"\(([^)]*)\)")
+
+# Everyday and symptom words that name a condition on their own but mostly
+# appear in questions about something else ("pain after eating", "cold hands")
+GENERIC_TERMS = frozenset("""
+ache bite bleeding blister burn cold cough cramp cut diet fatigue fever gas heat infection injury
+itch itching nausea pain rash sleep sore sprain sting stress swelling
+""".split())
+
+def condition_aliases(condition: str) -> List[str]:
+    """'Hypertension (High Blood Pressure)' -> the full name, 'Hypertension' and 'High Blood Pressure'"""
+    aliases = [condition, PARENTHETICAL.sub(" ", condition)]
+    aliases.extend(PARENTHETICAL.findall(condition))
+    return [alias for alias in aliases if alias.strip()]
+
+class ConditionMatcher:
+    """
+    Infers a metadata.condition filter from the conditions a query names.
+
+    The vocabulary is the set of conditions recorded in the ingestion manifest
+    and is rebuilt whenever the knowledge base version changes. Queries and
+    condition names are tokenized like the BM25 index, so case, punctuation
+    and plurals do not matter; the longest alias wins where names overlap.
+    Multi-word names must appear as a phrase. A single-word name only counts
+    when it is distinctive: at least condition_filter_min_term_length long,
+    not an everyday word (GENERIC_TERMS) and not part of any other condition
+    name, so "pain" or "cold" alone never restrict a query.
+    """
+    
+    def __init__(self, collection_name: str = None):
+        self.collection_name = collection_name or settings.qdrant_collection_name
+        self._lock = threading.Lock()
+        self._kb_version: Optional[str] = None
+        self._phrases: Dict[Tuple[str, ...], Set[str]] = {}
+        self._max_phrase_length = 0
+    
+    def _refresh(self):
+        kb_version = get_kb_version(self.collection_name)
+        if kb_version == self._kb_version:
+            return
+        
+        phrases: Dict[Tuple[str, ...], Set[str]] = {}
+        for condition in IngestionManifest(self.collection_name).known_conditions():
+            for alias in condition_aliases(condition):
+                phrase = tuple(tokenize(alias))
+                if phrase:
+                    phrases.setdefault(phrase, set()).add(condition)
+        
+        word_conditions: Dict[str, Set[str]] = {}
+        for phrase, conditions in phrases.items():
+            for word in phrase:
+                word_conditions.setdefault(word, set()).update(conditions)
+        phrases = {
+            phrase: conditions for phrase, conditions in phrases.items()
+            if len(phrase) > 1 or self._distinctive(phrase[0], word_conditions[phrase[0]])
+        }
+        
+        self._phrases = phrases
+        self._max_phrase_length = max((len(phrase) for phrase in phrases), default=0)
+        self._kb_version = kb_version
+        rag_logger.info(f"Condition vocabulary loaded ({len(phrases)} phrases)")
+    
+    @staticmethod
+    def _distinctive(word: str, conditions: Set[str]) -> bool:
+        return (len(word) >= settings.condition_filter_min_term_length
+                and word not in GENERIC_TERMS
+                and len(conditions) == 1)
+    
+    def match(self, query: str) -> List[str]:
+        """Known conditions named in the query"""
+        with self._lock:
+            self._refresh()
+            phrases, max_length = self._phrases, self._max_phrase_length
+        
+        tokens = tokenize(query)
+        matched: Set[str] = set()
+        position = 0
+        while position < len(tokens):
+            for length in range(min(max_length, len(tokens) - position), 0, -1):
+                conditions = phrases.get(tuple(tokens[position:position + length]))
+                if conditions:
+                    matched.update(conditions)
+                    position += length
+                    break
+            else:
+                position += 1
+        return sorted(matched)
+    
+    def build_filter(self, query: str) -> Optional[Filter]:
+        conditions = self.match(query)
+        if not conditions:
+            return None
+        return Filter(must=[FieldCondition(key="metadata.condition", match=MatchAny(any=conditions))])
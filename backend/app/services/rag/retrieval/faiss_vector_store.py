@@ -0,0 +1,116 @@
+from typing import List, Dict, Any, Optional, Iterable, Callable, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.services.rag.ingestion.faiss_vectorstore_manager import FaissVectorStoreManager, get_faiss_store
+
+def _payload_value(payload: Dict[str, Any], key: str) -> Any:
+    """Resolve a dotted payload key; bare keys are looked up in metadata first"""
+    if "." not in key and key not in payload:
+        key = f"metadata.{key}"
+    value: Any = payload
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def filter_to_predicate(filter: Any) -> Optional[Callable[[Dict[str, Any]], bool]]:
+    """
+    Turn a retrieval filter into a payload predicate.
+
+    Accepts a plain {key: value} dict (values may be lists meaning "any of")
+    or a qdrant_client Filter using must/should match conditions, so the same
+    filters work with either vector store backend.
+    """
+    if not filter:
+        return None
+    
+    if isinstance(filter, dict):
+        conditions = [(key, value if isinstance(value, (list, tuple, set)) else [value]) for key, value in filter.items()]
+        return lambda payload: all(_payload_value(payload, key) in values for key, values in conditions)
+    
+    def condition_values(condition) -> Tuple[str, List[Any]]:
+        match = getattr(condition, "match", None)
+        if match is None:
+            raise ValueError(f"Unsupported filter condition for FAISS backend: {condition}")
+        values = getattr(match, "any", None) or [getattr(match, "value", None)]
+        return condition.key, list(values)
+    
+    must = [condition_values(condition) for condition in (getattr(filter, "must", None) or [])]
+    should = [condition_values(condition) for condition in (getattr(filter, "should", None) or [])]
+    
+    def predicate(payload: Dict[str, Any]) -> bool:
+        if not all(_payload_value(payload, key) in values for key, values in must):
+            return False
+        return not should or any(_payload_value(payload, key) in values for key, values in should)
+    return predicate
+
+class FaissLangChainVectorStore(VectorStore):
+    """LangChain VectorStore over FaissVectorStoreManager, mirroring QdrantVectorStore's documents"""
+    
+    def __init__(self, store: FaissVectorStoreManager, embedding: Embeddings):
+        self.store = store
+        self.embedding = embedding
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+    
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+        return self.store.add_documents(documents, self.embedding.embed_documents(texts))
+    
+    @classmethod
+    def from_texts(cls,
+                   texts: List[str],
+                   embedding: Embeddings,
+                   metadatas: Optional[List[dict]] = None,
+                   collection_name: str = None,
+                   **kwargs: Any) -> "FaissLangChainVectorStore":
+        vector_store = cls(get_faiss_store(collection_name), embedding)
+        vector_store.add_texts(texts, metadatas)
+        vector_store.store.flush()
+        return vector_store
+    
+    def _to_document(self, result: Dict[str, Any]) -> Document:
+        payload = result["payload"]
+        metadata = dict(payload.get("metadata") or {})
+        metadata["_id"] = result["id"]
+        metadata["_collection_name"] = self.store.collection_name
+        return Document(page_content=payload.get("text", ""), metadata=metadata)
+    
+    def similarity_search_with_score_by_vector(self,
+                                               embedding: List[float],
+                                               k: int = 4,
+                                               filter: Any = None,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        results = self.store.search(embedding, k, filter_to_predicate(filter))
+        return [(self._to_document(result), result["score"]) for result in results]
+    
+    def similarity_search_with_score_by_vectors(self,
+                                                embeddings: List[List[float]],
+                                                k: int = 4,
+                                                filters: Optional[List[Any]] = None) -> List[List[Tuple[Document, float]]]:
+        """One result list per embedding, searched in a single batch"""
+        filter_fns = [filter_to_predicate(filter) for filter in (filters or [None] * len(embeddings))]
+        return [
+            [(self._to_document(result), result["score"]) for result in results]
+            for results in self.store.search_batch(embeddings, k, filter_fns)
+        ]
+    
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Any = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+    
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Any = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, filter)
+    
+    def similarity_search(self, query: str, k: int = 4, filter: Any = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+    
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda score: score  # Already cosine similarity, like Qdrant's COSINE distance
@@ -1,15 +1,71 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
+import hashlib
+import json
 import time
 from datetime import datetime
 
+import numpy as np
+
 from langchain_qdrant import QdrantVectorStore
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.schema import Document
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+from qdrant_client.models import QueryRequest
+from langchain_core.documents import Document
 
 from app.config import settings
+from app.services.rag.utils.model_registry import model_registry
+from app.services.rag.retrieval.faiss_vector_store import FaissLangChainVectorStore, filter_to_predicate
+from app.services.rag.ingestion.faiss_vectorstore_manager import get_faiss_store
+from app.services.rag.ingestion.bm25_index import get_bm25_index
+from app.services.rag.retrieval.condition_filter import ConditionMatcher
+from app.services.rag.retrieval.reranker import get_reranker
+from app.services.rag.retrieval.chunk_merging import merge_adjacent_chunks
+from app.services.rag.utils.ttl_cache import TTLCache
+from app.services.rag.utils.qdrant_clients import get_qdrant_client, get_async_qdrant_client
+from app.services.rag.utils.kb_version import get_kb_version
 from app.services.rag.utils.logging_config import rag_logger
 
+# Shared by every retriever in the process (both generators use one each)
+query_embedding_cache = TTLCache(settings.query_embedding_cache_size, settings.retrieval_cache_ttl_seconds)
+retrieval_results_cache = TTLCache(settings.retrieval_results_cache_size, settings.retrieval_cache_ttl_seconds)
+_results_kb_version: Optional[str] = None
+
+def normalize_query(query: str) -> str:
+    """The embedding model is uncased, so case and whitespace differences map to one key"""
+    return " ".join(query.lower().split())
+
+def _filter_key(filter_dict: Any) -> str:
+    if filter_dict is None:
+        return ""
+    if hasattr(filter_dict, "model_dump_json"):
+        return filter_dict.model_dump_json()
+    return json.dumps(filter_dict, sort_keys=True, default=str)
+
+def _document_key(doc: Document) -> str:
+    return str(doc.metadata.get("_id") or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest())
+
+def reciprocal_rank_fusion(result_lists: List[List[Tuple[Document, float]]],
+                           k: int,
+                           rrf_k: int = None) -> List[Tuple[Document, float]]:
+    """Merge ranked lists by summing 1 / (rrf_k + rank); documents are matched on their point ID"""
+    rrf_k = rrf_k or settings.hybrid_rrf_k
+    fused: Dict[str, List[Any]] = {}
+    
+    for results in result_lists:
+        for rank, (doc, _) in enumerate(results, 1):
+            entry = fused.setdefault(_document_key(doc), [doc, 0.0])
+            entry[1] += 1.0 / (rrf_k + rank)
+    
+    ranked = sorted(fused.values(), key=lambda entry: entry[1], reverse=True)
+    return [(doc, score) for doc, score in ranked[:k]]
+
+def retrieval_cache_stats() -> Dict[str, Any]:
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "retrieval_results": retrieval_results_cache.stats(),
+        "kb_version": _results_kb_version
+    }
+
 
 class LangChainMedicalRetriever:
     """LangChain-based medical document retriever with Qdrant"""
@@ -17,24 +73,42 @@ class LangChainMedicalRetriever:
     def __init__(self):
         self.vector_store = None
         self.embeddings = None
+        self.lexical_index = None
+        self.condition_matcher = None
+        self.reranker = None
         self._initialize_components()
     
     def _initialize_components(self):
         """Initialize LangChain components"""
         try:
-            # Initialize embeddings (SentenceTransformers, 384d)
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name=settings.embedding_model_name
-            )
+            # Shared embedding model (SentenceTransformers, 384d) and its on-disk cache
+            self.embeddings = model_registry.get_langchain_embeddings()
             
-            # Initialize Qdrant vector store
-            self.vector_store = QdrantVectorStore.from_existing_collection(
-                collection_name=settings.qdrant_collection_name,
-                embedding=self.embeddings,
-                url=settings.qdrant_url,
-            )
+            # Initialize vector store (Qdrant server or in-process FAISS index)
+            if settings.vector_store_backend == "faiss":
+                self.vector_store = FaissLangChainVectorStore(get_faiss_store(), self.embeddings)
+            else:
+                self.vector_store = QdrantVectorStore(
+                    client=get_qdrant_client(),  # Shared pooled client; searches use its async twin
+                    collection_name=settings.qdrant_collection_name,
+                    embedding=self.embeddings,
+                    content_payload_key="text",  # VectorStoreManager stores chunk text under "text"
+                )
+            
+            # BM25 index built at ingestion, for hybrid lexical + dense search
+            if settings.hybrid_search_enabled:
+                self.lexical_index = get_bm25_index(settings.qdrant_collection_name)
             
-            rag_logger.info("✅ LangChain retriever initialized successfully (HuggingFace embeddings)")
+            # Conditions recorded at ingestion, used to infer metadata filters from queries
+            if settings.condition_filter_enabled:
+                self.condition_matcher = ConditionMatcher(settings.qdrant_collection_name)
+            
+            # Optional cross-encoder rerank of a larger candidate pool
+            if settings.rerank_enabled:
+                self.reranker = get_reranker()
+                self.reranker.warm_up()
+            
+            rag_logger.info(f"✅ LangChain retriever initialized successfully ({settings.vector_store_backend} backend)")
             
         except Exception as e:
             rag_logger.error(f"❌ Failed to initialize LangChain retriever: {e}")
@@ -44,24 +118,21 @@ class LangChainMedicalRetriever:
         self, 
         query: str, 
         k: int = 3,
-        filter_dict: Optional[Dict] = None
+        filter_dict: Optional[Dict] = None,
+        rerank_budget_ms: Optional[float] = None
     ) -> List[Document]:
         """Retrieve relevant documents using LangChain"""
         
         try:
             start_time = time.time()
             
-            # Create retriever with custom search parameters
-            retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={
-                    "k": k,
-                    "filter": filter_dict
-                }
-            )
+            # Retrieve documents (served from the query/results caches when possible)
+            documents = self._scored_documents(await self._search(query, self._candidate_count(k), filter_dict))
             
-            # Retrieve documents
-            documents = await retriever.ainvoke(query)
+            # Rerank, diversify and merge the candidate pool down to the prompt context
+            if len(documents) > k or settings.merge_adjacent_chunks:
+                embedding = await self.embed_query(query)
+                documents = (await self._select_documents([query], [embedding], [documents], k, rerank_budget_ms))[0]
             
             retrieval_time = time.time() - start_time
             
@@ -89,10 +160,7 @@ class LangChainMedicalRetriever:
         """Retrieve documents with similarity scores"""
         
         try:
-            results = await self.vector_store.asimilarity_search_with_score(
-                query=query,
-                k=k
-            )
+            results = await self._search(query, k)
             
             rag_logger.info(f"🎯 Retrieved {len(results)} documents with scores")
             return results
@@ -101,6 +169,300 @@ class LangChainMedicalRetriever:
             rag_logger.error(f"❌ Similarity search failed: {e}")
             return []
     
+    async def retrieve_documents_batch(self,
+                                       queries: List[str],
+                                       k: int = 3,
+                                       embeddings: Optional[List[List[float]]] = None) -> List[List[Document]]:
+        """retrieve_documents for many queries with one encode call and one vector search round trip"""
+        try:
+            start_time = time.time()
+            if embeddings is None:
+                embeddings = await self.embed_queries(queries)
+            results = await self._search_many(queries, self._candidate_count(k), embeddings=embeddings)
+            
+            rerank_budget_ms = self.reranker.budget_ms * len(queries) if self.reranker is not None else None
+            candidate_lists = await self._select_documents(
+                queries, embeddings, [self._scored_documents(query_results) for query_results in results], k, rerank_budget_ms
+            )
+            retrieval_time = time.time() - start_time
+            
+            rag_logger.info(f"🔍 Retrieved documents for {len(queries)} queries in {retrieval_time:.3f}s")
+            
+            batch = []
+            for query, documents in zip(queries, candidate_lists):
+                for doc in documents:
+                    doc.metadata.update({
+                        "retrieval_time": retrieval_time,
+                        "query": query,
+                        "timestamp": datetime.now().isoformat()
+                    })
+                batch.append(documents)
+            return batch
+            
+        except Exception as e:
+            rag_logger.error(f"❌ Batch document retrieval failed: {e}")
+            return [[] for _ in queries]
+    
+    @staticmethod
+    def _scored_documents(results: List[Tuple[Document, float]]) -> List[Document]:
+        """Keep the search score (cosine similarity) on each document, so later stages can rank by it"""
+        for doc, score in results:
+            doc.metadata["relevance_score"] = float(score)
+        return [doc for doc, _ in results]
+    
+    def _candidate_count(self, k: int) -> int:
+        """Pool size to search for when later stages still choose among the candidates"""
+        count = k
+        if self.reranker is not None:
+            count = max(count, settings.rerank_candidates)
+        if settings.retrieval_mode == "mmr":
+            count = max(count, settings.mmr_fetch_k)
+        return count
+    
+    async def _select_documents(self,
+                                queries: List[str],
+                                embeddings: List[List[float]],
+                                candidate_lists: List[List[Document]],
+                                k: int,
+                                rerank_budget_ms: Optional[float] = None) -> List[List[Document]]:
+        """Cut each candidate pool down to the k chunks that go into the prompt"""
+        mmr = settings.retrieval_mode == "mmr"
+        
+        # Keep the candidates the cross-encoder scores best (twice k when MMR still has to choose)
+        if self.reranker is not None:
+            candidate_lists = await self.reranker.rerank_many(queries, candidate_lists, 2 * k if mmr else k, rerank_budget_ms)
+        
+        # Maximal marginal relevance over the stored chunk vectors: relevant but not redundant
+        if mmr:
+            vectors = await self._candidate_vectors(candidate_lists)
+            selected = []
+            for embedding, documents in zip(embeddings, candidate_lists):
+                if len(documents) <= k:
+                    selected.append(documents)
+                    continue
+                document_vectors = np.vstack([vectors.get(str(doc.metadata.get("_id")), self._zero_vector()) for doc in documents])
+                indices = maximal_marginal_relevance(
+                    np.asarray(embedding, dtype=np.float32), document_vectors, lambda_mult=settings.mmr_lambda, k=k
+                )
+                selected.append([documents[index] for index in indices])
+            candidate_lists = selected
+        else:
+            candidate_lists = [documents[:k] for documents in candidate_lists]
+        
+        # Overlapping neighbours from the same document become one chunk
+        if settings.merge_adjacent_chunks:
+            candidate_lists = [merge_adjacent_chunks(documents) for documents in candidate_lists]
+        return candidate_lists
+    
+    @staticmethod
+    def _zero_vector() -> np.ndarray:
+        return np.zeros(settings.embedding_dimension, dtype=np.float32)
+    
+    async def _candidate_vectors(self, candidate_lists: List[List[Document]]) -> Dict[str, np.ndarray]:
+        """Stored vectors of the candidates, fetched by point ID in one round trip"""
+        point_ids = list(dict.fromkeys(
+            str(doc.metadata["_id"]) for documents in candidate_lists for doc in documents if doc.metadata.get("_id")
+        ))
+        if not point_ids:
+            return {}
+        
+        if isinstance(self.vector_store, FaissLangChainVectorStore):
+            return await asyncio.to_thread(self.vector_store.store.get_vectors, point_ids)
+        
+        points = await get_async_qdrant_client().retrieve(
+            collection_name=settings.qdrant_collection_name,
+            ids=point_ids,
+            with_payload=False,
+            with_vectors=True
+        )
+        return {str(point.id): np.asarray(point.vector, dtype=np.float32) for point in points}
+    
+    async def embed_query(self, query: str) -> List[float]:
+        """Query embedding, cached on the normalized query text"""
+        return (await self.embed_queries([query]))[0]
+    
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeddings for many queries; everything not cached is encoded in a single call"""
+        normalized = [normalize_query(query) for query in queries]
+        if settings.retrieval_cache_enabled:
+            embeddings = [query_embedding_cache.get(text) for text in normalized]
+        else:
+            embeddings = [None] * len(normalized)
+        
+        missing = list(dict.fromkeys(text for text, embedding in zip(normalized, embeddings) if embedding is None))
+        if missing:
+            encoded = dict(zip(missing, await asyncio.to_thread(self.embeddings.embed_documents, missing)))
+            if settings.retrieval_cache_enabled:
+                for text, embedding in encoded.items():
+                    query_embedding_cache.put(text, embedding)
+            embeddings = [encoded[text] if embedding is None else embedding for text, embedding in zip(normalized, embeddings)]
+        return embeddings
+    
+    async def _search(self, query: str, k: int, filter_dict: Optional[Any] = None) -> List[Tuple[Document, float]]:
+        return (await self._search_many([query], k, filter_dict))[0]
+    
+    async def _search_many(self,
+                           queries: List[str],
+                           k: int,
+                           filter_dict: Optional[Any] = None,
+                           embeddings: Optional[List[List[float]]] = None) -> List[List[Tuple[Document, float]]]:
+        """Search restricted to the conditions each query names, when the caller passes no filter"""
+        if embeddings is None:
+            embeddings = await self.embed_queries(queries)
+        
+        filters = [filter_dict] * len(queries)
+        if filter_dict is None and self.condition_matcher is not None:
+            filters = await asyncio.to_thread(lambda: [self.condition_matcher.build_filter(query) for query in queries])
+        
+        results = await self._cached_search(queries, embeddings, k, filters)
+        if filter_dict is not None:
+            return results
+        
+        # Too few chunks for the named condition: top up from the unfiltered search
+        short = [i for i, (condition_filter, hits) in enumerate(zip(filters, results)) if condition_filter is not None and len(hits) < k]
+        if short:
+            unfiltered = await self._cached_search(
+                [queries[i] for i in short], [embeddings[i] for i in short], k, [None] * len(short)
+            )
+            for i, extra in zip(short, unfiltered):
+                rag_logger.info(f"Condition filter matched {len(results[i])}/{k} chunks, adding unfiltered results")
+                seen = {_document_key(doc) for doc, _ in results[i]}
+                results[i].extend((doc, score) for doc, score in extra if _document_key(doc) not in seen)
+                del results[i][k:]
+        return results
+    
+    async def _cached_search(self,
+                             queries: List[str],
+                             embeddings: List[List[float]],
+                             k: int,
+                             filters: List[Optional[Any]]) -> List[List[Tuple[Document, float]]]:
+        """Vector search keyed on (embedding, k, filter); results are dropped when the KB version changes"""
+        global _results_kb_version
+        
+        if not settings.retrieval_cache_enabled:
+            return await self._run_search(queries, embeddings, k, filters)
+        
+        kb_version = get_kb_version(settings.qdrant_collection_name)
+        if kb_version != _results_kb_version:
+            retrieval_results_cache.clear()
+            _results_kb_version = kb_version
+        
+        keys = [
+            (hashlib.blake2b(np.asarray(embedding, dtype=np.float32).tobytes(), digest_size=16).hexdigest(), k, _filter_key(filter_dict))
+            for embedding, filter_dict in zip(embeddings, filters)
+        ]
+        results = [retrieval_results_cache.get(key) for key in keys]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if missing:
+            fresh = await self._run_search(
+                [queries[i] for i in missing], [embeddings[i] for i in missing], k, [filters[i] for i in missing]
+            )
+            for i, query_results in zip(missing, fresh):
+                retrieval_results_cache.put(keys[i], query_results)
+                results[i] = query_results
+        
+        # Callers annotate metadata, so hand out copies of the cached documents
+        return [
+            [(Document(page_content=doc.page_content, metadata=dict(doc.metadata)), score) for doc, score in query_results]
+            for query_results in results
+        ]
+    
+    async def _run_search(self,
+                          queries: List[str],
+                          embeddings: List[List[float]],
+                          k: int,
+                          filters: List[Optional[Any]]) -> List[List[Tuple[Document, float]]]:
+        """
+        Dense search, fused by RRF with a concurrent BM25 search when hybrid search is on.
+
+        Results are in fused order but still scored by cosine similarity, as
+        plain dense search is; the fused score is kept as rrf_score metadata.
+        """
+        if self.lexical_index is None:
+            return await self._dense_search(embeddings, k, filters)
+        
+        candidates = max(k, settings.hybrid_candidates)
+        dense_results, lexical_results = await asyncio.gather(
+            self._dense_search(embeddings, candidates, filters),
+            asyncio.to_thread(self._lexical_search, queries, candidates, filters)
+        )
+        fused_lists = [reciprocal_rank_fusion([dense, lexical], k) for dense, lexical in zip(dense_results, lexical_results)]
+        return await self._cosine_scored(fused_lists, dense_results, embeddings)
+    
+    async def _cosine_scored(self,
+                             fused_lists: List[List[Tuple[Document, float]]],
+                             dense_results: List[List[Tuple[Document, float]]],
+                             embeddings: List[List[float]]) -> List[List[Tuple[Document, float]]]:
+        """Replace RRF scores with cosine similarity; BM25-only hits are scored against their stored vectors"""
+        dense_scores = [{_document_key(doc): score for doc, score in dense} for dense in dense_results]
+        lexical_only = [
+            [doc for doc, _ in fused if _document_key(doc) not in scores]
+            for fused, scores in zip(fused_lists, dense_scores)
+        ]
+        vectors = await self._candidate_vectors(lexical_only) if any(lexical_only) else {}
+        
+        scored_lists = []
+        for fused, scores, embedding in zip(fused_lists, dense_scores, embeddings):
+            query_vector = np.asarray(embedding, dtype=np.float32)
+            query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+            scored = []
+            for doc, rrf_score in fused:
+                doc.metadata["rrf_score"] = float(rrf_score)
+                score = scores.get(_document_key(doc))
+                if score is None:
+                    vector = vectors.get(str(doc.metadata.get("_id")), self._zero_vector())
+                    score = float(np.dot(query_vector, vector) / (np.linalg.norm(vector) or 1.0))
+                scored.append((doc, score))
+            scored_lists.append(scored)
+        return scored_lists
+    
+    async def _dense_search(self,
+                            embeddings: List[List[float]],
+                            k: int,
+                            filters: List[Optional[Any]]) -> List[List[Tuple[Document, float]]]:
+        """All queries in one vector store round trip, awaited on the pooled async client"""
+        if isinstance(self.vector_store, FaissLangChainVectorStore):
+            return await asyncio.to_thread(self.vector_store.similarity_search_with_score_by_vectors, embeddings, k, filters)
+        
+        vector_store = self.vector_store
+        responses = await get_async_qdrant_client().query_batch_points(
+            collection_name=vector_store.collection_name,
+            requests=[
+                QueryRequest(query=embedding, using=vector_store.vector_name, filter=filter_dict, limit=k, with_payload=True)
+                for embedding, filter_dict in zip(embeddings, filters)
+            ]
+        )
+        return [
+            [
+                (
+                    QdrantVectorStore._document_from_point(
+                        point, vector_store.collection_name, vector_store.content_payload_key, vector_store.metadata_payload_key
+                    ),
+                    point.score
+                )
+                for point in response.points
+            ]
+            for response in responses
+        ]
+    
+    def _lexical_search(self,
+                        queries: List[str],
+                        k: int,
+                        filters: List[Optional[Any]]) -> List[List[Tuple[Document, float]]]:
+        return [
+            [
+                (
+                    Document(
+                        page_content=hit["payload"]["text"],
+                        metadata={**hit["payload"]["metadata"], "_id": hit["id"], "_collection_name": settings.qdrant_collection_name}
+                    ),
+                    hit["score"]
+                )
+                for hit in self.lexical_index.search(query, k, filter_to_predicate(filter_dict))
+            ]
+            for query, filter_dict in zip(queries, filters)
+        ]
+    
     def get_retriever(self, **kwargs):
         """Get LangChain retriever object for use in chains"""
         return self.vector_store.as_retriever(**kwargs)
@@ -0,0 +1,131 @@
+import time
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.rag.utils.model_registry import model_registry
+from app.services.rag.utils.logging_config import rag_logger
+
+class CrossEncoderReranker:
+    """
+    Rescores retrieval candidates with a small cross-encoder, within a latency budget.
+
+    All (query, chunk) pairs of a call are scored in one batched predict().
+    The cost per pair is tracked as a moving average of measured calls; a
+    rerank whose estimate exceeds the budget is skipped, and one that overruns
+    it is abandoned, so candidates keep their retrieval order in both cases.
+    Skips decay the estimate, so reranking resumes after a transient slowdown.
+    """
+    
+    def __init__(self, model_name: str = None, budget_ms: float = None, batch_size: int = None):
+        self.model_name = model_name or settings.rerank_model_name
+        self.budget_ms = settings.rerank_budget_ms if budget_ms is None else budget_ms
+        self.batch_size = batch_size or settings.rerank_batch_size
+        
+        self._lock = threading.Lock()
+        self._seconds_per_pair: Optional[float] = None
+        self.reranked = 0
+        self.skipped = 0
+        self.timed_out = 0
+    
+    def warm_up(self):
+        """Load the model and seed the cost estimate, so the first request is not spent loading"""
+        passage = " ".join(["medical"] * (settings.chunk_size // 8))  # Roughly chunk-sized
+        self._score([("warm up query", passage)] * min(self.batch_size, 8))
+    
+    def estimate_seconds(self, num_pairs: int) -> Optional[float]:
+        """Expected predict() time, None until one call has been measured"""
+        if self._seconds_per_pair is None:
+            return None
+        return self._seconds_per_pair * num_pairs
+    
+    def _score(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        model = model_registry.get_cross_encoder(self.model_name)
+        
+        start = time.perf_counter()
+        scores = model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False, convert_to_numpy=True)
+        per_pair = (time.perf_counter() - start) / len(pairs)
+        
+        with self._lock:
+            if self._seconds_per_pair is None:
+                self._seconds_per_pair = per_pair
+            else:
+                self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * per_pair
+        return np.asarray(scores, dtype=np.float32).reshape(-1)
+    
+    async def rerank(self,
+                     query: str,
+                     documents: List[Document],
+                     top_n: int,
+                     budget_ms: float = None) -> List[Document]:
+        return (await self.rerank_many([query], [documents], top_n, budget_ms))[0]
+    
+    async def rerank_many(self,
+                          queries: List[str],
+                          candidate_lists: List[List[Document]],
+                          top_n: int,
+                          budget_ms: float = None) -> List[List[Document]]:
+        """Best top_n documents per query; falls back to retrieval order when over budget"""
+        fallback = [documents[:top_n] for documents in candidate_lists]
+        pairs = [(query, doc.page_content) for query, documents in zip(queries, candidate_lists) for doc in documents]
+        if not pairs:
+            return fallback
+        
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000
+        estimate = self.estimate_seconds(len(pairs))
+        if estimate is not None and estimate > budget:
+            self.skipped += 1
+            with self._lock:
+                # Decay the estimate so a transient slowdown does not disable reranking for good
+                self._seconds_per_pair *= 0.95
+            rag_logger.info(f"⏭️ Skipping rerank of {len(pairs)} pairs (~{estimate * 1000:.0f}ms > {budget * 1000:.0f}ms budget)")
+            return fallback
+        
+        try:
+            # An overrunning predict() keeps its thread until done, but the request stops waiting for it
+            scores = await asyncio.wait_for(asyncio.to_thread(self._score, pairs), timeout=budget)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            rag_logger.warning(f"⚠️ Rerank exceeded its {budget * 1000:.0f}ms budget, keeping retrieval order")
+            return fallback
+        except Exception as e:
+            rag_logger.error(f"❌ Reranking failed: {e}")
+            return fallback
+        
+        self.reranked += 1
+        reranked = []
+        offset = 0
+        for documents in candidate_lists:
+            document_scores = scores[offset:offset + len(documents)]
+            offset += len(documents)
+            best = np.argsort(-document_scores, kind="stable")[:top_n]
+            for index in best:
+                documents[index].metadata["rerank_score"] = float(document_scores[index])
+            reranked.append([documents[index] for index in best])
+        return reranked
+    
+    def stats(self) -> Dict[str, Any]:
+        estimate = self.estimate_seconds(1)
+        return {
+            "model": self.model_name,
+            "budget_ms": self.budget_ms,
+            "reranked": self.reranked,
+            "skipped": self.skipped,
+            "timed_out": self.timed_out,
+            "ms_per_pair": round(estimate * 1000, 3) if estimate is not None else None
+        }
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+def get_reranker() -> CrossEncoderReranker:
+    """One reranker per process, so both generators share its cost estimate"""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker()
+        return _reranker
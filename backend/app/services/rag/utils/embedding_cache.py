@@ -0,0 +1,229 @@
+import re
+import json
+import os
+import time
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+INDEX_VERSION = 1
+
+class EmbeddingCache:
+    """
+    Size-bounded on-disk embedding cache for a single model.
+
+    Vectors live in a memory-mapped float32 array (one row per slot) and the
+    key -> slot mapping in a JSON index written next to it. Each slot also
+    carries a 64-bit tag of the key it holds, so a slot reused after the last
+    index flush (e.g. after a crash) is treated as a miss instead of
+    returning the wrong vector. Eviction is least-recently-used.
+    """
+    
+    def __init__(self,
+                 model_name: str,
+                 dimension: int,
+                 max_entries: int = None,
+                 cache_dir: Path = None):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries or settings.embedding_cache_max_entries
+        self.flush_interval = settings.embedding_cache_flush_seconds
+        
+        cache_dir = Path(cache_dir or settings.cache_path) / "embeddings"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.vectors_path = cache_dir / f"{slug}.f32"
+        self.tags_path = cache_dir / f"{slug}.tags"
+        self.index_path = cache_dir / f"{slug}.index.json"
+        
+        self._lock = threading.RLock()
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._dirty = False
+        self._last_flush = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._open()
+        atexit.register(self.flush)
+    
+    def _open(self):
+        index = self._read_index()
+        reuse = (
+            index is not None
+            and self.vectors_path.exists()
+            and self.tags_path.exists()
+            and self.vectors_path.stat().st_size == self.max_entries * self.dimension * 4
+        )
+        mode = "r+" if reuse else "w+"
+        
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode=mode,
+                                  shape=(self.max_entries, self.dimension))
+        self._tags = np.memmap(self.tags_path, dtype=np.uint64, mode=mode, shape=(self.max_entries,))
+        
+        if reuse:
+            for key, slot in index["entries"]:
+                if 0 <= slot < self.max_entries:
+                    self._slots[key] = slot
+        self._free_slots = sorted(set(range(self.max_entries)) - set(self._slots.values()), reverse=True)
+        
+        rag_logger.info(f"✅ Embedding cache ready for {self.model_name} ({len(self._slots)} cached vectors)")
+    
+    def _read_index(self) -> Optional[Dict[str, Any]]:
+        if not self.index_path.exists():
+            return None
+        
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except Exception as e:
+            rag_logger.warning(f"⚠️ Discarding unreadable embedding cache index: {e}")
+            return None
+        
+        if (index.get("version") != INDEX_VERSION
+                or index.get("dimension") != self.dimension
+                or index.get("max_entries") != self.max_entries):
+            rag_logger.info(f"Embedding cache layout changed for {self.model_name}, starting fresh")
+            return None
+        return index
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+    
+    def _key(self, text: str) -> str:
+        payload = f"{self.model_name}\x00{self.normalize(text)}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _tag(key: str) -> int:
+        return int(key[:16], 16) or 1  # 0 marks an empty slot
+    
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        if int(self._tags[slot]) != self._tag(key):
+            del self._slots[key]
+            self._free_slots.append(slot)
+            return None
+        
+        self._slots.move_to_end(key)
+        return self._vectors[slot]
+    
+    def _put(self, key: str, vector: np.ndarray):
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                _, slot = self._slots.popitem(last=False)
+                self.evictions += 1
+        
+        self._vectors[slot] = vector
+        self._tags[slot] = self._tag(key)
+        self._slots[key] = slot
+        self._slots.move_to_end(key)
+        self._dirty = True
+    
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return embeddings for texts, calling encode_fn only for texts not in the cache"""
+        keys = [self._key(text) for text in texts]
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        missing: Dict[str, List[int]] = {}
+        
+        with self._lock:
+            for position, key in enumerate(keys):
+                vector = self._get(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(position)
+                else:
+                    embeddings[position] = vector
+            
+            missed = sum(len(positions) for positions in missing.values())
+            self.hits += len(texts) - missed
+            self.misses += missed
+        
+        if missing:
+            missing_keys = list(missing)
+            vectors = np.asarray(
+                encode_fn([texts[missing[key][0]] for key in missing_keys]),
+                dtype=np.float32
+            )
+            
+            with self._lock:
+                for key, vector in zip(missing_keys, vectors):
+                    self._put(key, vector)
+                    embeddings[missing[key]] = vector
+                self._maybe_flush()
+        
+        return embeddings
+    
+    def _maybe_flush(self):
+        if self._dirty and time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            
+            try:
+                self._vectors.flush()
+                self._tags.flush()
+                tmp_path = self.index_path.with_suffix(".json.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        "version": INDEX_VERSION,
+                        "model_name": self.model_name,
+                        "dimension": self.dimension,
+                        "max_entries": self.max_entries,
+                        "entries": list(self._slots.items())
+                    }, f)
+                os.replace(tmp_path, self.index_path)
+                self._dirty = False
+                self._last_flush = time.time()
+            except Exception as e:
+                rag_logger.error(f"❌ Failed to flush embedding cache: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(model_name: str, dimension: int) -> Optional[EmbeddingCache]:
+    """Shared cache per model, or None when caching is disabled"""
+    if not settings.embedding_cache_enabled:
+        return None
+    
+    with _caches_lock:
+        cache = _caches.get(model_name)
+        if cache is None:
+            try:
+                cache = EmbeddingCache(model_name, dimension)
+            except Exception as e:
+                rag_logger.error(f"❌ Embedding cache unavailable for {model_name}: {e}")
+                return None
+            _caches[model_name] = cache
+        return cache
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,45 @@
+import os
+import uuid
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+from app.config import settings
+
+# Per-collection version token stored under cache_path. Ingestion writes a new
+# token whenever the collection changes; every worker process compares it
+# against the token its caches were filled under.
+_cached: Dict[str, Tuple[int, str]] = {}
+_lock = threading.Lock()
+
+def _version_path(collection_name: str = None) -> Path:
+    collection_name = collection_name or settings.qdrant_collection_name
+    return Path(settings.cache_path) / f"kb_version_{collection_name}.txt"
+
+def get_kb_version(collection_name: str = None) -> str:
+    """Current knowledge-base version; re-reads the file only when its mtime changes"""
+    path = _version_path(collection_name)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return "initial"
+    
+    with _lock:
+        cached = _cached.get(str(path))
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        
+        version = path.read_text(encoding='utf-8').strip() or "initial"
+        _cached[str(path)] = (mtime_ns, version)
+        return version
+
+def bump_kb_version(collection_name: str = None) -> str:
+    """Mark the knowledge base as changed, invalidating retrieval and answer caches"""
+    path = _version_path(collection_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    version = uuid.uuid4().hex
+    
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(version, encoding='utf-8')
+    os.replace(tmp_path, path)
+    return version
@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+from typing import Dict, Any, Callable, Optional
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+class ModelRegistry:
+    """
+    Process-wide registry that loads each model once, on first request.
+
+    Components ask the registry for a model by key instead of constructing
+    their own copy, so the ingestion pipeline, both generators' retrievers,
+    nlp_utils and the medical agent all share one instance per model.
+    Loading is guarded by a per-key lock so concurrent first requests still
+    load only once.
+    """
+    
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                rag_logger.info(f"Loading shared model: {key}")
+                start = time.time()
+                model = loader()
+                self._load_seconds[key] = time.time() - start
+                self._models[key] = model
+                rag_logger.info(f"✅ Shared model ready: {key} ({self._load_seconds[key]:.2f}s)")
+        return model
+    
+    def is_loaded(self, key: str) -> bool:
+        return key in self._models
+    
+    def get_sentence_transformer(self, model_name: str):
+        def load():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(model_name)
+        return self.get(f"sentence_transformer:{model_name}", load)
+    
+    def get_cross_encoder(self, model_name: str):
+        def load():
+            from sentence_transformers import CrossEncoder
+            return CrossEncoder(model_name, max_length=512)
+        return self.get(f"cross_encoder:{model_name}", load)
+    
+    def get_embedding_model(self, model_name: str = None, backend: str = None):
+        """SentenceTransformer or OnnxEmbedder, both exposing encode()"""
+        model_name = model_name or settings.embedding_model_name
+        backend = backend or settings.embedding_backend
+        
+        if backend == "torch":
+            return self.get_sentence_transformer(model_name)
+        if backend == "onnx":
+            def load():
+                from app.services.rag.ingestion.onnx_embedder import OnnxEmbedder
+                return OnnxEmbedder(model_name, quantize=settings.embedding_onnx_quantize)
+            return self.get(f"onnx:{model_name}:{'int8' if settings.embedding_onnx_quantize else 'fp32'}", load)
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    
+    def get_embedding_manager(self):
+        from app.services.rag.ingestion.embedding_manager import EmbeddingManager
+        return self.get("embedding_manager", EmbeddingManager)
+    
+    def get_langchain_embeddings(self):
+        """LangChain Embeddings backed by the shared EmbeddingManager (and its cache)"""
+        from app.services.rag.ingestion.embedding_manager import ManagerEmbeddings
+        return self.get("langchain_embeddings", lambda: ManagerEmbeddings(self.get_embedding_manager()))
+    
+    @staticmethod
+    def _model_bytes(model: Any) -> Optional[int]:
+        if hasattr(model, "parameters"):
+            return sum(parameter.numel() * parameter.element_size() for parameter in model.parameters())
+        model_path = getattr(model, "model_path", None)
+        if model_path is not None and os.path.exists(model_path):
+            return os.path.getsize(model_path)
+        return None
+    
+    @staticmethod
+    def _process_rss_bytes() -> Optional[int]:
+        try:
+            with open("/proc/self/status", 'r') as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak, in KB on Linux
+        except Exception:
+            return None
+    
+    def memory_report(self) -> Dict[str, Any]:
+        models = {}
+        for key, model in list(self._models.items()):
+            model_bytes = self._model_bytes(model)
+            models[key] = {
+                "type": type(model).__name__,
+                "load_seconds": round(self._load_seconds.get(key, 0.0), 3),
+                "weights_mb": round(model_bytes / (1024 * 1024), 1) if model_bytes is not None else None
+            }
+        
+        rss = self._process_rss_bytes()
+        known = [entry["weights_mb"] for entry in models.values() if entry["weights_mb"] is not None]
+        return {
+            "models": models,
+            "models_loaded": len(models),
+            "model_weights_mb": round(sum(known), 1),
+            "process_rss_mb": round(rss / (1024 * 1024), 1) if rss is not None else None
+        }
+
+model_registry = ModelRegistry()
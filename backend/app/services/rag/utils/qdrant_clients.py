@@ -0,0 +1,65 @@
+import threading
+from typing import Dict, Any, Optional
+
+import httpx
+from qdrant_client import QdrantClient, AsyncQdrantClient
+
+from app.config import settings
+from app.services.rag.utils.logging_config import rag_logger
+
+_client: Optional[QdrantClient] = None
+_async_client: Optional[AsyncQdrantClient] = None
+_clients_lock = threading.Lock()
+
+def qdrant_client_kwargs() -> Dict[str, Any]:
+    """
+    Connection settings shared by the sync and async clients.
+
+    Without explicit limits qdrant-client disables keep-alive for localhost
+    URLs, so every request to a local server opens a new connection, and
+    other hosts get httpx's defaults (100 connections, 20 kept alive for 5s).
+    These limits keep a pool alive for any host, sized to the worker's
+    concurrency, and hold idle connections long enough to bridge the gaps
+    between bursts of queries.
+    """
+    return {
+        "url": settings.qdrant_url,
+        "api_key": settings.qdrant_api_key,
+        "timeout": settings.qdrant_timeout_seconds,
+        "prefer_grpc": settings.qdrant_prefer_grpc,
+        "grpc_port": settings.qdrant_grpc_port,
+        "limits": httpx.Limits(
+            max_connections=settings.qdrant_max_connections,
+            max_keepalive_connections=settings.qdrant_max_keepalive_connections,
+            keepalive_expiry=settings.qdrant_keepalive_expiry_seconds
+        )
+    }
+
+def get_qdrant_client() -> QdrantClient:
+    """Process-wide synchronous client (ingestion and worker threads)"""
+    global _client
+    with _clients_lock:
+        if _client is None:
+            _client = QdrantClient(**qdrant_client_kwargs())
+            rag_logger.info(f"✅ Qdrant client ready ({'gRPC' if settings.qdrant_prefer_grpc else 'HTTP'})")
+        return _client
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """Process-wide async client for request handlers"""
+    global _async_client
+    with _clients_lock:
+        if _async_client is None:
+            _async_client = AsyncQdrantClient(**qdrant_client_kwargs())
+            rag_logger.info(f"✅ Async Qdrant client ready ({'gRPC' if settings.qdrant_prefer_grpc else 'HTTP'})")
+        return _async_client
+
+async def close_qdrant_clients():
+    global _client, _async_client
+    with _clients_lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+    
+    if async_client is not None:
+        await async_client.close()
+    if client is not None:
+        client.close()
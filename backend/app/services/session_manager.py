@@ -7,6 +7,8 @@ from dataclasses import dataclass, asdict
 from pathlib import Path
 import asyncio
 
+from app.config import settings
+from app.services.rag.generation.context_packer import pack_history
 from app.services.rag.utils.logging_config import rag_logger
 
 @dataclass
@@ -58,26 +60,22 @@ class ConversationSession:
         """Get recent conversation for context"""
         return self.messages[-max_messages:] if self.messages else []
     
-    def get_conversation_summary(self, max_chars: int = 800) -> str:
-        """Generate conversation summary for LLM context"""
+    def get_conversation_summary(self, max_tokens: Optional[int] = None, max_messages: int = 6) -> str:
+        """Generate conversation summary for LLM context, newest turns first within a token budget"""
         if not self.messages:
             return ""
             
-        recent_messages = self.get_recent_context(max_messages=6)
-        context_parts = []
+        recent_messages = self.get_recent_context(max_messages=max_messages)
+        turns = []
         
         for msg in recent_messages:
-            if msg.role == "user":
-                context_parts.append(f"User: {msg.content}")
-            else:
-                # Truncate long responses for context
-                content = msg.content[:200] + "..." if len(msg.content) > 200 else msg.content
-                # Remove disclaimers from context to save space
-                content = content.split("---")[0].strip()
-                context_parts.append(f"Assistant: {content}")
+            content = msg.content
+            if msg.role != "user":
+                # Remove disclaimers and the sources footer from context to save space
+                content = content.split("---")[0].split("**Sources:**")[0].strip()
+            turns.append((msg.role, content))
         
-        summary = "\n".join(context_parts)
-        return summary[:max_chars] + "..." if len(summary) > max_chars else summary
+        return pack_history(turns, max_tokens or settings.history_token_budget)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -168,13 +166,13 @@ class SessionManager:
         self._maybe_cleanup()
         return True
     
-    def get_conversation_context(self, session_id: str, max_messages: int = 6) -> str:
+    def get_conversation_context(self, session_id: str, max_messages: int = 6, max_tokens: Optional[int] = None) -> str:
         """Get conversation context for LLM"""
         session = self.get_session(session_id)
         if not session:
             return ""
             
-        return session.get_conversation_summary()
+        return session.get_conversation_summary(max_tokens=max_tokens, max_messages=max_messages)
     
     def clear_session(self, session_id: str) -> bool:
         """Clear conversation history but keep session"""
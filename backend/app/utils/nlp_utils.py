@@ -1,9 +1,13 @@
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Set
 from functools import lru_cache
+from pathlib import Path
+import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
 
+from app.services.rag.utils.embedding_cache import get_embedding_cache
+from app.services.rag.utils.model_registry import model_registry
+
 try:
     from transformers import pipeline
 except ImportError:
@@ -19,7 +23,6 @@ _MODEL_MAP = {
 }
 
 _MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
-_model = None
 
 @lru_cache(maxsize=8)
 def _get_pipeline(src: str, tgt: str):
@@ -31,14 +34,18 @@ def _get_pipeline(src: str, tgt: str):
     return pipeline("translation", model=model)
 
 def get_model():
-    global _model
-    if _model is None:
-        _model = SentenceTransformer(_MODEL_NAME)
-    return _model
+    return model_registry.get_sentence_transformer(_MODEL_NAME)
 
 def embed_texts(texts: List[str]) -> np.ndarray:
     model = get_model()
-    embs = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+    cache = get_embedding_cache(_MODEL_NAME, model.get_sentence_embedding_dimension())
+    if cache:
+        embs = cache.encode(
+            texts,
+            lambda missing: model.encode(missing, convert_to_numpy=True, show_progress_bar=False)
+        )
+    else:
+        embs = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
     if embs.ndim == 1:
         embs = embs.reshape(1, -1)
     return embs
@@ -54,26 +61,170 @@ def translate(text: str, src_lang: str, tgt_lang: str) -> str:
         return text
 
 class FaissRetriever:
-    def __init__(self, dim: int = None):
+    """
+    Inner-product FAISS index over normalized embeddings, with stable document IDs.
+
+    Documents can be added and removed incrementally, and the index and doc
+    store are saved to a directory that load() memory-maps (a memory-mapped
+    IVF index is read-only, so it is rebuilt in memory before the first
+    change). index_type "auto"
+    uses an exact flat index until the corpus reaches ann_threshold
+    documents, then HNSW; "flat", "ivf" and "hnsw" force one kind. HNSW
+    cannot delete, so removed IDs are skipped at query time until a rebuild.
+    """
+
+    def __init__(self, dim: int = None, index_type: str = "auto", ann_threshold: int = 50_000,
+                 hnsw_m: int = 32, hnsw_ef_search: int = 64, ivf_nprobe: int = 32):
         self.index = None
-        self.docs = []
+        self.docs: Dict[int, str] = {}
         self.dim = dim
+        self.index_type = index_type
+        self.ann_threshold = ann_threshold
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_search = hnsw_ef_search
+        self.ivf_nprobe = ivf_nprobe
+        self._kind = None  # Kind of the current index: "flat", "ivf" or "hnsw"
+        self._ids = np.empty(0, dtype=np.int64)  # Row -> doc ID, aligned with _vectors
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._removed: Set[int] = set()  # Removed IDs still present in an HNSW index
+        self._next_id = 0
+        self._mapped = False  # Index inverted lists memory-mapped read-only by load()
 
-    def build(self, docs: List[str]):
-        self.docs = docs
-        embs = embed_texts(docs)
-        self.dim = embs.shape[1]
-        self.index = faiss.IndexFlatIP(self.dim)
+    @property
+    def kind(self) -> Optional[str]:
+        return self._kind
+
+    def build(self, docs: List[str], embeddings: Optional[np.ndarray] = None) -> List[int]:
+        self.index, self._kind, self.docs, self._removed, self._next_id = None, None, {}, set(), 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors = np.empty((0, self.dim or 0), dtype=np.float32)
+        return self.add(docs, embeddings)
+
+    def add(self, docs: List[str], embeddings: Optional[np.ndarray] = None) -> List[int]:
+        if not docs:
+            return []
+        embs = np.ascontiguousarray(embed_texts(docs) if embeddings is None else embeddings, dtype=np.float32)
         faiss.normalize_L2(embs)
-        self.index.add(embs)
+        self.dim = embs.shape[1]
+        ids = np.arange(self._next_id, self._next_id + len(docs), dtype=np.int64)
+        self._next_id += len(docs)
+
+        self.docs.update(zip(ids.tolist(), docs))
+        self._ids = np.concatenate([self._ids, ids])
+        self._vectors = np.concatenate([self._vectors.reshape(-1, self.dim), embs])
+        if self.index is None or self._mapped or self._target_kind() != self._kind:
+            self._rebuild()
+        else:
+            self.index.add_with_ids(embs, ids)
+        return ids.tolist()
+
+    def remove(self, ids: List[int]) -> int:
+        ids = [doc_id for doc_id in ids if doc_id in self.docs]
+        if not ids:
+            return 0
+        for doc_id in ids:
+            del self.docs[doc_id]
+        keep = np.isin(self._ids, ids, invert=True)
+        self._ids, self._vectors = self._ids[keep], self._vectors[keep]
+
+        if self._mapped or self._target_kind() != self._kind:
+            self._rebuild()
+        elif self._kind == "hnsw":
+            self._removed.update(ids)
+            if len(self._removed) > 0.2 * max(len(self.docs), 1):
+                self._rebuild()
+        else:
+            self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+        return len(ids)
+
+    def _target_kind(self) -> str:
+        if self.index_type == "auto":
+            kind = "hnsw" if len(self._ids) >= self.ann_threshold else "flat"
+        else:
+            kind = self.index_type
+        if kind == "ivf" and len(self._ids) < 39 * self._ivf_nlist():
+            kind = "flat"  # Too few points to train the coarse quantizer
+        return kind
+
+    def _ivf_nlist(self) -> int:
+        return max(int(4 * np.sqrt(max(len(self._ids), 1))), 1)
+
+    def _rebuild(self):
+        kind = self._target_kind()
+        if kind == "hnsw":
+            hnsw = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            hnsw.hnsw.efSearch = self.hnsw_ef_search
+            index = faiss.IndexIDMap2(hnsw)
+        elif kind == "ivf":
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(self.dim), self.dim, self._ivf_nlist(), faiss.METRIC_INNER_PRODUCT)
+            index.train(self._vectors)
+            index.nprobe = self.ivf_nprobe
+        else:
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        if len(self._ids):
+            index.add_with_ids(np.ascontiguousarray(self._vectors), self._ids)
+        self.index, self._kind, self._removed, self._mapped = index, kind, set(), False
 
     def query(self, q: str, top_k: int = 5) -> List[Tuple[str, float]]:
-        q_emb = embed_texts([q])
-        faiss.normalize_L2(q_emb)
-        D, I = self.index.search(q_emb, top_k)
+        return self.query_many([q], top_k)[0]
+
+    def query_many(self, qs: List[str], top_k: int = 5,
+                   embeddings: Optional[np.ndarray] = None) -> List[List[Tuple[str, float]]]:
+        if self.index is None or not self.docs:
+            return [[] for _ in qs]
+        q_embs = np.ascontiguousarray(embed_texts(qs) if embeddings is None else embeddings, dtype=np.float32)
+        faiss.normalize_L2(q_embs)
+        D, I = self.index.search(q_embs, min(top_k + len(self._removed), self.index.ntotal))
         results = []
-        for idx, score in zip(I[0], D[0]):
-            if idx == -1:
-                continue
-            results.append((self.docs[idx], float(score)))
-        return results
\ No newline at end of file
+        for ids, scores in zip(I, D):
+            hits = [(self.docs[idx], float(score)) for idx, score in zip(ids, scores) if idx != -1 and idx not in self._removed]
+            results.append(hits[:top_k])
+        return results
+
+    def save(self, path: str):
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        if self._mapped:
+            self._rebuild()  # Written as is, it would only reference the mapped file
+        if self.index is not None:
+            faiss.write_index(self.index, str(directory / "index.faiss"))
+        np.save(directory / "vectors.npy", np.ascontiguousarray(self._vectors))
+        np.save(directory / "ids.npy", self._ids)
+        with open(directory / "docs.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim,
+                "index_type": self.index_type,
+                "kind": self._kind,
+                "ann_threshold": self.ann_threshold,
+                "hnsw_m": self.hnsw_m,
+                "hnsw_ef_search": self.hnsw_ef_search,
+                "ivf_nprobe": self.ivf_nprobe,
+                "next_id": self._next_id,
+                "removed": sorted(self._removed),
+                "doc_ids": list(self.docs),
+                "docs": list(self.docs.values())
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "FaissRetriever":
+        directory = Path(path)
+        with open(directory / "docs.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        search_params = {key: meta[key] for key in ("hnsw_m", "hnsw_ef_search", "ivf_nprobe") if key in meta}
+        retriever = cls(dim=meta["dim"], index_type=meta["index_type"], ann_threshold=meta["ann_threshold"], **search_params)
+        retriever.docs = dict(zip(meta["doc_ids"], meta["docs"]))
+        retriever._next_id = meta["next_id"]
+        retriever._removed = set(meta["removed"])
+        retriever._ids = np.load(directory / "ids.npy")
+        retriever._vectors = np.load(directory / "vectors.npy", mmap_mode="r" if mmap else None)
+        if (directory / "index.faiss").exists():
+            flags = faiss.IO_FLAG_MMAP if mmap else 0
+            retriever.index = faiss.read_index(str(directory / "index.faiss"), flags)
+            retriever._kind = meta["kind"]
+            if retriever._kind == "ivf":
+                retriever.index.nprobe = retriever.ivf_nprobe
+                retriever._mapped = mmap
+            elif retriever._kind == "hnsw":
+                faiss.downcast_index(retriever.index.index).hnsw.efSearch = retriever.hnsw_ef_search
+        return retriever
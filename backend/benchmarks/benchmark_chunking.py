@@ -0,0 +1,55 @@
+"""
+Benchmark medical chunking throughput on medlineplus_structured.json.
+
+Compares the single-pass MedicalSectionChunker ("medical") with the
+previous LangChain RecursiveCharacterTextSplitter setup
+("medical_langchain"), which was rebuilt on every call.
+
+Run from the backend directory:
+    python benchmarks/benchmark_chunking.py --repeats 20
+"""
+import sys
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.rag.ingestion.document_loader import DocumentLoader
+from app.services.rag.ingestion.chunking_strategies import ChunkingStrategy
+
+CORPUS = Path(__file__).resolve().parent.parent / "app" / "data" / "medical_knowledge" / "medlineplus_structured.json"
+
+def run(strategy: ChunkingStrategy, name: str, documents, repeats: int):
+    total_chars = sum(len(doc.page_content) for doc in documents)
+    
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chunks = strategy.chunk_documents(documents, name)
+    elapsed = (time.perf_counter() - start) / repeats
+    
+    print(f"{name:<20} {len(chunks):>6} chunks  {elapsed * 1000:8.1f} ms/pass  "
+          f"{len(documents) / elapsed:>10,.0f} docs/sec  {total_chars / elapsed / 1e6:6.1f} MB/s")
+    return elapsed, chunks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=str(CORPUS), help="JSON/CSV/TXT file to chunk")
+    parser.add_argument("--repeats", type=int, default=10, help="passes over the corpus per strategy")
+    args = parser.parse_args()
+    
+    documents = DocumentLoader().load_documents([args.corpus])
+    strategy = ChunkingStrategy()
+    print(f"Corpus: {len(documents)} documents, chunk_size={strategy.chunk_size}, "
+          f"chunk_overlap={strategy.chunk_overlap}\n")
+    
+    langchain_time, _ = run(strategy, "medical_langchain", documents, args.repeats)
+    native_time, native_chunks = run(strategy, "medical", documents, args.repeats)
+    
+    print(f"\nSpeedup: {langchain_time / native_time:.1f}x")
+    sections = Counter(chunk.metadata["medical_section"] for chunk in native_chunks)
+    print("Sections:", ", ".join(f"{name}={count}" for name, count in sections.most_common()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark embedding backends: PyTorch SentenceTransformer vs onnxruntime.
+
+Encodes the chunked medlineplus_structured.json corpus with each backend
+(bypassing the embedding cache) and reports single-query latency, batch
+throughput, and cosine drift of the ONNX vectors against the torch ones,
+plus how often the top-k neighbours of sample queries stay the same.
+
+Run from the backend directory:
+    python benchmarks/benchmark_embedding_backends.py --limit 500
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sentence_transformers import SentenceTransformer
+
+from app.config import settings
+from app.services.rag.ingestion.document_loader import DocumentLoader
+from app.services.rag.ingestion.chunking_strategies import ChunkingStrategy
+from app.services.rag.ingestion.onnx_embedder import OnnxEmbedder
+
+CORPUS = Path(__file__).resolve().parent.parent / "app" / "data" / "medical_knowledge" / "medlineplus_structured.json"
+
+QUERIES = [
+    "What are the symptoms of diabetes?",
+    "How is high blood pressure treated?",
+    "When should I see a doctor for chest pain?",
+    "What causes asthma attacks?",
+    "How can I prevent the flu?",
+    "Is a persistent cough a sign of something serious?",
+    "What are the side effects of ibuprofen?",
+    "How do I know if I have a migraine?",
+]
+
+def measure(name: str, model, texts, queries, batch_size: int):
+    model.encode(queries[:2], batch_size=batch_size)  # Warm up
+    
+    latencies = []
+    for query in queries * 3:
+        start = time.perf_counter()
+        model.encode([query], batch_size=batch_size)
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    start = time.perf_counter()
+    embeddings = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    
+    print(f"{name:<10} query p50 {np.percentile(latencies, 50):7.2f} ms  p95 {np.percentile(latencies, 95):7.2f} ms  "
+          f"batch {len(texts) / elapsed:8.1f} chunks/sec")
+    return embeddings, np.asarray(model.encode(queries, batch_size=batch_size), dtype=np.float32)
+
+def drift(name: str, reference, candidate, reference_queries, candidate_queries, top_k: int):
+    cosine = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    reference_top = np.argsort(-reference_queries @ reference.T, axis=1)[:, :top_k]
+    candidate_top = np.argsort(-candidate_queries @ candidate.T, axis=1)[:, :top_k]
+    overlap = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(reference_top, candidate_top)])
+    
+    print(f"{name:<10} cosine vs torch mean {cosine.mean():.5f}  min {cosine.min():.5f}  "
+          f"top-{top_k} overlap {overlap:.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.embedding_model_name, help="sentence-transformers model")
+    parser.add_argument("--corpus", default=str(CORPUS), help="JSON/CSV/TXT file to chunk and embed")
+    parser.add_argument("--limit", type=int, default=1000, help="max chunks to embed")
+    parser.add_argument("--batch-size", type=int, default=settings.embedding_batch_size)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--skip-fp32", action="store_true", help="only compare torch against ONNX int8")
+    args = parser.parse_args()
+    
+    documents = DocumentLoader().load_documents([args.corpus])
+    texts = [chunk.page_content for chunk in ChunkingStrategy().chunk_documents(documents)][:args.limit]
+    print(f"Model: {args.model}  chunks: {len(texts)}  batch_size: {args.batch_size}\n")
+    
+    backends = [("torch", SentenceTransformer(args.model, device="cpu"))]
+    if not args.skip_fp32:
+        backends.append(("onnx-fp32", OnnxEmbedder(args.model, quantize=False)))
+    backends.append(("onnx-int8", OnnxEmbedder(args.model, quantize=True)))
+    
+    results = {name: measure(name, model, texts, QUERIES, args.batch_size) for name, model in backends}
+    
+    print()
+    reference, reference_queries = results["torch"]
+    for name, (embeddings, query_embeddings) in results.items():
+        if name != "torch":
+            drift(name, reference, embeddings, reference_queries, query_embeddings, args.top_k)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark multi-process embedding throughput as workers scale.
+
+Encodes the chunked medlineplus_structured.json corpus in-process and then
+with EmbeddingPool at each requested worker count (bypassing the embedding
+cache), reporting chunks/sec, speedup and pool start-up time. Results are
+checked against the in-process vectors to confirm order is preserved.
+
+Run from the backend directory:
+    python benchmarks/benchmark_embedding_pool.py --workers 1 2 4 8
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sentence_transformers import SentenceTransformer
+
+from app.config import settings
+from app.services.rag.ingestion.document_loader import DocumentLoader
+from app.services.rag.ingestion.chunking_strategies import ChunkingStrategy
+from app.services.rag.ingestion.embedding_pool import EmbeddingPool
+
+CORPUS = Path(__file__).resolve().parent.parent / "app" / "data" / "medical_knowledge" / "medlineplus_structured.json"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.embedding_model_name, help="sentence-transformers model")
+    parser.add_argument("--corpus", default=str(CORPUS), help="JSON/CSV/TXT file to chunk and embed")
+    parser.add_argument("--limit", type=int, default=2000, help="max chunks to embed")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to try")
+    parser.add_argument("--shard-size", type=int, default=settings.embedding_pool_shard_size)
+    parser.add_argument("--batch-size", type=int, default=settings.embedding_batch_size)
+    args = parser.parse_args()
+    
+    documents = DocumentLoader().load_documents([args.corpus])
+    texts = [chunk.page_content for chunk in ChunkingStrategy().chunk_documents(documents)][:args.limit]
+    print(f"Model: {args.model}  chunks: {len(texts)}  shard_size: {args.shard_size}  "
+          f"batch_size: {args.batch_size}\n")
+    
+    model = SentenceTransformer(args.model, device="cpu")
+    model.encode(texts[:args.batch_size], batch_size=args.batch_size)  # Warm up
+    start = time.perf_counter()
+    reference = model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True)
+    baseline = len(texts) / (time.perf_counter() - start)
+    print(f"{'in-process':<12} {baseline:8.1f} chunks/sec")
+    
+    for num_workers in args.workers:
+        pool = EmbeddingPool(args.model, num_workers, backend="torch",
+                             shard_size=args.shard_size, batch_size=args.batch_size)
+        
+        start = time.perf_counter()
+        pool.encode(texts[:num_workers])  # Start workers and load their models
+        startup = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        embeddings = pool.encode(texts)
+        throughput = len(texts) / (time.perf_counter() - start)
+        pool.shutdown()
+        
+        max_error = float(np.abs(embeddings - reference).max())
+        print(f"{num_workers:>2} workers   {throughput:8.1f} chunks/sec  {throughput / baseline:5.2f}x  "
+              f"startup {startup:5.1f}s  max |diff| {max_error:.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark end-to-end /api/rag/query throughput with the stub LLM provider.
+
+Serves the RAG router with uvicorn on 127.0.0.1 inside the benchmark
+process (no external network) with LLM_PROVIDER=stub, so retrieval, prompt building, post-processing and the
+HTTP layer are measured against a model of fixed, configurable speed. For
+each concurrency level it reports requests/sec and latency percentiles for
+/query, and time-to-first-token for /query/stream.
+
+Queries are made unique and the semantic cache and single-flight layer are
+disabled unless --with-caches is given, so every request does full work.
+Use VECTOR_STORE_BACKEND=faiss for a run without a Qdrant server (the
+collection must already be ingested).
+
+Run from the backend directory:
+    python benchmarks/benchmark_end_to_end.py --concurrency 1 4 16 --latency-ms 300
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+QUERIES = [
+    "What are the symptoms of asthma?",
+    "How is high blood pressure treated?",
+    "What causes type 2 diabetes?",
+    "What are the side effects of metformin?",
+    "When should I see a doctor for a migraine?",
+    "How can I lower my cholesterol?",
+    "What are the early signs of pneumonia?",
+    "Is a persistent cough a sign of something serious?"
+]
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+async def run_level(client, concurrency: int, num_requests: int, unique: bool, stream: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_tokens, failures = [], [], 0
+    
+    async def one(index: int):
+        nonlocal failures
+        query = QUERIES[index % len(QUERIES)]
+        if unique:
+            query = f"{query} (request {index})"
+        async with semaphore:
+            start = time.perf_counter()
+            if stream:
+                first_token = None
+                async with client.stream("POST", "/api/rag/query/stream", json={"query": query}) as response:
+                    async for line in response.aiter_lines():
+                        if line.startswith("event:") and first_token is None:
+                            first_token = time.perf_counter() - start
+                            first_tokens.append(first_token)
+                        if line == "event: error":
+                            failures += 1
+            else:
+                response = await client.post("/api/rag/query", json={"query": query})
+                if response.status_code != 200 or not response.json().get("success"):
+                    failures += 1
+            latencies.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[one(index) for index in range(num_requests)])
+    elapsed = time.perf_counter() - start
+    return num_requests / elapsed, latencies, first_tokens, failures
+
+async def benchmark(args):
+    import httpx
+    import uvicorn
+    from fastapi import FastAPI
+    from app.routers import rag
+    
+    app = FastAPI()
+    app.include_router(rag.router)
+    
+    # A real server rather than httpx's ASGI transport, which buffers whole responses and hides streaming
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            return serving.result()
+        await asyncio.sleep(0.05)
+    
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=None, limits=limits) as client:
+        await client.post("/api/rag/query", json={"query": QUERIES[0]})  # Warm up models and connections
+        
+        print(f"{'mode':<7} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttft p50':>9} {'fail':>5}")
+        for concurrency in args.concurrency:
+            for stream in (False, True):
+                rps, latencies, first_tokens, failures = await run_level(
+                    client, concurrency, args.requests, not args.with_caches, stream
+                )
+                ttft = f"{percentile(first_tokens, 50):>9.1f}" if stream else f"{'-':>9}"
+                print(f"{'stream' if stream else 'query':<7} {concurrency:>5} {rps:>8.2f} "
+                      f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+                      f"{percentile(latencies, 99):>8.1f} {ttft} {failures:>5}")
+    
+    server.should_exit = True
+    await serving
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level and mode")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="concurrent clients")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="stub delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="stub token rate")
+    parser.add_argument("--response-tokens", type=int, default=150, help="stub tokens per answer")
+    parser.add_argument("--port", type=int, default=8765, help="local port for the benchmark server")
+    parser.add_argument("--with-caches", action="store_true", help="keep the semantic cache and single-flight enabled")
+    args = parser.parse_args()
+    
+    # Settings are read at import time, so configure them before importing the app
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["STUB_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["STUB_LLM_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["STUB_LLM_RESPONSE_TOKENS"] = str(args.response_tokens)
+    if not args.with_caches:
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+        os.environ["SINGLE_FLIGHT_ENABLED"] = "false"
+    
+    print(f"stub: {args.latency_ms:.0f}ms to first token, {args.tokens_per_second:.0f} tokens/s, "
+          f"{args.response_tokens} tokens  requests per level: {args.requests}\n")
+    asyncio.run(benchmark(args))
+
+if __name__ == "__main__":
+    main()
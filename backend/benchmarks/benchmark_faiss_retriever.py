@@ -0,0 +1,90 @@
+"""
+Benchmark nlp_utils.FaissRetriever build and query time against corpus size.
+
+Uses clustered random unit vectors in place of model embeddings (real
+embeddings cluster by topic), so only index costs are measured. For each corpus size and index kind it reports build time,
+save and memory-mapped load time, single-query and batched (query_many)
+latency, and recall@k of the approximate indexes against the exact one.
+
+Run from the backend directory:
+    python benchmarks/benchmark_faiss_retriever.py --sizes 1000 10000 100000
+"""
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.nlp_utils import FaissRetriever
+
+def unit_vectors(rng: np.random.Generator, count: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def clustered_vectors(rng: np.random.Generator, count: int, dim: int, clusters: int) -> np.ndarray:
+    centers = unit_vectors(rng, clusters, dim)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * unit_vectors(rng, count, dim)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="corpus sizes")
+    parser.add_argument("--kinds", nargs="+", default=["flat", "ivf", "hnsw"], help="index kinds to compare")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="queries per measurement")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    print(f"dim: {args.dim}  queries: {args.queries}  top_k: {args.top_k}\n")
+    print(f"{'docs':>8} {'kind':<6} {'build s':>9} {'save s':>8} {'load ms':>8} "
+          f"{'query ms':>9} {'batch ms/q':>11} {'recall':>7}")
+    
+    for size in args.sizes:
+        corpus = clustered_vectors(rng, size, args.dim, clusters=max(size // 100, 10))
+        # Queries near stored documents, as real queries land near relevant chunks
+        queries = corpus[rng.integers(0, size, args.queries)] + 0.3 * unit_vectors(rng, args.queries, args.dim)
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+        docs = [f"doc {i}" for i in range(size)]
+        labels = ["q"] * args.queries
+        exact = None
+        
+        for kind in args.kinds:
+            retriever = FaissRetriever(index_type=kind)
+            start = time.perf_counter()
+            retriever.build(docs, corpus)
+            build_seconds = time.perf_counter() - start
+            
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                retriever.save(directory)
+                save_seconds = time.perf_counter() - start
+                
+                start = time.perf_counter()
+                loaded = FaissRetriever.load(directory, mmap=True)
+                load_ms = (time.perf_counter() - start) * 1000
+                
+                start = time.perf_counter()
+                for query in queries:
+                    loaded.query_many(["q"], args.top_k, embeddings=query.reshape(1, -1))
+                query_ms = (time.perf_counter() - start) * 1000 / args.queries
+                
+                start = time.perf_counter()
+                results = loaded.query_many(labels, args.top_k, embeddings=queries)
+                batch_ms = (time.perf_counter() - start) * 1000 / args.queries
+                del loaded
+            
+            found = [{doc for doc, _ in hits} for hits in results]
+            if exact is None:
+                exact = found
+            recall = np.mean([len(hits & truth) / max(len(truth), 1) for hits, truth in zip(found, exact)])
+            print(f"{size:>8} {retriever.kind:<6} {build_seconds:>9.3f} {save_seconds:>8.3f} {load_ms:>8.1f} "
+                  f"{query_ms:>9.3f} {batch_ms:>11.3f} {recall:>7.3f}")
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+from langchain_core.documents import Document
+
+from app.services.rag.generation.context_packer import ContextPacker, count_tokens, pack_history, trim_to_tokens
+
+SENTENCE = "Asthma inflames and narrows the airways of the lungs. "
+
+def doc(text: str, score: float = None) -> Document:
+    return Document(page_content=text, metadata={} if score is None else {"relevance_score": score})
+
+def test_trim_keeps_whole_leading_sentences():
+    text = "First sentence here. Second sentence here. Third sentence here."
+    
+    trimmed = trim_to_tokens(text, count_tokens("First sentence here. Second sentence here.") + 1)
+    
+    assert trimmed == "First sentence here. Second sentence here."
+    assert trim_to_tokens(text, 2) == ""
+
+def test_chunks_are_packed_by_relevance_within_the_budget():
+    documents = [doc("low " + SENTENCE, 0.2), doc("high " + SENTENCE, 0.9), doc("mid " + SENTENCE, 0.5)]
+    per_chunk = count_tokens(documents[0].page_content) + count_tokens("\n\n")
+    
+    packed = ContextPacker(max_tokens=2 * per_chunk, min_chunk_tokens=100).pack(documents)
+    
+    assert [d.page_content.split()[0] for d in packed.documents] == ["high", "mid"]
+    assert packed.dropped == 1
+    assert packed.tokens["total"] <= 2 * per_chunk
+
+def test_chunk_that_does_not_fit_is_cut_to_leading_sentences():
+    documents = [doc(SENTENCE * 2, 0.9), doc(SENTENCE * 6, 0.5)]
+    budget = count_tokens(SENTENCE) * 5
+    
+    packed = ContextPacker(max_tokens=budget, min_chunk_tokens=5).pack(documents)
+    
+    assert packed.trimmed == 1
+    assert packed.documents[1].metadata["trimmed"] is True
+    assert packed.documents[1].page_content.endswith("lungs.")
+    assert packed.tokens["context"] <= budget
+
+def test_top_chunk_is_kept_when_the_fixed_text_fills_the_budget():
+    documents = [doc(SENTENCE * 20, 0.9), doc(SENTENCE, 0.5)]
+    
+    packed = ContextPacker(max_tokens=50, min_chunk_tokens=30).pack(documents, fixed_text="word " * 200)
+    
+    assert len(packed.documents) == 1
+    assert packed.documents[0].page_content.startswith("Asthma")
+    assert 0 < count_tokens(packed.context) <= 30
+
+def test_top_chunk_with_one_long_sentence_is_cut_at_a_word():
+    packed = ContextPacker(max_tokens=10, min_chunk_tokens=10).pack([doc("word " * 100)])
+    
+    assert packed.context == " ".join(["word"] * 10)
+
+def test_history_keeps_the_most_recent_turns():
+    messages = [("user", "First question?"), ("assistant", "First answer."), ("user", "Second question?")]
+    
+    history = pack_history(messages, count_tokens("Assistant: First answer.\nUser: Second question?"))
+    
+    assert history == "Assistant: First answer.\nUser: Second question?"
+
+def test_fused_score_ranks_ahead_of_cosine_similarity():
+    documents = [
+        Document(page_content="dense favourite", metadata={"relevance_score": 0.9, "rrf_score": 0.016}),
+        Document(page_content="found by both", metadata={"relevance_score": 0.5, "rrf_score": 0.032}),
+    ]
+    
+    packed = ContextPacker(max_tokens=1000, min_chunk_tokens=5).pack(documents)
+    
+    assert [doc.page_content for doc in packed.documents] == ["found by both", "dense favourite"]
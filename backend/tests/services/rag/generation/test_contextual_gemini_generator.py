@@ -0,0 +1,58 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from app.services.rag.generation import contextual_gemini_generator
+from app.services.rag.generation.contextual_gemini_generator import ContextualGeminiGenerator
+from app.services.rag.generation.context_packer import ContextPacker
+from app.services.rag.generation.prompt_templates import MedicalPromptTemplates
+from app.services.rag.generation.response_processor import MedicalResponseProcessor
+from app.services.session_manager import SessionManager
+
+QUERY = "What are the symptoms of asthma?"
+
+class FakeRetriever:
+    async def retrieve_documents(self, query, k):
+        return [Document(page_content="Asthma causes wheezing and shortness of breath.", metadata={"source": "a.json"})]
+
+def make_generator(tmp_path, monkeypatch):
+    sessions = SessionManager(storage_path=str(tmp_path / "sessions"))
+    monkeypatch.setattr(contextual_gemini_generator, "session_manager", sessions)
+    
+    generator = ContextualGeminiGenerator.__new__(ContextualGeminiGenerator)
+    generator.retriever = FakeRetriever()
+    generator.model_name = "test-model-contextual"
+    generator.prompt_templates = MedicalPromptTemplates()
+    generator.response_processor = MedicalResponseProcessor()
+    generator.context_packer = ContextPacker(max_tokens=2000)
+    
+    async def stream_with_context(**kwargs):
+        for text in ("Wheezing ", "is common."):
+            yield text
+    
+    generator._stream_with_context = stream_with_context
+    return generator, sessions
+
+def test_abandoned_stream_creates_no_session(tmp_path, monkeypatch):
+    generator, sessions = make_generator(tmp_path, monkeypatch)
+    
+    async def abandon():
+        events = generator.stream_response(QUERY)
+        assert (await events.__anext__())["event"] == "token"
+        await events.aclose()
+    
+    asyncio.run(abandon())
+    
+    assert sessions.get_active_sessions_count() == 0
+    assert not list((tmp_path / "sessions").iterdir())
+
+def test_completed_stream_saves_the_exchange_to_a_new_session(tmp_path, monkeypatch):
+    generator, sessions = make_generator(tmp_path, monkeypatch)
+    
+    async def consume():
+        return [event async for event in generator.stream_response(QUERY)]
+    
+    result = asyncio.run(consume())[-1]["result"]
+    session = sessions.get_session(result["session_id"])
+    
+    assert [message.role for message in session.messages] == ["user", "assistant"]
@@ -0,0 +1,69 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.rag.generation.gemini_generator import GeminiMedicalGenerator
+from app.services.rag.generation.prompt_templates import MedicalPromptTemplates
+from app.services.rag.generation.response_processor import MedicalResponseProcessor
+from app.services.rag.generation.context_packer import ContextPacker
+from app.services.rag.generation.semantic_cache import SemanticAnswerCache
+from app.services.rag.utils.kb_version import get_kb_version
+
+CACHED_QUERY = "What are the symptoms of asthma?"
+URGENT_QUERY = "What are the symptoms of severe asthma?"
+NEW_QUERY = "How is diabetes diagnosed?"
+
+class FakeRetriever:
+    """Embeds every query about asthma to the same vector, and records retrieval batches"""
+    
+    def __init__(self):
+        self.batches = []
+    
+    async def embed_queries(self, queries):
+        return [[1.0, 0.0] if "asthma" in query else [0.0, 1.0] for query in queries]
+    
+    async def retrieve_documents_batch(self, queries, k, embeddings):
+        self.batches.append(list(queries))
+        return [[Document(page_content=f"Context for {query}", metadata={"source": "a.json"})] for query in queries]
+
+def make_generator(tmp_path, monkeypatch) -> GeminiMedicalGenerator:
+    monkeypatch.setattr(settings, "cache_path", tmp_path)
+    generator = GeminiMedicalGenerator.__new__(GeminiMedicalGenerator)
+    generator.retriever = FakeRetriever()
+    generator.model_name = "test-model"
+    generator.prompt_templates = MedicalPromptTemplates()
+    generator.response_processor = MedicalResponseProcessor()
+    generator.context_packer = ContextPacker(max_tokens=2000)
+    generator.answer_cache = SemanticAnswerCache(max_entries=4, threshold=0.9, dimension=2)
+    generator.single_flight = None
+    
+    async def generate_with_gemini(query, context, prompt_template):
+        return f"Answer to {query}"
+    
+    generator._generate_with_gemini = generate_with_gemini
+    generator.answer_cache.store(CACHED_QUERY, [1.0, 0.0], 3, {"success": True, "response": "cached"}, get_kb_version())
+    return generator
+
+async def collect(generator, queries):
+    return [result async for result in generator.generate_medical_responses(queries, max_chunks=3)]
+
+def test_batch_answers_cache_hits_without_retrieving_them(tmp_path, monkeypatch):
+    generator = make_generator(tmp_path, monkeypatch)
+    
+    results = asyncio.run(collect(generator, [CACHED_QUERY, NEW_QUERY]))
+    
+    assert results[0]["cache_hit"] and results[0]["response"] == "cached"
+    assert "cache_hit" not in results[1]
+    assert generator.retriever.batches == [[NEW_QUERY]]
+
+def test_urgent_queries_bypass_the_cache(tmp_path, monkeypatch):
+    generator = make_generator(tmp_path, monkeypatch)
+    
+    results = asyncio.run(collect(generator, [URGENT_QUERY]))
+    
+    assert results[0]["urgency_level"] == "high"
+    assert "cache_hit" not in results[0]
+    assert generator.retriever.batches == [[URGENT_QUERY]]
+    assert generator.answer_cache.stats()["bypassed"] == 1
+    assert generator.answer_cache.stats()["entries"] == 1  # The urgent answer is not cached
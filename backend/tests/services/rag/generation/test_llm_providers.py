@@ -0,0 +1,34 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.config import settings
+from app.services.rag.generation.llm_providers import StubChatModel, create_chat_model
+
+def test_stub_replies_are_deterministic_per_prompt():
+    model = StubChatModel(latency_ms=0, tokens_per_second=0, response_tokens=20)
+    
+    first = model.invoke([HumanMessage(content="What are the symptoms of asthma?")]).content
+    again = model.invoke([HumanMessage(content="What are the symptoms of asthma?")]).content
+    other = model.invoke([HumanMessage(content="How is diabetes treated?")]).content
+    
+    assert first == again != other
+    assert len(first.split()) == 20
+
+def test_stub_stream_matches_invoke():
+    model = StubChatModel(latency_ms=0, tokens_per_second=0, response_tokens=15)
+    messages = [HumanMessage(content="Asthma triggers")]
+    
+    streamed = "".join(chunk.content for chunk in model.stream(messages))
+    
+    assert streamed.strip() == model.invoke(messages).content
+
+def test_generation_params_default_to_settings_and_can_be_left_to_the_client(monkeypatch):
+    pytest.importorskip("langchain_groq")
+    monkeypatch.setattr(settings, "groq_api_key", "test-key")
+    
+    configured = create_chat_model("groq")
+    client_defaults = create_chat_model("groq", generation_params={})
+    
+    assert (configured.temperature, configured.max_tokens) == (settings.llm_temperature, settings.llm_max_tokens)
+    assert client_defaults.max_tokens is None
+    assert client_defaults.temperature != settings.llm_temperature
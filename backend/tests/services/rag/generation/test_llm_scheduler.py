@@ -0,0 +1,182 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.rag.generation.llm_scheduler import AdaptiveTokenBucket, LLMDeadlineExceeded, LLMScheduler
+
+class RateLimited(Exception):
+    status_code = 429
+
+class FakeLLM:
+    """Records concurrency; delay(i) and error(i) script the i-th call"""
+    
+    def __init__(self, delay=lambda i: 0.01, error=lambda i: None, chunks=3):
+        self.delay, self.error, self.chunks = delay, error, chunks
+        self.calls = self.active = self.peak = 0
+    
+    async def ainvoke(self, messages):
+        index = self.calls
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay(index))
+            if self.error(index):
+                raise self.error(index)
+            return SimpleNamespace(content=f"reply {index}")
+        finally:
+            self.active -= 1
+    
+    async def astream(self, messages):
+        index = self.calls
+        self.calls += 1
+        if self.error(index):
+            raise self.error(index)
+        for chunk in range(self.chunks):
+            await asyncio.sleep(self.delay(index))
+            yield SimpleNamespace(content=f"token {chunk}")
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "llm_retry_base_seconds", 0.01)
+    monkeypatch.setattr(settings, "llm_retry_max_seconds", 0.02)
+
+def scheduler(**kwargs) -> LLMScheduler:
+    options = {"max_concurrency": 4, "rate_per_second": 0, "hedge_after_ms": 0, "max_retries": 2}
+    return LLMScheduler(**{**options, **kwargs})
+
+def test_bucket_halves_on_rate_limit_and_recovers_additively():
+    bucket = AdaptiveTokenBucket(rate=10.0, burst=5, min_rate=1.0)
+    
+    bucket.on_rate_limited()
+    bucket.on_rate_limited()
+    assert bucket.rate == 2.5
+    for _ in range(3):
+        bucket.on_rate_limited()
+    assert bucket.rate == 1.0
+    
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(1.5)
+    for _ in range(50):
+        bucket.on_success()
+    assert bucket.rate == 10.0
+
+def test_bucket_paces_calls_beyond_the_burst():
+    async def main():
+        bucket = AdaptiveTokenBucket(rate=50.0, burst=2, min_rate=1.0)
+        start = time.monotonic()
+        for _ in range(7):
+            await bucket.acquire()
+        return time.monotonic() - start
+    
+    assert asyncio.run(main()) >= 0.09  # 5 calls past the burst at 50/s
+
+def test_concurrency_is_capped():
+    llm = FakeLLM(delay=lambda i: 0.02)
+    gate = scheduler(max_concurrency=3)
+    
+    async def main():
+        await asyncio.gather(*[gate.ainvoke(llm, []) for _ in range(10)])
+    
+    asyncio.run(main())
+    assert llm.peak == 3
+    assert gate.stats()["succeeded"] == 10 and gate.stats()["in_flight"] == 0
+
+def test_rate_limit_errors_are_retried_and_slow_the_bucket():
+    llm = FakeLLM(error=lambda i: RateLimited("429 quota") if i < 2 else None)
+    gate = scheduler(rate_per_second=100, burst=10)
+    
+    response = asyncio.run(gate.ainvoke(llm, []))
+    
+    assert response.content == "reply 2"
+    stats = gate.stats()
+    assert (stats["retries"], stats["rate_limited"]) == (2, 2)
+    assert stats["rate_per_second"] < 100
+
+def test_non_retryable_errors_fail_immediately():
+    llm = FakeLLM(error=lambda i: ValueError("invalid request"))
+    gate = scheduler()
+    
+    with pytest.raises(ValueError):
+        asyncio.run(gate.ainvoke(llm, []))
+    assert llm.calls == 1 and gate.stats()["failed"] == 1
+
+def test_retries_stop_at_max_retries():
+    llm = FakeLLM(error=lambda i: RateLimited("429"))
+    gate = scheduler(max_retries=2)
+    
+    with pytest.raises(RateLimited):
+        asyncio.run(gate.ainvoke(llm, []))
+    assert llm.calls == 3
+
+def test_slow_calls_time_out_within_the_deadline():
+    llm = FakeLLM(delay=lambda i: 1.0)
+    gate = scheduler(timeout_seconds=0.05, deadline_seconds=0.2, max_retries=10)
+    
+    start = time.monotonic()
+    with pytest.raises((LLMDeadlineExceeded, asyncio.TimeoutError)):
+        asyncio.run(gate.ainvoke(llm, []))
+    
+    assert time.monotonic() - start < 0.5
+    assert gate.stats()["timeouts"] >= 1 and gate.stats()["in_flight"] == 0
+
+def test_queued_calls_give_up_at_the_deadline():
+    gate = scheduler(max_concurrency=1, deadline_seconds=0.1)
+    
+    async def main():
+        return await asyncio.gather(
+            gate.ainvoke(FakeLLM(delay=lambda i: 0.3), []),
+            gate.ainvoke(FakeLLM(), []),
+            return_exceptions=True
+        )
+    
+    slow, queued = asyncio.run(main())
+    assert isinstance(queued, LLMDeadlineExceeded)
+
+def test_hedged_request_wins_when_the_primary_is_slow():
+    llm = FakeLLM(delay=lambda i: 1.0 if i == 0 else 0.01)
+    gate = scheduler(hedge_after_ms=30)
+    
+    async def main():
+        start = time.monotonic()
+        response = await gate.ainvoke(llm, [])
+        await asyncio.sleep(0.01)  # Let the cancelled primary release its slot
+        return response, time.monotonic() - start
+    
+    response, elapsed = asyncio.run(main())
+    
+    assert response.content == "reply 1" and elapsed < 0.5
+    assert (gate.stats()["hedged"], gate.stats()["hedges_won"]) == (1, 1)
+    assert gate.stats()["in_flight"] == 0
+
+def test_fast_calls_are_not_hedged():
+    llm = FakeLLM(delay=lambda i: 0.01)
+    gate = scheduler(hedge_after_ms=100)
+    
+    asyncio.run(gate.ainvoke(llm, []))
+    
+    assert llm.calls == 1 and gate.stats()["hedged"] == 0
+
+def test_stream_is_retried_before_its_first_chunk():
+    llm = FakeLLM(error=lambda i: RateLimited("429") if i == 0 else None)
+    gate = scheduler()
+    
+    async def main():
+        return [chunk.content async for chunk in gate.astream(llm, [])]
+    
+    assert asyncio.run(main()) == ["token 0", "token 1", "token 2"]
+    assert gate.stats()["retries"] == 1
+
+def test_abandoned_stream_releases_its_slot():
+    gate = scheduler(max_concurrency=1)
+    
+    async def main():
+        stream = gate.astream(FakeLLM(), [])
+        await stream.__anext__()
+        await stream.aclose()
+    
+    asyncio.run(main())
+    assert gate.stats()["in_flight"] == 0 and not gate._semaphore.locked()
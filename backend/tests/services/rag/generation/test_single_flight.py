@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.services.rag.generation.single_flight import SingleFlight
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    executions = []
+    
+    async def work(key):
+        executions.append(key)
+        await asyncio.sleep(0.05)
+        return f"answer for {key}"
+    
+    async def main():
+        keys = ["asthma"] * 5 + ["diabetes"]
+        return await asyncio.gather(*[flight.do(key, lambda key=key: work(key)) for key in keys])
+    
+    results = asyncio.run(main())
+    
+    assert executions == ["asthma", "diabetes"]
+    assert [shared for _, shared in results] == [False, True, True, True, True, False]
+    assert results[4][0] == "answer for asthma"
+    assert flight.stats()["collapsed"] == 4 and flight.stats()["in_flight"] == 0
+
+def test_keys_are_released_once_the_work_finishes():
+    flight = SingleFlight()
+    calls = []
+    
+    async def work():
+        calls.append(1)
+        return len(calls)
+    
+    async def main():
+        first = await flight.do("key", work)
+        second = await flight.do("key", work)
+        return first, second
+    
+    assert asyncio.run(main()) == ((1, False), (2, False))
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("LLM unavailable")
+    
+    async def main():
+        return await asyncio.gather(flight.do("key", work), flight.do("key", work), return_exceptions=True)
+    
+    results = asyncio.run(main())
+    
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_work():
+    flight = SingleFlight()
+    
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+    
+    async def main():
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+    
+    assert asyncio.run(main()) == ("answer", True)
+
+def test_normalize_ignores_case_and_spacing():
+    assert SingleFlight.normalize("  How is ASTHMA\ttreated ") == "how is asthma treated"
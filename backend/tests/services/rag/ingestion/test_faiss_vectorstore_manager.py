@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.rag.ingestion.faiss_vectorstore_manager import FaissVectorStoreManager
+
+@pytest.fixture
+def store(tmp_path):
+    store = FaissVectorStoreManager("test_collection", index_dir=tmp_path)
+    documents = [Document(page_content=f"chunk {i}", metadata={"source": "a.json"}) for i in range(3)]
+    vectors = np.eye(3, settings.embedding_dimension, dtype=np.float32)
+    store.add_documents(documents, vectors.tolist())
+    yield store
+    store.flush()  # Write now rather than from atexit, after pytest has closed the log stream
+
+def test_delete_counts_only_points_that_were_removed(store):
+    point_ids = list(store._rows)
+    
+    assert store.delete_documents([point_ids[0], "unknown-id"]) == 1
+    assert store.delete_documents([point_ids[0]]) == 0
+    assert store.delete_documents(point_ids) == 2
+
+def test_deleted_points_are_not_returned_by_search(store):
+    point_ids = list(store._rows)
+    store.delete_documents([point_ids[0]])
+    
+    results = store.search(np.eye(1, settings.embedding_dimension)[0].tolist(), k=3)
+    
+    assert point_ids[0] not in {result["id"] for result in results}
+    assert len(results) == 2
+
+def test_reloaded_ivf_index_accepts_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_index_type", "ivf")
+    monkeypatch.setattr(settings, "faiss_ivf_nlist", 4)
+    rng = np.random.default_rng(0)
+    documents = [Document(page_content=f"chunk {i}", metadata={"source": "a.json"}) for i in range(1001)]
+    vectors = rng.standard_normal((len(documents), settings.embedding_dimension)).astype(np.float32)
+    
+    store = FaissVectorStoreManager("test_collection", index_dir=tmp_path)
+    store.add_documents(documents[:1000], vectors[:1000].tolist())
+    store.flush()
+    assert hasattr(store.index, "nprobe")
+    
+    reloaded = FaissVectorStoreManager("test_collection", index_dir=tmp_path)
+    new_id = reloaded.add_documents(documents[1000:], vectors[1000:].tolist())[0]
+    reloaded.delete_documents([reloaded._point_ids[0]])
+    reloaded.flush()
+    
+    final = FaissVectorStoreManager("test_collection", index_dir=tmp_path)
+    results = final.search(vectors[1000].tolist(), k=1)
+    
+    assert final.index.ntotal == 1001
+    assert results[0]["id"] == new_id
@@ -0,0 +1,42 @@
+import os
+
+from app.config import settings
+from app.services.rag.ingestion.ingestion_manifest import IngestionManifest
+
+def test_unchanged_files_are_recognized_until_content_or_chunking_changes(tmp_path):
+    path = tmp_path / "asthma.json"
+    path.write_text('[{"content": "Asthma"}]')
+    manifest = IngestionManifest("test", manifest_dir=tmp_path)
+    fingerprint = manifest.file_fingerprint(str(path))
+    manifest.update_source(str(path), fingerprint, "medical:500:50:v4", ["a", "b"], ["Asthma"])
+    
+    assert manifest.is_unchanged(str(path), manifest.file_fingerprint(str(path)), "medical:500:50:v4")
+    assert not manifest.is_unchanged(str(path), fingerprint, "medical:800:50:v4")
+    
+    path.write_text('[{"content": "Asthma, edited"}]')
+    assert not manifest.is_unchanged(str(path), manifest.file_fingerprint(str(path)), "medical:500:50:v4")
+
+def test_touched_but_identical_file_keeps_its_fingerprint(tmp_path):
+    path = tmp_path / "asthma.json"
+    path.write_text('[{"content": "Asthma"}]')
+    manifest = IngestionManifest("test", manifest_dir=tmp_path)
+    fingerprint = manifest.file_fingerprint(str(path))
+    manifest.update_source(str(path), fingerprint, "sig", ["a"])
+    
+    os.utime(path, ns=(0, 0))
+    
+    assert manifest.file_fingerprint(str(path)) == fingerprint
+
+def test_manifest_round_trips_and_is_dropped_for_another_model(tmp_path, monkeypatch):
+    path = tmp_path / "asthma.json"
+    path.write_text("[]")
+    manifest = IngestionManifest("test", manifest_dir=tmp_path)
+    manifest.update_source(str(path), manifest.file_fingerprint(str(path)), "sig", ["a", "b"], ["Asthma"])
+    manifest.save()
+    
+    reloaded = IngestionManifest("test", manifest_dir=tmp_path)
+    assert reloaded.get_point_ids(str(path)) == ["a", "b"]
+    assert reloaded.known_conditions() == ["Asthma"]
+    
+    monkeypatch.setattr(settings, "embedding_model_name", "another-model")
+    assert IngestionManifest("test", manifest_dir=tmp_path).sources == {}
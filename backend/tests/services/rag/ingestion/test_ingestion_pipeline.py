@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.rag.ingestion.chunking_strategies import ChunkingStrategy
+from app.services.rag.ingestion.document_loader import DocumentLoader
+from app.services.rag.ingestion.faiss_vectorstore_manager import FaissVectorStoreManager
+from app.services.rag.ingestion.ingestion_manifest import IngestionManifest
+from app.services.rag.ingestion.ingestion_pipeline import IngestionPipeline
+
+SECTIONS = ["# Asthma", "# Symptoms", "# Treatment"]
+
+class HashEmbedder:
+    """Deterministic unit vectors so the test needs no embedding model"""
+    
+    def embed_texts(self, texts, show_progress_bar=False):
+        vectors = np.stack([
+            np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(settings.embedding_dimension)
+            for text in texts
+        ]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "cache_path", tmp_path / "cache")
+    pipeline = IngestionPipeline.__new__(IngestionPipeline)
+    pipeline.document_loader = DocumentLoader(parallel=False)
+    pipeline.chunking_strategy = ChunkingStrategy()
+    pipeline.embedding_manager = HashEmbedder()
+    pipeline.vector_store = FaissVectorStoreManager("test_collection", index_dir=tmp_path / "index")
+    pipeline.manifest = IngestionManifest("test_collection", manifest_dir=tmp_path / "cache")
+    pipeline.lexical_index = None
+    yield pipeline
+    pipeline.vector_store.flush()  # Write now rather than from atexit, after pytest has closed the log stream
+
+def write_markdown(path, words: str):
+    path.write_text("\n\n".join(f"{heading}\n\n{heading[2:]} {words}." for heading in SECTIONS))
+
+def fail_after_first_section(loader: DocumentLoader, monkeypatch):
+    iter_markdown = loader._iter_markdown
+    
+    def failing(file_path):
+        documents = iter_markdown(file_path)
+        yield next(documents)
+        raise ValueError("corrupt section")
+    
+    monkeypatch.setattr(loader, "_iter_markdown", failing)
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_mid_file_failure_keeps_previous_points_and_manifest_entry(pipeline, tmp_path, monkeypatch, streaming):
+    path = tmp_path / "asthma.md"
+    write_markdown(path, "original text")
+    first = pipeline.run_ingestion([str(path)], streaming=streaming)
+    entry = dict(pipeline.manifest.get_source(str(path)))
+    assert first["success"] and len(entry["point_ids"]) == len(SECTIONS)
+    
+    write_markdown(path, "edited text")
+    fail_after_first_section(pipeline.document_loader, monkeypatch)
+    partial = pipeline.run_ingestion([str(path)], streaming=streaming)
+    
+    assert partial["files_failed"] == {str(path): "corrupt section"}
+    assert partial["chunks_deleted"] == 0
+    assert pipeline.manifest.get_source(str(path)) == entry
+    assert set(pipeline.vector_store._rows) == set(entry["point_ids"])
+    
+    monkeypatch.undo()
+    monkeypatch.setattr(settings, "cache_path", tmp_path / "cache")
+    retried = pipeline.run_ingestion([str(path)], streaming=streaming)
+    
+    assert retried["success"] and retried["files_skipped"] == 0
+    assert retried["chunks_deleted"] == len(SECTIONS)
+    assert set(pipeline.vector_store._rows) == set(pipeline.manifest.get_point_ids(str(path)))
+
+def test_one_bad_file_among_unchanged_ones_is_reported_per_file(pipeline, tmp_path):
+    paths = [tmp_path / f"condition_{i}.md" for i in range(3)]
+    for path in paths:
+        write_markdown(path, f"about {path.stem}")
+    unchanged = pipeline.run_ingestion([str(path) for path in paths])
+    
+    bad = tmp_path / "broken.json"
+    bad.write_text("{not json")
+    result = pipeline.run_ingestion([str(path) for path in paths] + [str(bad)])
+    
+    assert result["success"]
+    assert result["files_skipped"] == 3
+    assert list(result["files_failed"]) == [str(bad)]
+    assert result.keys() == unchanged.keys()
+    assert result["documents_stored"] == 0 and result["chunks_deleted"] == 0
+
+def test_aborted_runs_report_the_same_fields(pipeline, tmp_path, monkeypatch):
+    path = tmp_path / "asthma.md"
+    write_markdown(path, "original text")
+    
+    def failing_store(chunks, embeddings):
+        raise RuntimeError("vector store unavailable")
+    
+    monkeypatch.setattr(pipeline, "_store_chunks", failing_store)
+    result = pipeline.run_ingestion([str(path)])
+    
+    assert not result["success"] and result["error"] == "vector store unavailable"
+    assert result["documents_loaded"] == len(SECTIONS) and result["files_failed"] == {}
+    assert pipeline.manifest.get_source(str(path)) is None
+
+def test_reingestion_skips_unchanged_files_and_replaces_edited_chunks(pipeline, tmp_path):
+    unchanged, edited = tmp_path / "asthma.md", tmp_path / "diabetes.md"
+    write_markdown(unchanged, "stays the same")
+    write_markdown(edited, "first version")
+    pipeline.run_ingestion([str(unchanged), str(edited)])
+    old_ids = set(pipeline.manifest.get_point_ids(str(edited)))
+    
+    edited.write_text(edited.read_text().replace("Treatment first version", "Treatment second version"))
+    result = pipeline.run_ingestion([str(unchanged), str(edited)])
+    new_ids = set(pipeline.manifest.get_point_ids(str(edited)))
+    
+    assert result["files_skipped"] == 1
+    assert (result["chunks_unchanged"], result["documents_stored"], result["chunks_deleted"]) == (2, 1, 1)
+    assert len(old_ids & new_ids) == 2
+    assert set(pipeline.vector_store._rows) == new_ids | set(pipeline.manifest.get_point_ids(str(unchanged)))
@@ -0,0 +1,38 @@
+from langchain_core.documents import Document
+
+from app.services.rag.ingestion.document_loader import DocumentLoader
+from app.services.rag.ingestion.medical_chunker import MedicalSectionChunker
+
+def test_sections_are_detected_from_headers():
+    text = "Asthma is a lung disease.\nSYMPTOMS:\nWheezing and coughing.\nTREATMENT:\nInhalers help."
+    
+    sections = MedicalSectionChunker(chunk_size=200, chunk_overlap=0).find_sections(text)
+    
+    assert [name for name, _, _ in sections] == ["overview", "symptoms", "treatment"]
+    assert "".join(text[start:end] for _, start, end in sections) == text
+
+def test_chunk_offsets_point_into_the_parent_document():
+    text = "Asthma narrows the airways of the lungs and makes breathing hard. " * 20
+    
+    chunks = MedicalSectionChunker(chunk_size=150, chunk_overlap=30).split_document(Document(page_content=text))
+    
+    assert len(chunks) > 1
+    assert len({chunk.metadata["parent_id"] for chunk in chunks}) == 1
+    for chunk in chunks:
+        assert len(chunk.page_content) <= 150
+        assert text[chunk.metadata["start_index"]:chunk.metadata["end_index"]] == chunk.page_content
+
+def test_loader_headings_are_kept_as_section(tmp_path):
+    path = tmp_path / "asthma.md"
+    path.write_text("# Living with asthma\n\nSYMPTOMS:\nWheezing and coughing at night.\n")
+    
+    documents = DocumentLoader(parallel=False).load_file(str(path))
+    chunks = MedicalSectionChunker().split_documents(documents)
+    
+    assert {chunk.metadata["section"] for chunk in chunks} == {"Living with asthma"}
+    assert chunks[-1].metadata["medical_section"] == "symptoms"
+
+def test_documents_without_a_heading_use_the_detected_section():
+    chunks = MedicalSectionChunker().split_document(Document(page_content="TREATMENT:\nRest and fluids."))
+    
+    assert chunks[0].metadata["section"] == chunks[0].metadata["medical_section"] == "treatment"
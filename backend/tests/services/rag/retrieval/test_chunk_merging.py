@@ -0,0 +1,71 @@
+import json
+
+from langchain_core.documents import Document
+
+from app.services.rag.ingestion.document_loader import DocumentLoader
+from app.services.rag.ingestion.medical_chunker import MedicalSectionChunker
+from app.services.rag.retrieval.chunk_merging import merge_adjacent_chunks
+
+ASTHMA_OVERVIEW = (
+    "Asthma is a chronic disease that affects your airways. " * 6
+    + "\nSYMPTOMS:\nWheezing, coughing and chest tightness are common during a flare-up. " * 4
+)
+ASTHMA_CHILDREN = (
+    "Asthma in children often starts before the age of five. " * 6
+    + "\nSYMPTOMS:\nChildren may have trouble sleeping because of coughing at night. " * 4
+)
+
+def chunk(text: str, **metadata) -> list:
+    return MedicalSectionChunker(chunk_size=120, chunk_overlap=30).split_document(
+        Document(page_content=text, metadata={"source": "medical.json", **metadata})
+    )
+
+def test_overlapping_chunks_of_one_document_merge_into_the_original_span():
+    chunks = chunk(ASTHMA_OVERVIEW)
+    first, second = chunks[0], chunks[1]
+    assert second.metadata["start_index"] < first.metadata["end_index"]
+    
+    merged = merge_adjacent_chunks([first, second])
+    
+    assert len(merged) == 1
+    start, end = first.metadata["start_index"], second.metadata["end_index"]
+    assert merged[0].page_content == ASTHMA_OVERVIEW[start:end]
+    assert merged[0].metadata["merged_chunks"] == 2
+
+def test_merged_chunk_keeps_the_rank_of_its_best_part():
+    chunks = chunk(ASTHMA_OVERVIEW)
+    other = Document(page_content="Unrelated", metadata={"source": "other.json"})
+    
+    merged = merge_adjacent_chunks([chunks[1], other, chunks[0]])
+    
+    assert [doc.metadata.get("source") for doc in merged] == ["medical.json", "other.json"]
+
+def test_same_condition_entries_from_one_file_are_not_merged(tmp_path):
+    path = tmp_path / "medlineplus.json"
+    path.write_text(json.dumps([
+        {"condition": "Asthma", "category": "respiratory", "content": ASTHMA_OVERVIEW},
+        {"condition": "Asthma", "category": "respiratory", "content": ASTHMA_CHILDREN}
+    ]))
+    documents = DocumentLoader(parallel=False).load_file(str(path))
+    chunker = MedicalSectionChunker(chunk_size=120, chunk_overlap=30)
+    first_entry, second_entry = (chunker.split_document(doc) for doc in documents)
+    
+    # Chunks from different entries whose offsets overlap, like the "Asthma" entries of medlineplus_structured.json
+    pair = next(
+        (a, b) for a in first_entry for b in second_entry
+        if a.metadata["start_index"] <= b.metadata["start_index"] <= a.metadata["end_index"]
+    )
+    assert pair[0].metadata["condition"] == pair[1].metadata["condition"]
+    
+    merged = merge_adjacent_chunks(list(pair))
+    
+    assert [doc.page_content for doc in merged] == [pair[0].page_content, pair[1].page_content]
+
+def test_chunks_without_parent_id_are_kept_as_is():
+    chunks = chunk(ASTHMA_OVERVIEW)
+    for doc in chunks[:2]:
+        del doc.metadata["parent_id"]
+    
+    merged = merge_adjacent_chunks(chunks[:2])
+    
+    assert merged == chunks[:2]
@@ -0,0 +1,52 @@
+from app.services.rag.retrieval import condition_filter
+from app.services.rag.retrieval.condition_filter import ConditionMatcher
+
+CONDITIONS = [
+    "Asthma",
+    "Back Pain",
+    "Chest Pain",
+    "Common Cold",
+    "Cold",
+    "Gout",
+    "Hypertension (High Blood Pressure)",
+    "Pain",
+]
+
+class FakeManifest:
+    def __init__(self, collection_name):
+        pass
+    
+    def known_conditions(self):
+        return CONDITIONS
+
+def make_matcher(tmp_path, monkeypatch) -> ConditionMatcher:
+    monkeypatch.setattr(condition_filter.settings, "cache_path", tmp_path)
+    monkeypatch.setattr(condition_filter, "IngestionManifest", FakeManifest)
+    return ConditionMatcher("test_collection")
+
+def test_multi_word_names_match_as_phrases(tmp_path, monkeypatch):
+    matcher = make_matcher(tmp_path, monkeypatch)
+    
+    assert matcher.match("How do I treat back pain?") == ["Back Pain"]
+    assert matcher.match("Is high blood pressure hereditary?") == ["Hypertension (High Blood Pressure)"]
+    assert matcher.match("Symptoms of the common cold") == ["Common Cold"]
+
+def test_distinctive_single_words_match(tmp_path, monkeypatch):
+    matcher = make_matcher(tmp_path, monkeypatch)
+    
+    assert matcher.match("asthma inhalers") == ["Asthma"]
+    assert matcher.match("What causes gout?") == ["Gout"]
+    assert matcher.match("hypertension medication") == ["Hypertension (High Blood Pressure)"]
+
+def test_generic_single_words_do_not_restrict_queries(tmp_path, monkeypatch):
+    matcher = make_matcher(tmp_path, monkeypatch)
+    
+    assert matcher.match("Stomach pain after eating") == []
+    assert matcher.match("Why are my hands always cold?") == []
+    assert matcher.build_filter("pain in my back teeth") is None
+
+def test_short_single_words_do_not_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(condition_filter.settings, "condition_filter_min_term_length", 5)
+    matcher = make_matcher(tmp_path, monkeypatch)
+    
+    assert matcher.match("What causes gout?") == []
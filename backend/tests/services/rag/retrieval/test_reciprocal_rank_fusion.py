@@ -0,0 +1,53 @@
+import asyncio
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.services.rag.retrieval.langchain_retriever import LangChainMedicalRetriever, reciprocal_rank_fusion
+
+def doc(point_id: str) -> Document:
+    return Document(page_content=f"chunk {point_id}", metadata={"_id": point_id})
+
+def ranked(*point_ids: str):
+    return [(doc(point_id), 1.0) for point_id in point_ids]
+
+def test_documents_found_by_both_retrievers_rank_first():
+    dense = ranked("a", "b", "c")
+    lexical = ranked("c", "d", "a")
+    
+    fused = reciprocal_rank_fusion([dense, lexical], k=4, rrf_k=60)
+    
+    assert [d.metadata["_id"] for d, _ in fused] == ["a", "c", "b", "d"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 63)
+
+def test_fusion_keeps_the_top_k():
+    fused = reciprocal_rank_fusion([ranked("a", "b", "c"), ranked("d")], k=2, rrf_k=60)
+    
+    assert [d.metadata["_id"] for d, _ in fused] == ["a", "d"]
+
+def test_documents_without_an_id_are_matched_on_content():
+    first = [(Document(page_content="same text"), 0.9)]
+    second = [(Document(page_content="same text"), 0.1)]
+    
+    fused = reciprocal_rank_fusion([first, second], k=5, rrf_k=60)
+    
+    assert len(fused) == 1
+
+def test_hybrid_results_keep_cosine_similarity_as_their_score():
+    retriever = LangChainMedicalRetriever.__new__(LangChainMedicalRetriever)
+    
+    async def candidate_vectors(candidate_lists):
+        assert [[d.metadata["_id"] for d in documents] for documents in candidate_lists] == [["d"]]
+        return {"d": np.array([0.0, 2.0], dtype=np.float32)}
+    
+    retriever._candidate_vectors = candidate_vectors
+    dense = [(doc("a"), 0.9), (doc("c"), 0.4)]
+    fused = reciprocal_rank_fusion([dense, ranked("c", "d")], k=3, rrf_k=60)
+    
+    scored = asyncio.run(retriever._cosine_scored([fused], [dense], [[3.0, 4.0]]))[0]
+    
+    assert [(d.metadata["_id"], score) for d, score in scored] == [
+        ("c", 0.4), ("a", 0.9), ("d", pytest.approx(0.8))
+    ]
+    assert scored[0][0].metadata["rrf_score"] == pytest.approx(1 / 62 + 1 / 61)
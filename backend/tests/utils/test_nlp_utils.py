@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from app.utils.nlp_utils import FaissRetriever
+
+DIM = 8
+
+def corpus(size: int, seed: int = 0):
+    vectors = np.random.default_rng(seed).standard_normal((size, DIM)).astype(np.float32)
+    return [f"doc {i}" for i in range(size)], vectors
+
+@pytest.mark.parametrize("index_type, size", [("flat", 50), ("hnsw", 50), ("ivf", 25_000)])
+def test_loaded_index_can_be_changed_and_saved_again(tmp_path, index_type, size):
+    docs, vectors = corpus(size)
+    retriever = FaissRetriever(index_type=index_type, hnsw_ef_search=99, ivf_nprobe=7)
+    ids = retriever.build(docs, vectors)
+    assert retriever.kind == index_type
+    retriever.save(tmp_path)
+    
+    loaded = FaissRetriever.load(tmp_path)
+    assert loaded.remove(ids[:2]) == 2
+    _, new_vectors = corpus(1, seed=1)
+    loaded.add(["new doc"], new_vectors)
+    loaded.save(tmp_path)
+    
+    reloaded = FaissRetriever.load(tmp_path)
+    texts = [text for text, _ in reloaded.query_many(["q"], top_k=size, embeddings=vectors[:1])[0]]
+    
+    assert reloaded.query_many(["q"], top_k=1, embeddings=new_vectors)[0][0][0] == "new doc"
+    assert "doc 0" not in texts and "doc 1" not in texts
+    assert (reloaded.hnsw_ef_search, reloaded.ivf_nprobe) == (99, 7)